@@ -0,0 +1,139 @@
+# attachment_prep.py
+import os
+import re
+import shutil
+import tempfile
+from itertools import zip_longest
+import numpy as np
+from audio_format_handler import AudioFormatHandler, PCMBlockWriter
+from steganography_utils import _lsb_view
+
+# Gmail rejects messages over 25 MB and base64 adds a third, so keep each raw attachment under ~18 MB
+DEFAULT_MAX_ATTACHMENT_BYTES = 18 * 1024 * 1024
+
+_PART_SUFFIX = ".part{index:03d}"
+_PART_SUFFIX_RE = re.compile(r"\.part(\d+)$")
+
+
+def convert_wav_to_flac(wav_path, flac_path, handler=None):
+    """Losslessly re-encode a stego WAV as FLAC at the same bit depth and check the hidden data survived"""
+    handler = handler or AudioFormatHandler()
+    format_info = handler.detect_format(wav_path)
+    if 'error' in format_info:
+        return False, format_info['error']
+    if format_info['format'] != 'wav':
+        return False, "Source is not a WAV file"
+
+    try:
+        # Block by block, so memory stays flat however long the recording is
+        flac_format = dict(format_info, format='flac')
+        with PCMBlockWriter(flac_path, flac_format) as writer:
+            for block in handler.iter_pcm_blocks(wav_path, format_info):
+                writer.write(block)
+
+        # FLAC is lossless, but prove it: identical samples and identical LSB planes
+        flac_info = handler.detect_format(flac_path)
+        if 'error' in flac_info:
+            raise ValueError(flac_info['error'])
+        wav_blocks = handler.iter_pcm_blocks(wav_path, format_info)
+        flac_blocks = handler.iter_pcm_blocks(flac_path, flac_info)
+        for wav_block, flac_block in zip_longest(wav_blocks, flac_blocks):
+            if wav_block is None or flac_block is None or wav_block.shape != flac_block.shape:
+                raise ValueError("FLAC length differs from the WAV")
+            # LSB planes rather than decoding, so keyed (scattered) layouts are covered too
+            if not np.array_equal(_lsb_view(flac_block) & 1, _lsb_view(wav_block) & 1):
+                raise ValueError("Hidden data changed during FLAC conversion")
+            if not np.array_equal(wav_block, flac_block):
+                raise ValueError("FLAC samples differ from the WAV")
+    except Exception as e:
+        if os.path.exists(flac_path):
+            os.remove(flac_path)
+        return False, f"FLAC conversion failed: {str(e)}"
+
+    saved = 1 - os.path.getsize(flac_path) / os.path.getsize(wav_path)
+    return True, f"Converted to FLAC ({saved:.0%} smaller)"
+
+
+def split_file(file_path, max_bytes, output_dir):
+    """Split a file into numbered parts of at most max_bytes; returns the part paths"""
+    part_paths = []
+    base_name = os.path.join(output_dir, os.path.basename(file_path))
+    with open(file_path, "rb") as source:
+        while True:
+            chunk = source.read(max_bytes)
+            if not chunk:
+                break
+            part_path = base_name + _PART_SUFFIX.format(index=len(part_paths) + 1)
+            with open(part_path, "wb") as part:
+                part.write(chunk)
+            part_paths.append(part_path)
+    return part_paths
+
+
+def _part_index(part_path):
+    match = _PART_SUFFIX_RE.search(part_path)
+    if not match:
+        raise ValueError(f"Not a split_file part: {os.path.basename(part_path)}")
+    return int(match.group(1))
+
+
+def join_file_parts(part_paths, output_path):
+    """Reassemble parts written by split_file into output_path, ordered by part number (not name)"""
+    part_paths = sorted(part_paths, key=_part_index)
+    with open(output_path, "wb") as output:
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                shutil.copyfileobj(part, output, 1024 * 1024)
+    return output_path
+
+
+def prepare_stego_attachment(audio_path, max_bytes=DEFAULT_MAX_ATTACHMENT_BYTES, convert_wav=True):
+    """Shrink a stego audio file for email delivery.
+
+    WAV files are re-encoded to FLAC (verified bit-exact), then anything still
+    larger than max_bytes is split into parts to send as separate messages.
+    Returns a dict with 'paths', 'audio_format', 'parts', 'original_size',
+    'final_size', 'message' and 'work_dir' (pass the dict to
+    cleanup_prepared_attachment once sent).
+    """
+    original_size = os.path.getsize(audio_path)
+    ext = os.path.splitext(audio_path)[1].lower().lstrip('.')
+    prepared = {
+        'paths': [audio_path],
+        'audio_format': ext,
+        'parts': 1,
+        'original_size': original_size,
+        'final_size': original_size,
+        'message': "Sending original file",
+        'work_dir': None,
+    }
+
+    send_path = audio_path
+    if convert_wav and ext == 'wav':
+        work_dir = prepared['work_dir'] = tempfile.mkdtemp(prefix="stego_mail_")
+        flac_path = os.path.join(work_dir, os.path.splitext(os.path.basename(audio_path))[0] + ".flac")
+        success, message = convert_wav_to_flac(audio_path, flac_path)
+        prepared['message'] = message
+        if success and os.path.getsize(flac_path) < original_size:
+            send_path = flac_path
+            prepared['audio_format'] = 'flac'
+        print(f"📦 {message}")
+
+    prepared['paths'] = [send_path]
+    prepared['final_size'] = os.path.getsize(send_path)
+
+    if prepared['final_size'] > max_bytes:
+        if prepared['work_dir'] is None:
+            prepared['work_dir'] = tempfile.mkdtemp(prefix="stego_mail_")
+        prepared['paths'] = split_file(send_path, max_bytes, prepared['work_dir'])
+        prepared['parts'] = len(prepared['paths'])
+        prepared['message'] += f"; split into {prepared['parts']} parts"
+        print(f"📦 Attachment split into {prepared['parts']} parts of up to {max_bytes / (1024 * 1024):.0f} MB")
+
+    return prepared
+
+
+def cleanup_prepared_attachment(prepared):
+    """Remove temporary FLAC/part files created by prepare_stego_attachment"""
+    if prepared and prepared.get('work_dir'):
+        shutil.rmtree(prepared['work_dir'], ignore_errors=True)
@@ -1,24 +1,384 @@
+import hashlib
 import os
+import queue
+import threading
 import wave
+from collections import OrderedDict
 import numpy as np
 import soundfile as sf
+from audio_headers import AudioHeaderError, WAVE_FORMAT_PCM, build_wav_header, read_audio_header, wav_padding
+
+# soundfile subtype -> (bit_depth, sample_format) kept natively by the LSB pipeline
+_SF_SUBTYPES = {
+    'PCM_16': (16, 'int'),
+    'PCM_24': (24, 'int'),
+    'PCM_32': (32, 'int'),
+    'FLOAT': (32, 'float'),
+    'PCM_S8': (16, 'int'),  # 8-bit FLAC is widened to 16-bit on output
+}
+
+def unpack_int24(raw_bytes):
+    """Little-endian packed 24-bit samples -> sign-extended int32 array"""
+    packed = np.frombuffer(raw_bytes, dtype=np.uint8).reshape(-1, 3)
+    widened = np.zeros((len(packed), 4), dtype=np.uint8)
+    widened[:, 1:] = packed  # sample in the top 3 bytes, then an arithmetic shift sign-extends it
+    return widened.view('<i4').reshape(-1) >> 8
+
+def pack_int24(samples):
+    """int32 array holding 24-bit values -> little-endian packed 24-bit bytes"""
+    as_bytes = np.ascontiguousarray(samples, dtype='<i4').view(np.uint8).reshape(-1, 4)
+    return np.ascontiguousarray(as_bytes[:, :3]).tobytes()
+
+# Frames per streamed block; a multiple of 8 so every full block packs into whole payload bytes
+STREAM_BLOCK_FRAMES = 64 * 1024
+# Plain RIFF sizes are 32-bit; WAV output with more audio data than this is written as RF64
+RIFF_MAX_DATA_BYTES = 0xFFFFFFFF - 1024
+# WAV carriers at least this big are streamed instead of loaded whole
+STREAM_WAV_MIN_MB = 1024
+
+def pcm_dtype(format_info):
+    """numpy dtype of the PCM arrays produced by to_pcm for this format"""
+    if format_info.get('sample_format') == 'float':
+        return np.float32
+    return np.int16 if format_info.get('bit_depth', 16) == 16 else np.int32
+
+def prefetch_blocks(blocks, depth=2):
+    """Run a block iterator on a background thread, up to depth blocks ahead
+    
+    Decoding the next block overlaps with whatever the caller does with the
+    current one. Closing the returned generator early stops the producer.
+    """
+    pending = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    finished = object()
+    
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for block in blocks:
+                if not put(block):
+                    return
+            put(finished)
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(blocks, 'close', None)
+            if close:
+                close()  # the producer owns the iterator, so it releases the file
+    
+    threading.Thread(target=produce, name="pcm-prefetch", daemon=True).start()
+    try:
+        while True:
+            item = pending.get()
+            if item is finished:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def soundfile_target(format_info):
+    """(libsndfile format, subtype) that writes this carrier back at its native depth"""
+    bit_depth = format_info.get('bit_depth', 16)
+    is_float = format_info.get('sample_format') == 'float'
+    if format_info['format'] == 'flac':
+        if is_float or bit_depth > 24:
+            raise ValueError("FLAC stores integer PCM up to 24-bit only")
+        return 'FLAC', 'PCM_24' if bit_depth == 24 else 'PCM_16'
+    
+    subtype = 'FLOAT' if is_float else f'PCM_{bit_depth}'
+    if format_info['format'] == 'w64' or format_info.get('container') == 'w64':
+        return 'W64', subtype
+    data_bytes = format_info.get('frames', 0) * format_info['channels'] * (bit_depth // 8)
+    if (format_info['format'] == 'rf64' or format_info.get('container') == 'rf64'
+            or data_bytes > RIFF_MAX_DATA_BYTES):
+        return 'RF64', subtype
+    return 'WAV', subtype
+
+def write_wav_file(output_path, pcm_data, format_info):
+    """Write interleaved native-depth PCM as a plain RIFF WAV: header once, then the array buffer itself
+    
+    16/32-bit and float samples already in little-endian order are written
+    straight from the array (no astype/tobytes copies); 24-bit is packed a
+    block at a time so the extra memory stays bounded.
+    """
+    channels = format_info['channels']
+    bit_depth = format_info.get('bit_depth', 16)
+    sample_format = format_info.get('sample_format', 'int')
+    frames = len(pcm_data) // channels
+    with open(output_path, 'wb') as f:
+        f.write(build_wav_header(channels, format_info['sample_rate'], bit_depth, frames, sample_format))
+        _write_wav_samples(f, pcm_data, format_info)
+        f.write(wav_padding(channels, bit_depth, frames))
+
+def _write_wav_samples(f, pcm_data, format_info):
+    """Append interleaved native-depth samples to an open WAV data chunk"""
+    bit_depth = format_info.get('bit_depth', 16)
+    sample_format = format_info.get('sample_format', 'int')
+    if bit_depth == 24:
+        step = STREAM_BLOCK_FRAMES * format_info['channels']
+        for start in range(0, len(pcm_data), step):
+            f.write(pack_int24(pcm_data[start:start + step]))
+    else:
+        dtype = '<f4' if sample_format == 'float' else ('<i2' if bit_depth == 16 else '<i4')
+        np.ascontiguousarray(pcm_data, dtype=dtype).tofile(f)  # a no-op view when dtype already matches
+
+def to_soundfile_array(pcm_data, format_info):
+    """Interleaved native-depth PCM -> the 2-D array soundfile expects for soundfile_target"""
+    audio_data = pcm_data.reshape(-1, format_info['channels'])
+    bit_depth = format_info.get('bit_depth', 16)
+    if format_info.get('sample_format') == 'float':
+        return audio_data.astype(np.float32, copy=False)
+    if bit_depth == 16:
+        return audio_data.astype(np.int16, copy=False)
+    # soundfile expects 24-bit samples left-justified in int32
+    return audio_data.astype(np.int32) << (32 - bit_depth)
+
+class PCMBlockWriter:
+    """Incremental FLAC/WAV/RF64/W64 writer for the interleaved blocks yielded by iter_pcm_blocks
+    
+    Plain WAV is written like write_wav_file - a RIFF header, then each block's
+    raw samples - and the header is rewritten with the real frame count on close.
+    """
+    
+    def __init__(self, output_path, format_info):
+        container, subtype = soundfile_target(format_info)
+        self.format_info = format_info
+        self.output_path = output_path
+        self._frames = 0
+        if container == 'WAV':
+            self._file = None
+            self._raw = open(output_path, 'wb')
+            self._raw.write(self._wav_header())
+        else:
+            self._raw = None
+            self._file = sf.SoundFile(output_path, 'w', samplerate=format_info['sample_rate'],
+                                      channels=format_info['channels'], format=container, subtype=subtype)
+    
+    def _wav_header(self):
+        return build_wav_header(self.format_info['channels'], self.format_info['sample_rate'],
+                                self.format_info.get('bit_depth', 16), self._frames,
+                                self.format_info.get('sample_format', 'int'))
+    
+    def write(self, pcm_block):
+        if self._raw is None:
+            self._file.write(to_soundfile_array(pcm_block, self.format_info))
+            return
+        _write_wav_samples(self._raw, pcm_block, self.format_info)
+        self._frames += len(pcm_block) // self.format_info['channels']
+    
+    def close(self):
+        if self._raw is None:
+            self._file.close()
+            return
+        if self._raw.closed:
+            return
+        try:
+            self._raw.write(wav_padding(self.format_info['channels'], self.format_info.get('bit_depth', 16),
+                                        self._frames))
+            self._raw.seek(0)
+            self._raw.write(self._wav_header())
+        finally:
+            self._raw.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class FormatProbeCache:
+    """Bounded LRU of detect_format results keyed on (path, size, mtime_ns)
+    
+    A rewritten file gets a new key, so stale entries are never returned;
+    invalidate() just frees them early.
+    """
+    
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (abs path, size, mtime_ns) -> format_info
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key_for(file_path):
+        st = os.stat(file_path)
+        return os.path.abspath(file_path), st.st_size, st.st_mtime_ns
+    
+    def get(self, key):
+        with self._lock:
+            format_info = self._entries.get(key)
+            if format_info is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(format_info)  # callers may mutate their copy
+    
+    def put(self, key, format_info):
+        with self._lock:
+            self._entries[key] = dict(format_info)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, file_path=None):
+        """Drop every cached probe of file_path (or everything when None)"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(file_path)
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+    
+    def __len__(self):
+        return len(self._entries)
+
+# Shared by every handler - callers create a fresh AudioFormatHandler per operation
+_probe_cache = FormatProbeCache()
+
+def invalidate_format_cache(file_path=None):
+    """Forget cached detect_format results for file_path (or all files)"""
+    _probe_cache.invalidate(file_path)
+
+TRANSCODE_CACHE_DIR = "TranscodeCache"
+
+class TranscodeCache:
+    """Lossless conversions of other containers (AIFF, W64, RF64, CAF, ...) into WAV/FLAC carriers.
+    
+    Outputs are named by the SHA-256 of the source content, so converting the
+    same audio again - even from a copy or a renamed file - is a cache hit.
+    """
+    
+    def __init__(self, cache_dir=TRANSCODE_CACHE_DIR, block_frames=STREAM_BLOCK_FRAMES):
+        self.cache_dir = cache_dir
+        self.block_frames = block_frames
+        self._digests = {}  # (abs path, size, mtime_ns) -> sha256, to skip re-hashing unchanged files
+        self._lock = threading.Lock()
+    
+    def content_hash(self, file_path):
+        key = FormatProbeCache.key_for(file_path)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+    
+    @staticmethod
+    def target_for(subtype):
+        """(container, subtype) that stores this sample format losslessly"""
+        bit_depth, sample_format = _SF_SUBTYPES[subtype]
+        if sample_format == 'float' or bit_depth > 24:
+            return 'wav', 'FLOAT' if sample_format == 'float' else 'PCM_32'  # FLAC can't hold these
+        return 'flac', 'PCM_24' if bit_depth == 24 else 'PCM_16'
+    
+    def transcode(self, file_path):
+        """Path of the cached WAV/FLAC carrier for file_path, converting it on a cache miss"""
+        info = sf.info(file_path)
+        if info.subtype not in _SF_SUBTYPES:
+            raise ValueError(f"{info.format} {info.subtype} audio is not lossless PCM and can't be a carrier")
+        container, subtype = self.target_for(info.subtype)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        output_path = os.path.join(self.cache_dir, f"{self.content_hash(file_path)[:32]}.{container}")
+        if os.path.exists(output_path):
+            print(f"♻️ Using cached carrier {output_path}")
+            return output_path
+        
+        # Stream block by block; int32/float32 reads keep every bit of any PCM subtype
+        dtype = 'float32' if subtype == 'FLOAT' else 'int32'
+        temp_path = output_path + ".tmp"
+        try:
+            with sf.SoundFile(file_path) as source, \
+                    sf.SoundFile(temp_path, 'w', samplerate=source.samplerate, channels=source.channels,
+                                 format=container.upper(), subtype=subtype) as target:
+                for block in source.blocks(blocksize=self.block_frames, dtype=dtype, always_2d=True):
+                    target.write(block)
+            os.replace(temp_path, output_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        print(f"🔄 Transcoded {os.path.basename(file_path)} ({info.format} {info.subtype}) to {output_path}")
+        return output_path
+
+_transcode_cache = TranscodeCache()
 
 class AudioFormatHandler:
-    """Simplified handler for WAV and FLAC only"""
+    """Simplified handler for WAV and FLAC only
+    
+    PCM stays at the file's native depth: int16 for 16-bit, int32 holding the
+    sample value for 24/32-bit, float32 for float WAV, so LSB embedding never
+    requantizes the audio.
+    """
     
-    def __init__(self):
-        self.supported_formats = ['wav', 'flac']
+    def __init__(self, probe_cache=None, transcode_cache=None):
+        self.supported_formats = ['wav', 'flac', 'rf64', 'w64']
+        self.probe_cache = probe_cache if probe_cache is not None else _probe_cache
+        self.transcode_cache = transcode_cache if transcode_cache is not None else _transcode_cache
     
-    def detect_format(self, file_path):
-        """Detect and validate WAV or FLAC files"""
+    def prepare_carrier(self, file_path):
+        """(carrier_path, format_info) for any libsndfile-readable lossless file.
+        
+        WAV and FLAC are used as-is; other containers (AIFF, W64, RF64, CAF, ...)
+        are transcoded once into the TranscodeCache and the cached copy is used.
+        """
+        ext = os.path.splitext(file_path)[1].lower().lstrip('.')
+        if ext in self.supported_formats or not os.path.exists(file_path):
+            return file_path, self.detect_format(file_path)
+        try:
+            carrier_path = self.transcode_cache.transcode(file_path)
+        except Exception as e:
+            return file_path, {'error': f'Cannot use {ext.upper()} as a carrier: {str(e)}'}
+        format_info = self.detect_format(carrier_path)
+        if 'error' not in format_info:
+            format_info['source_path'] = file_path
+        return carrier_path, format_info
+    
+    def detect_format(self, file_path, use_cache=True):
+        """Detect and validate WAV or FLAC files (cached until the file changes)"""
         try:
             if not os.path.exists(file_path):
                 return {'error': 'File not found'}
             
+            key = self.probe_cache.key_for(file_path)
+            if use_cache:
+                cached = self.probe_cache.get(key)
+                if cached is not None:
+                    cached['file_path'] = file_path
+                    return cached
+            
+            format_info = self._probe(file_path)
+            if 'error' not in format_info:
+                self.probe_cache.put(key, format_info)
+            return format_info
+                
+        except Exception as e:
+            return {'error': f'Format detection failed: {str(e)}'}
+    
+    def _probe(self, file_path):
+        """Open the file and read its format details"""
+        try:
             ext = os.path.splitext(file_path)[1].lower().lstrip('.')
             
             if ext not in self.supported_formats:
-                return {'error': f'Unsupported format: {ext}. Only WAV and FLAC supported.'}
+                return {'error': f'Unsupported format: {ext}. Only WAV (incl. RF64/W64) and FLAC supported.'}
             
             format_info = {
                 'file_path': file_path,
@@ -29,94 +389,200 @@ class AudioFormatHandler:
                 'size_mb': os.path.getsize(file_path) / (1024 * 1024)
             }
             
-            if ext == 'wav':
-                return self._analyze_wav(file_path, format_info)
-            else:  # flac
+            if ext == 'flac':
                 return self._analyze_flac(file_path, format_info)
+            else:  # wav, rf64, w64
+                return self._analyze_wav(file_path, format_info)
                 
         except Exception as e:
             return {'error': f'Format detection failed: {str(e)}'}
     
     def _analyze_wav(self, file_path, format_info):
-        """Analyze WAV file"""
+        """Analyze WAV/RF64/W64 file from its header (PCM, float or WAVE_FORMAT_EXTENSIBLE)"""
         try:
-            with wave.open(file_path, 'rb') as wav_file:
-                if wav_file.getsampwidth() != 2:
-                    return {'error': 'WAV file must be 16-bit PCM'}
-                
-                format_info.update({
-                    'codec': 'PCM',
-                    'sample_rate': wav_file.getframerate(),
-                    'channels': wav_file.getnchannels(),
-                    'duration': wav_file.getnframes() / wav_file.getframerate(),
-                    'bit_depth': wav_file.getsampwidth() * 8
-                })
-            return format_info
+            header = read_audio_header(file_path)
+        except AudioHeaderError:
+            # Let libsndfile have a go at anything our parser doesn't understand
+            return self._analyze_with_soundfile(file_path, format_info, 'PCM', 'WAV')
         except Exception as e:
             return {'error': f'WAV analysis failed: {str(e)}'}
+        
+        if header['container'] not in ('wav', 'rf64', 'w64'):
+            return {'error': 'File content is not WAV'}
+        if header['sample_format'] == 'float':
+            if header['bit_depth'] != 32:
+                return {'error': 'WAV float audio must be 32-bit'}
+        elif header['bit_depth'] not in (16, 24, 32):
+            return {'error': 'WAV file must be 16, 24 or 32-bit PCM or 32-bit float'}
+        
+        # The wave module only reads plain integer PCM in a 32-bit RIFF
+        plain_pcm = (header['container'] == 'wav' and header['sample_format'] == 'int'
+                     and header['format_tag'] == WAVE_FORMAT_PCM)
+        format_info['container'] = header['container']
+        return self._apply_header(format_info, header, 'PCM', 'wave' if plain_pcm else 'soundfile')
     
     def _analyze_flac(self, file_path, format_info):
-        """Analyze FLAC file"""
+        """Analyze FLAC file from its STREAMINFO block"""
+        try:
+            header = read_audio_header(file_path)
+        except AudioHeaderError:
+            return self._analyze_with_soundfile(file_path, format_info, 'FLAC', 'FLAC')
+        except Exception as e:
+            return {'error': f'FLAC analysis failed: {str(e)}'}
+        
+        if header['container'] != 'flac':
+            return {'error': 'File content is not FLAC'}
+        if header['frames'] == 0:
+            # STREAMINFO may leave the sample count unknown; let the decoder count it
+            return self._analyze_with_soundfile(file_path, format_info, 'FLAC', 'FLAC')
+        if header['bit_depth'] not in (8, 16, 24):
+            return {'error': f"FLAC sample format {header['bit_depth']}-bit is not supported"}
+        
+        header['bit_depth'] = max(16, header['bit_depth'])  # 8-bit FLAC is widened to 16-bit
+        return self._apply_header(format_info, header, 'FLAC', 'soundfile')
+    
+    def _apply_header(self, format_info, header, codec, reader):
+        format_info.update({
+            'codec': 'PCM_FLOAT' if header['sample_format'] == 'float' else codec,
+            'sample_rate': header['sample_rate'],
+            'channels': header['channels'],
+            'duration': header['duration'],
+            'frames': header['frames'],
+            'bit_depth': header['bit_depth'],
+            'sample_format': header['sample_format'],
+            'reader': reader
+        })
+        return format_info
+    
+    def _analyze_with_soundfile(self, file_path, format_info, codec, label):
         try:
             info = sf.info(file_path)
+            if info.subtype not in _SF_SUBTYPES:
+                return {'error': f'{label} sample format {info.subtype} is not supported'}
+            bit_depth, sample_format = _SF_SUBTYPES[info.subtype]
             format_info.update({
-                'codec': 'FLAC',
+                'codec': 'PCM_FLOAT' if sample_format == 'float' else codec,
                 'sample_rate': info.samplerate,
                 'channels': info.channels,
                 'duration': info.duration,
-                'bit_depth': 16  # We'll convert to 16-bit
+                'frames': info.frames,
+                'bit_depth': bit_depth,
+                'sample_format': sample_format,
+                'reader': 'soundfile'
             })
             return format_info
         except Exception as e:
-            return {'error': f'FLAC analysis failed: {str(e)}'}
+            return {'error': f'{label} analysis failed: {str(e)}'}
     
     def to_pcm(self, file_path, format_info):
-        """Convert audio to writable 16-bit PCM numpy array"""
+        """Convert audio to a writable, interleaved PCM numpy array at the native bit depth"""
         try:
-            if format_info['format'] == 'wav':
+            bit_depth = format_info.get('bit_depth', 16)
+            if format_info['format'] == 'wav' and format_info.get('reader', 'wave') == 'wave':
                 with wave.open(file_path, 'rb') as wav_file:
                     frames = wav_file.readframes(wav_file.getnframes())
-                    pcm_data = np.frombuffer(frames, dtype=np.int16)
-                    return pcm_data.copy()  # Ensure writable
+                if bit_depth == 24:
+                    return unpack_int24(frames)
+                pcm_data = np.frombuffer(frames, dtype='<i2' if bit_depth == 16 else '<i4')
+                return pcm_data.astype(pcm_dtype(format_info))  # astype copies -> writable
             
-            else:  # flac
+            # FLAC, float WAV and extensible WAV
+            if format_info.get('sample_format') == 'float':
+                audio_data, sample_rate = sf.read(file_path, dtype='float32')
+            elif bit_depth == 16:
                 audio_data, sample_rate = sf.read(file_path, dtype='int16')
-                if len(audio_data.shape) > 1:  # Multi-channel
-                    pcm_data = audio_data.flatten()
-                else:
-                    pcm_data = audio_data
-                return pcm_data.copy()  # Ensure writable
+            else:
+                # soundfile returns 24-bit samples left-justified in int32
+                audio_data, sample_rate = sf.read(file_path, dtype='int32')
+                audio_data >>= 32 - bit_depth
+            return audio_data.reshape(-1).copy()  # Interleaved and writable
                 
         except Exception as e:
             raise ValueError(f"PCM conversion failed: {str(e)}")
     
     def from_pcm(self, pcm_data, output_path, format_info):
-        """Convert PCM back to original format"""
+        """Convert PCM back to original format at the same bit depth"""
         try:
-            if format_info['format'] == 'wav':
-                with wave.open(output_path, 'wb') as wav_file:
-                    wav_file.setnchannels(format_info['channels'])
-                    wav_file.setsampwidth(2)  # 16-bit
-                    wav_file.setframerate(format_info['sample_rate'])
-                    wav_file.writeframes(pcm_data.astype(np.int16).tobytes())
+            self.probe_cache.invalidate(output_path)
+            container, subtype = soundfile_target(format_info)
             
-            else:  # flac
-                if format_info['channels'] > 1:
-                    # Reshape for multi-channel
-                    audio_data = pcm_data.reshape(-1, format_info['channels'])
-                else:
-                    audio_data = pcm_data.reshape(-1, 1)
-                
-                sf.write(output_path, audio_data, format_info['sample_rate'], 
-                        format='FLAC', subtype='PCM_16')
+            if container == 'WAV':
+                # Plain WAV under 4 GB - header plus raw sample buffer, no encoder needed
+                write_wav_file(output_path, pcm_data, format_info)
+            else:
+                # FLAC, RF64 and W64 go through libsndfile
+                sf.write(output_path, to_soundfile_array(pcm_data, format_info), format_info['sample_rate'],
+                         format=container, subtype=subtype)
                 
         except Exception as e:
             raise ValueError(f"Format conversion failed: {str(e)}")
     
-    def estimate_capacity(self, format_info, data_size_bytes):
-        """Estimate storage capacity"""
+    def supports_streaming(self, format_info):
+        """True when the file should be embedded/extracted block by block (iter_pcm_blocks + PCMBlockWriter)
+        
+        FLAC, RF64 and W64 always stream; plain WAV only once it is big enough
+        that loading it whole would hurt.
+        """
+        if format_info.get('format') != 'wav' or format_info.get('container') in ('rf64', 'w64'):
+            return True
+        return format_info.get('size_mb', 0) >= STREAM_WAV_MIN_MB
+    
+    @staticmethod
+    def _read_dtype(format_info):
+        """(soundfile read dtype, right shift back to the native value)"""
+        bit_depth = format_info.get('bit_depth', 16)
+        if format_info.get('sample_format') == 'float':
+            return 'float32', 0
+        if bit_depth == 16:
+            return 'int16', 0
+        return 'int32', 32 - bit_depth
+    
+    def iter_pcm_blocks(self, file_path, format_info, block_frames=STREAM_BLOCK_FRAMES):
+        """Yield writable, interleaved PCM blocks (same dtype/values as to_pcm) without loading the file"""
+        dtype, shift = self._read_dtype(format_info)
+        try:
+            with sf.SoundFile(file_path) as audio_file:
+                for block in audio_file.blocks(blocksize=block_frames, dtype=dtype, always_2d=True):
+                    if shift:
+                        block >>= shift
+                    yield block.reshape(-1)  # blocks() yields fresh copies, so these are writable
+        except Exception as e:
+            raise ValueError(f"PCM conversion failed: {str(e)}")
+    
+    def read_pcm_samples(self, file_path, format_info, sample_positions):
+        """Values of the given interleaved sample indices (ascending), seeking over the frames between them"""
+        dtype, shift = self._read_dtype(format_info)
+        channels = format_info['channels']
+        values = np.empty(len(sample_positions), dtype=pcm_dtype(format_info))
+        try:
+            with sf.SoundFile(file_path) as audio_file:
+                current_frame, row = -1, None
+                for index, position in enumerate(sample_positions):
+                    frame, channel = divmod(int(position), channels)
+                    if frame != current_frame:
+                        if frame != current_frame + 1:
+                            audio_file.seek(frame)
+                        row = audio_file.read(1, dtype=dtype, always_2d=True)[0]
+                        current_frame = frame
+                    values[index] = row[channel]
+        except Exception as e:
+            raise ValueError(f"PCM conversion failed: {str(e)}")
+        if shift:
+            values >>= shift
+        return values
+    
+    def open_pcm_writer(self, output_path, format_info):
+        """PCMBlockWriter for streaming output in the carrier's format and bit depth"""
+        self.probe_cache.invalidate(output_path)
+        try:
+            return PCMBlockWriter(output_path, format_info)
+        except Exception as e:
+            raise ValueError(f"Format conversion failed: {str(e)}")
+    
+    def estimate_capacity(self, format_info, data_size_bytes, lsb_depth=1):
+        """Estimate storage capacity when lsb_depth bits of every sample carry data"""
         total_samples = int(format_info['sample_rate'] * format_info['duration'] * format_info['channels'])
-        available_bits = total_samples - 32  # 32 bits for length header
+        available_bits = total_samples * lsb_depth - 32  # 32 bits for length header
         required_bits = data_size_bytes * 8
         
         return {
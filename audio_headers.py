@@ -0,0 +1,205 @@
+# audio_headers.py
+"""Pure-Python WAV (RIFF, RF64, W64) and FLAC header parsing, plus a RIFF header writer.
+
+Reads only the header bytes - no wave/soundfile decoder is opened - so
+probing thousands of carriers costs a few small reads each.
+"""
+import os
+import struct
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Sony Wave64: every chunk id is a GUID whose first four bytes spell the RIFF fourcc
+_W64_SUFFIX = b'\xf3\xac\xd3\x11\x8c\xd1\x00\xc0\x4f\x8e\xdb\x8a'
+_W64_RIFF = b'riff\x2e\x91\xcf\x11\xa5\xd6\x28\xdb\x04\xc1\x00\x00'
+_W64_WAVE = b'wave' + _W64_SUFFIX
+
+_FLAC_STREAMINFO = 0
+_MAX_CHUNKS = 64  # give up on files that are mostly junk chunks
+
+
+class AudioHeaderError(ValueError):
+    """Header is missing, truncated or describes an unsupported layout"""
+
+
+def _header(sample_rate, channels, bit_depth, sample_format, frames, container, format_tag=None):
+    if not sample_rate or not channels:
+        raise AudioHeaderError("Header reports zero sample rate or channels")
+    return {
+        'container': container,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'bit_depth': bit_depth,
+        'sample_format': sample_format,
+        'frames': frames,
+        'duration': frames / sample_rate,
+        'format_tag': format_tag,
+    }
+
+
+def _read_exact(f, size, what):
+    data = f.read(size)
+    if len(data) != size:
+        raise AudioHeaderError(f"Truncated {what}")
+    return data
+
+
+def parse_wav_header(f, file_size):
+    """RIFF/WAVE or RF64: fmt chunk (PCM, IEEE float or WAVE_FORMAT_EXTENSIBLE) plus data chunk size"""
+    riff, _, wave_id = struct.unpack('<4sI4s', _read_exact(f, 12, "RIFF header"))
+    if riff not in (b'RIFF', b'RF64') or wave_id != b'WAVE':
+        raise AudioHeaderError("Not a RIFF/WAVE file")
+    container = 'rf64' if riff == b'RF64' else 'wav'
+
+    fmt = None
+    ds64_data_size = None
+    for _ in range(_MAX_CHUNKS):
+        chunk_id, chunk_size = struct.unpack('<4sI', _read_exact(f, 8, "chunk header"))
+        if chunk_id == b'ds64':
+            # RF64 keeps the real 64-bit sizes here and 0xFFFFFFFF in the 32-bit fields
+            ds64 = _read_exact(f, chunk_size, "ds64 chunk")
+            if len(ds64) < 16:
+                raise AudioHeaderError("ds64 chunk too short")
+            ds64_data_size = struct.unpack('<Q', ds64[8:16])[0]
+            if chunk_size & 1:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'fmt ':
+            fmt = _read_exact(f, chunk_size, "fmt chunk")
+            if chunk_size & 1:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise AudioHeaderError("data chunk before fmt chunk")
+            if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                chunk_size = ds64_data_size
+            # Streaming writers leave 0/0xFFFFFFFF here; trust the file size instead
+            available = file_size - f.tell()
+            if chunk_size == 0 or chunk_size > available:
+                chunk_size = available
+            return _wav_format(fmt, chunk_size, container)
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+    raise AudioHeaderError("No data chunk found")
+
+
+def parse_w64_header(f, file_size):
+    """Sony Wave64: GUID chunk ids, 64-bit sizes that include the 24-byte chunk header, 8-byte alignment"""
+    header = _read_exact(f, 40, "W64 header")
+    if header[:16] != _W64_RIFF or header[24:40] != _W64_WAVE:
+        raise AudioHeaderError("Not a Wave64 file")
+
+    fmt = None
+    for _ in range(_MAX_CHUNKS):
+        chunk_guid, chunk_size = struct.unpack('<16sQ', _read_exact(f, 24, "chunk header"))
+        if chunk_size < 24:
+            raise AudioHeaderError("Corrupt W64 chunk size")
+        body_size = chunk_size - 24
+        padding = -chunk_size % 8
+        if chunk_guid == b'fmt ' + _W64_SUFFIX:
+            fmt = _read_exact(f, body_size, "fmt chunk")
+            f.seek(padding, os.SEEK_CUR)
+        elif chunk_guid == b'data' + _W64_SUFFIX:
+            if fmt is None:
+                raise AudioHeaderError("data chunk before fmt chunk")
+            return _wav_format(fmt, min(body_size, file_size - f.tell()), 'w64')
+        else:
+            f.seek(body_size + padding, os.SEEK_CUR)
+    raise AudioHeaderError("No data chunk found")
+
+
+def _wav_format(fmt, data_size, container='wav'):
+    if len(fmt) < 16:
+        raise AudioHeaderError("fmt chunk too short")
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE:
+        if len(fmt) < 40:
+            raise AudioHeaderError("Extensible fmt chunk too short")
+        # The SubFormat GUID starts with the real format tag
+        format_tag = struct.unpack('<H', fmt[24:26])[0]
+        extensible = True
+    else:
+        extensible = False
+
+    if format_tag == WAVE_FORMAT_PCM:
+        sample_format = 'int'
+    elif format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        sample_format = 'float'
+    else:
+        raise AudioHeaderError(f"Unsupported WAV format tag 0x{format_tag:04x}")
+    if not block_align:
+        raise AudioHeaderError("Header reports zero block alignment")
+
+    header = _header(sample_rate, channels, bits, sample_format, data_size // block_align, container,
+                     WAVE_FORMAT_EXTENSIBLE if extensible else format_tag)
+    header['block_align'] = block_align
+    return header
+
+
+def parse_flac_header(f):
+    """fLaC marker (after an optional ID3v2 tag) followed by the STREAMINFO block"""
+    marker = _read_exact(f, 4, "FLAC marker")
+    if marker[:3] == b'ID3':
+        rest = _read_exact(f, 6, "ID3 header")
+        size = 0
+        for byte in rest[2:6]:  # synchsafe: 7 bits per byte
+            size = (size << 7) | (byte & 0x7F)
+        f.seek(size, os.SEEK_CUR)
+        marker = _read_exact(f, 4, "FLAC marker")
+    if marker != b'fLaC':
+        raise AudioHeaderError("Not a FLAC file")
+
+    block_header = _read_exact(f, 4, "metadata block header")
+    block_type = block_header[0] & 0x7F
+    block_size = int.from_bytes(block_header[1:], 'big')
+    if block_type != _FLAC_STREAMINFO or block_size < 34:
+        raise AudioHeaderError("FLAC STREAMINFO block missing")
+    info = _read_exact(f, 34, "STREAMINFO")
+
+    # 20 bits sample rate, 3 bits channels-1, 5 bits bits-per-sample-1, 36 bits total samples
+    packed = int.from_bytes(info[10:18], 'big')
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    bits = ((packed >> 36) & 0x1F) + 1
+    frames = packed & 0xFFFFFFFFF
+    return _header(sample_rate, channels, bits, 'int', frames, 'flac')
+
+
+def read_audio_header(file_path):
+    """Parse a WAV/RF64/W64 or FLAC header by content (not extension); raises AudioHeaderError"""
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        magic = f.read(16)
+        f.seek(0)
+        if magic[:4] in (b'RIFF', b'RF64'):
+            return parse_wav_header(f, file_size)
+        if magic == _W64_RIFF:
+            return parse_w64_header(f, file_size)
+        magic = magic[:4]
+        if magic == b'fLaC' or magic[:3] == b'ID3':
+            return parse_flac_header(f)
+    raise AudioHeaderError("Unrecognised audio header")
+
+
+def build_wav_header(channels, sample_rate, bit_depth, frames, sample_format='int'):
+    """44-byte canonical RIFF/WAVE header (PCM or IEEE float) for frames of interleaved audio.
+
+    The data chunk is padded to an even length as RIFF requires; callers write
+    wav_padding(...) bytes after the samples.
+    """
+    block_align = channels * (bit_depth // 8)
+    data_size = frames * block_align
+    riff_size = 4 + (8 + 16) + (8 + data_size + data_size % 2)
+    if riff_size > 0xFFFFFFFF:
+        raise AudioHeaderError("Audio data too large for a RIFF header; use RF64")
+    format_tag = WAVE_FORMAT_IEEE_FLOAT if sample_format == 'float' else WAVE_FORMAT_PCM
+    return (struct.pack('<4sI4s', b'RIFF', riff_size, b'WAVE')
+            + struct.pack('<4sIHHIIHH', b'fmt ', 16, format_tag, channels, sample_rate,
+                          sample_rate * block_align, block_align, bit_depth)
+            + struct.pack('<4sI', b'data', data_size))
+
+
+def wav_padding(channels, bit_depth, frames):
+    """Pad byte(s) that follow an odd-length data chunk"""
+    return b'\0' * ((frames * channels * (bit_depth // 8)) % 2)
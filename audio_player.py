@@ -1,11 +1,22 @@
 import pygame
 import threading
 import tkinter as tk
-from tkinter import messagebox
 import os
 import time
+import numpy as np
+import soundfile as sf
+from waveform import WaveformWidget
 
 class AudioPlayer:
+    """Streams audio from disk in small blocks decoded by soundfile.
+    
+    Only the playing block and one queued block are in memory, so hour-long
+    files cost the same as short ones. Position comes from the block being
+    played rather than a wall-clock guess, and seek() jumps straight to a frame.
+    """
+    
+    BLOCK_SECONDS = 0.25
+    
     def __init__(self):
         pygame.mixer.init()
         self.is_playing = False
@@ -13,6 +24,20 @@ class AudioPlayer:
         self.current_file = None
         self.position = 0
         self.duration = 0
+        self.volume = 0.7
+        self._file = None
+        self._samplerate = 0
+        self._channels = 0
+        self._channel = None
+        self._lock = threading.RLock()
+        self._feeder = None
+        self._stop_feeding = threading.Event()
+        self._next_frame = 0             # next frame to decode
+        self._block_starts = {}          # id(Sound) -> (start frame, frames)
+        self._current_sound = None
+        self._current_block = (0, 0)
+        self._current_started_at = 0.0
+        self._paused_at = 0.0
         
     def load_audio(self, file_path):
         """Load audio file for playback"""
@@ -20,59 +45,205 @@ class AudioPlayer:
             if not os.path.exists(file_path):
                 raise FileNotFoundError("Audio file not found")
             
+            self.stop()
+            self._close_file()
+            
+            # One open gives both the stream and its metadata
+            self._file = sf.SoundFile(file_path)
+            self._samplerate = self._file.samplerate
+            self._channels = min(self._file.channels, 2)
+            self.duration = self._file.frames / self._samplerate
             self.current_file = file_path
-            pygame.mixer.music.load(file_path)
             
-            # Get duration using soundfile
-            import soundfile as sf
-            info = sf.info(file_path)
-            self.duration = info.duration
+            # The mixer plays raw buffers, so it must match the file's rate/channels.
+            # Re-initializing stops every sound, so only do it when they actually differ.
+            mixer = pygame.mixer.get_init()
+            if mixer is None or (mixer[0], mixer[2]) != (self._samplerate, self._channels):
+                if mixer is not None:
+                    pygame.mixer.quit()
+                # allowedchanges=0 makes SDL resample instead of silently changing the rate
+                pygame.mixer.init(frequency=self._samplerate, size=-16, channels=self._channels,
+                                  allowedchanges=0)
+                self._channel = None
             
+
             return True, f"Loaded: {os.path.basename(file_path)} ({self.duration:.1f}s)"
         except Exception as e:
             return False, f"Failed to load audio: {str(e)}"
     
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _read_block(self):
+        """Decode the next block as a Sound; returns None at end of file"""
+        frames = max(1, int(self._samplerate * self.BLOCK_SECONDS))
+        block = self._file.read(frames, dtype='int16', always_2d=True)
+        if not len(block):
+            return None
+        block = np.ascontiguousarray(block[:, :self._channels])
+        sound = pygame.mixer.Sound(buffer=block.tobytes())
+        self._block_starts[id(sound)] = (self._next_frame, len(block))
+        self._next_frame += len(block)
+        return sound
+    
+    def _track_current_block(self):
+        """Note when the channel moves on to the queued block"""
+        sound = self._channel.get_sound()
+        if sound is not None and sound is not self._current_sound:
+            if self._current_sound is not None:
+                self._block_starts.pop(id(self._current_sound), None)
+            self._current_sound = sound
+            self._current_block = self._block_starts.get(id(sound), self._current_block)
+            self._current_started_at = time.monotonic()
+    
+    def _feed_loop(self, stop_event):
+        """Keep one block queued behind the playing one until EOF or stop"""
+        while not stop_event.is_set():
+            with self._lock:
+                if stop_event.is_set():
+                    return  # stopped/seeked while waiting for the lock
+                if not self.is_paused:
+                    self._track_current_block()
+                    if self._channel.get_queue() is None:
+                        sound = self._read_block()
+                        if sound is not None:
+                            self._channel.queue(sound)
+                        elif not self._channel.get_busy():
+                            # Drained: finished playing the last block
+                            self.is_playing = False
+                            self.position = self.duration
+                            self._current_sound = None
+                            return
+            stop_event.wait(0.01)
+    
+    @staticmethod
+    def _free_channel():
+        """An idle mixer channel, adding one when other players/previews are using them all"""
+        channel = pygame.mixer.find_channel()
+        if channel is None:
+            pygame.mixer.set_num_channels(pygame.mixer.get_num_channels() + 1)
+            channel = pygame.mixer.find_channel()
+        return channel
+    
+    def _start_feeding(self):
+        # A fresh event per feeder, so an old feeder can't be revived by a quick seek
+        self._stop_feeding = threading.Event()
+        self._current_sound = None
+        first = self._read_block()
+        if first is None:
+            return False
+        # Our stopped channel may since have been taken by another sound
+        if self._channel is None or self._channel.get_busy():
+            self._channel = self._free_channel()
+        self._channel.play(first)
+        self._channel.set_volume(self.volume)  # play() resets the channel volume
+        self._track_current_block()
+        self._feeder = threading.Thread(target=self._feed_loop, args=(self._stop_feeding,), daemon=True)
+        self._feeder.start()
+        return True
+    
+    def _stop_feeder(self):
+        # No join: callers hold the lock the feeder needs, and it exits on its own
+        self._stop_feeding.set()
+        self._feeder = None
+        if self._channel is not None:
+            self._channel.stop()
+        self._block_starts.clear()
+        self._current_sound = None
+    
+    def get_position(self):
+        """Current playback position in seconds"""
+        with self._lock:
+            if not self.is_playing or self._current_sound is None:
+                return self.position
+            start, frames = self._current_block
+            elapsed = time.monotonic() - self._current_started_at
+            frame = start + min(frames, int(elapsed * self._samplerate))
+            return frame / self._samplerate
+    
     def play(self):
         """Start or resume playback"""
         try:
-            if self.is_paused:
-                pygame.mixer.music.unpause()
-                self.is_paused = False
-            else:
-                pygame.mixer.music.play(start=self.position)
-            
-            self.is_playing = True
-            return True
-        except Exception as e:
+            with self._lock:
+                if self._file is None:
+                    return False
+                if self.is_paused:
+                    self._channel.unpause()
+                    self._current_started_at += time.monotonic() - self._paused_at
+                    self.is_paused = False
+                else:
+                    if self.position >= self.duration:
+                        self.position = 0
+                    self._file.seek(int(self.position * self._samplerate))
+                    self._next_frame = int(self.position * self._samplerate)
+                    if not self._start_feeding():
+                        return False
+                
+                self.is_playing = True
+                return True
+        except Exception:
             return False
     
     def pause(self):
         """Pause playback"""
         try:
-            pygame.mixer.music.pause()
-            self.is_paused = True
-            self.is_playing = False
+            with self._lock:
+                if not self.is_playing:
+                    return False
+                self.position = self.get_position()
+                self._paused_at = time.monotonic()
+                self._channel.pause()
+                self.is_paused = True
+                self.is_playing = False
             return True
-        except Exception as e:
+        except Exception:
+            return False
+    
+    def seek(self, seconds):
+        """Jump to a position (seconds); keeps playing if playback was running"""
+        try:
+            with self._lock:
+                if self._file is None:
+                    return False
+                was_playing = self.is_playing
+                self._stop_feeder()
+                self.is_paused = False
+                self.is_playing = False
+                self.position = max(0.0, min(float(seconds), self.duration))
+                if was_playing:
+                    return self.play()
+            return True
+        except Exception:
             return False
     
     def stop(self):
         """Stop playback"""
         try:
-            pygame.mixer.music.stop()
-            self.is_playing = False
-            self.is_paused = False
-            self.position = 0
+            with self._lock:
+                self._stop_feeder()
+                self.is_playing = False
+                self.is_paused = False
+                self.position = 0
             return True
-        except Exception as e:
+        except Exception:
             return False
     
+    def close(self):
+        """Stop playback and release the file handle"""
+        self.stop()
+        with self._lock:
+            self._close_file()
+    
     def set_volume(self, volume):
         """Set playback volume (0.0 to 1.0)"""
         try:
-            pygame.mixer.music.set_volume(volume)
+            self.volume = volume
+            if self._channel is not None:
+                self._channel.set_volume(volume)
             return True
-        except Exception as e:
+        except Exception:
             return False
     
     def get_status(self):
@@ -80,16 +251,18 @@ class AudioPlayer:
         return {
             'is_playing': self.is_playing,
             'is_paused': self.is_paused,
+            'position': self.get_position(),
             'duration': self.duration,
             'current_file': self.current_file
         }
 
 class AudioPreviewWidget:
-    def __init__(self, parent):
+    def __init__(self, parent, show_waveform=True):
         self.parent = parent
         self.player = AudioPlayer()
-        self.update_thread = None
+        self.update_job = None
         self.should_update = False
+        self.seeking = False
         
         # Create preview frame
         self.preview_frame = tk.Frame(parent, relief="groove", bd=2, bg="#f0f0f0")
@@ -100,6 +273,12 @@ class AudioPreviewWidget:
                                   bg="#f0f0f0", font=("Arial", 9))
         self.info_label.pack(pady=2)
         
+        # Waveform (click to seek, wheel to zoom, drag to pan)
+        self.waveform = None
+        if show_waveform:
+            self.waveform = WaveformWidget(self.preview_frame)
+            self.waveform.on_click = self.seek_to
+        
         # Controls frame
         controls_frame = tk.Frame(self.preview_frame, bg="#f0f0f0")
         controls_frame.pack(pady=5)
@@ -123,7 +302,15 @@ class AudioPreviewWidget:
         self.volume_scale.set(70)  # Default volume
         self.volume_scale.pack(side=tk.LEFT, padx=2)
         
-        # Progress bar (simplified - shows duration)
+        # Seek bar - drag and release to jump
+        self.seek_var = tk.DoubleVar(value=0)
+        self.seek_scale = tk.Scale(self.preview_frame, from_=0, to=1, resolution=0.1,
+                                   orient=tk.HORIZONTAL, showvalue=0, variable=self.seek_var,
+                                   length=260, bg="#f0f0f0")
+        self.seek_scale.pack(fill="x", padx=10)
+        self.seek_scale.bind("<ButtonPress-1>", self.begin_seek)
+        self.seek_scale.bind("<ButtonRelease-1>", self.end_seek)
+        
         self.progress_label = tk.Label(self.preview_frame, text="00:00 / 00:00", 
                                       bg="#f0f0f0", font=("Arial", 8))
         self.progress_label.pack(pady=2)
@@ -131,12 +318,20 @@ class AudioPreviewWidget:
         # Initially disable controls
         self.set_controls_state(False)
     
-    def load_audio_file(self, file_path):
-        """Load and prepare audio file for preview"""
+    def load_audio_file(self, file_path, original_path=None):
+        """Load and prepare audio file for preview
+        
+        original_path (the unencoded carrier) adds a changed-LSB strip to the waveform.
+        """
         success, message = self.player.load_audio(file_path)
         
         if success:
             self.info_label.config(text=message, fg="green")
+            if self.waveform:
+                wave_ok, wave_message = self.waveform.load(file_path, original_path)
+                if not wave_ok:
+                    print(wave_message)
+            self.seek_scale.config(to=max(self.player.duration, 0.1))
             self.set_controls_state(True)
             self.update_progress_display()
             return True
@@ -162,6 +357,20 @@ class AudioPreviewWidget:
             self.stop_update_thread()
             self.update_progress_display()
     
+    def begin_seek(self, event=None):
+        """Stop the progress updates from moving the slider while it is dragged"""
+        self.seeking = True
+    
+    def end_seek(self, event=None):
+        """Jump to the slider position"""
+        self.seeking = False
+        self.seek_to(self.seek_var.get())
+    
+    def seek_to(self, seconds):
+        """Jump to a position in seconds (from the slider or a waveform click)"""
+        self.player.seek(seconds)
+        self.update_progress_display()
+    
     def set_volume(self, volume):
         """Set playback volume"""
         volume_float = float(volume) / 100.0
@@ -173,14 +382,19 @@ class AudioPreviewWidget:
         self.play_button.config(state=state)
         self.stop_button.config(state=state)
         self.volume_scale.config(state=state)
+        self.seek_scale.config(state=state)
     
     def update_progress_display(self):
         """Update the progress display"""
         status = self.player.get_status()
-        duration = status['duration']
+        position = status['position']
         
-        duration_str = self.format_time(duration)
-        self.progress_label.config(text=f"00:00 / {duration_str}")
+        if not self.seeking:
+            self.seek_var.set(position)
+        self.progress_label.config(
+            text=f"{self.format_time(position)} / {self.format_time(status['duration'])}")
+        if self.waveform:
+            self.waveform.set_cursor(position)
     
     def format_time(self, seconds):
         """Format seconds as MM:SS"""
@@ -189,38 +403,36 @@ class AudioPreviewWidget:
         return f"{mins:02d}:{secs:02d}"
     
     def start_update_thread(self):
-        """Start the progress update thread"""
+        """Start polling the player position from the Tk event loop"""
         self.should_update = True
-        if self.update_thread is None or not self.update_thread.is_alive():
-            self.update_thread = threading.Thread(target=self.update_loop)
-            self.update_thread.daemon = True
-            self.update_thread.start()
+        if self.update_job is None:
+            self.update_job = self.parent.after(100, self.update_loop)
     
     def stop_update_thread(self):
-        """Stop the progress update thread"""
+        """Stop the progress updates"""
         self.should_update = False
+        if self.update_job is not None:
+            try:
+                self.parent.after_cancel(self.update_job)
+            except tk.TclError:
+                pass
+            self.update_job = None
     
     def update_loop(self):
-        """Progress update loop (runs in separate thread)"""
-        start_time = time.time()
-        while self.should_update and self.player.is_playing:
-            elapsed = time.time() - start_time
-            status = self.player.get_status()
-            
-            if elapsed < status['duration']:
-                elapsed_str = self.format_time(elapsed)
-                duration_str = self.format_time(status['duration'])
-                
-                # Update GUI in main thread
-                self.parent.after(0, lambda: self.progress_label.config(
-                    text=f"{elapsed_str} / {duration_str}"))
-            
-            time.sleep(0.1)
+        """Progress update tick (runs on the Tk thread every 100 ms)"""
+        self.update_job = None
+        try:
+            self.update_progress_display()
+        except tk.TclError:
+            return  # widget destroyed
         
-        # Reset display when done
-        self.parent.after(0, lambda: self.play_button.config(text="▶️ Play"))
+        if self.should_update and self.player.is_playing:
+            self.update_job = self.parent.after(100, self.update_loop)
+        elif not self.player.is_playing:
+            # Reset button when playback finishes
+            self.play_button.config(text="▶️ Play")
     
     def cleanup(self):
         """Cleanup resources"""
         self.stop_update_thread()
-        self.player.stop()
+        self.player.close()
@@ -0,0 +1,260 @@
+# benchmark_pipeline.py
+"""End-to-end encode -> email benchmark against the in-process SMTP sink.
+
+    python benchmark_pipeline.py --runs 5 --sizes 100 10000 200000 --formats wav flac
+    python benchmark_pipeline.py --output new.json --compare old.json
+    python benchmark_pipeline.py --formats wav --layouts sequential scattered
+    python benchmark_pipeline.py --wav-write-mb 1024 --runs 3
+
+Runs in a scratch directory (its own steganography.db), never touches the
+network, and writes a JSON report with per-phase latency statistics.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+import numpy as np
+import soundfile as sf
+from audio_format_handler import AudioFormatHandler, STREAM_BLOCK_FRAMES
+from steganography_utils import encode_data, EMBEDDING_LAYOUTS
+from email_utils import build_stego_email, deliver_stego_email
+from local_smtp_sink import LocalSMTPSink
+
+PHASES = ['format_detect', 'encrypt', 'pcm_read', 'embed', 'write', 'db', 'mime_build', 'send', 'total']
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def make_carrier(path, audio_format, payload_bytes, min_seconds=5):
+    """Write a noise carrier big enough for the encrypted payload (Fernet adds ~1/3)"""
+    bits_needed = (payload_bytes * 4 // 3 + 512) * 8 + 32
+    frames = max(SAMPLE_RATE * min_seconds, -(-bits_needed // CHANNELS))
+    rng = np.random.default_rng(1234)
+    samples = rng.integers(-8000, 8000, size=(frames, CHANNELS), dtype=np.int16)
+    if audio_format == 'wav':
+        with wave.open(path, 'wb') as wav_file:
+            wav_file.setnchannels(CHANNELS)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(SAMPLE_RATE)
+            wav_file.writeframes(samples.tobytes())
+    else:
+        sf.write(path, samples, SAMPLE_RATE, format='FLAC', subtype='PCM_16')
+    return frames / SAMPLE_RATE
+
+
+def make_payload(size):
+    """Messages are capped at 255 characters, so larger payloads go in as binary 'pdf' data"""
+    if size <= 255:
+        return "x" * size, "message"
+    return os.urandom(size), "pdf"
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'mean': statistics.fmean(values),
+        'median': statistics.median(values),
+        'p95': values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))],
+        'min': values[0],
+        'max': values[-1],
+    }
+
+
+def run_case(work_dir, sink, audio_format, payload_size, runs, layout="sequential"):
+    carrier = os.path.join(work_dir, f"carrier_{payload_size}.{audio_format}")
+    carrier_seconds = make_carrier(carrier, audio_format, payload_size)
+    data, data_type = make_payload(payload_size)
+    samples = {phase: [] for phase in PHASES}
+    output_sizes = []
+
+    for run in range(runs):
+        output = os.path.join(work_dir, f"out_{payload_size}_{layout}_{run}.{audio_format}")
+        timings = {}
+        start = time.perf_counter()
+        key = encode_data(carrier, data, output, data_type, user_id=1,
+                          receiver_email="bench@example.com", timings=timings, layout=layout)
+
+        phase_start = time.perf_counter()
+        message = build_stego_email("bench@example.com", key, output, "sender@example.com",
+                                    data_type, audio_format)
+        for _ in message.iter_bytes():
+            pass
+        timings['mime_build'] = time.perf_counter() - phase_start
+
+        phase_start = time.perf_counter()
+        deliver_stego_email("bench@example.com", key, output, "sender@example.com", None, None,
+                            data_type, audio_format, smtp_settings=sink.smtp_settings)
+        timings['send'] = time.perf_counter() - phase_start
+        timings['total'] = time.perf_counter() - start
+
+        for phase in PHASES:
+            samples[phase].append(timings.get(phase, 0.0))
+        output_sizes.append(os.path.getsize(output))
+        os.remove(output)
+
+    return {
+        'format': audio_format,
+        'payload_bytes': payload_size,
+        'layout': layout,
+        'data_type': data_type,
+        'carrier_seconds': carrier_seconds,
+        'output_bytes': int(statistics.median(output_sizes)),
+        'runs': runs,
+        'phases': {phase: summarize(values) for phase, values in samples.items()},
+    }
+
+
+def run_wav_write(work_dir, size_mb, runs):
+    """Time writing a size_mb 16-bit WAV output the way the encode pipeline does at that size
+
+    Outputs big enough to stream are written block by block through
+    open_pcm_writer (compared with libsndfile's block writer); smaller ones in
+    one go through from_pcm (compared with the old wave-module writer).
+    """
+    frames = size_mb * 1024 * 1024 // (2 * CHANNELS)
+    pcm = np.random.default_rng(1234).integers(-8000, 8000, size=frames * CHANNELS, dtype=np.int16)
+    format_info = {'format': 'wav', 'channels': CHANNELS, 'sample_rate': SAMPLE_RATE,
+                   'bit_depth': 16, 'sample_format': 'int', 'frames': frames, 'size_mb': size_mb}
+    output = os.path.join(work_dir, "write_bench.wav")
+    handler = AudioFormatHandler()
+    step = STREAM_BLOCK_FRAMES * CHANNELS
+
+    def pcm_writer():
+        with handler.open_pcm_writer(output, format_info) as writer:
+            for start in range(0, len(pcm), step):
+                writer.write(pcm[start:start + step].copy())  # iter_pcm_blocks hands out fresh blocks too
+
+    def soundfile_blocks():
+        with sf.SoundFile(output, 'w', samplerate=SAMPLE_RATE, channels=CHANNELS,
+                          format='WAV', subtype='PCM_16') as audio_file:
+            for start in range(0, len(pcm), step):
+                audio_file.write(pcm[start:start + step].copy().reshape(-1, CHANNELS))
+
+    def wave_module():
+        with wave.open(output, 'wb') as wav_file:
+            wav_file.setnchannels(CHANNELS)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(SAMPLE_RATE)
+            wav_file.writeframes(pcm.astype('<i2').tobytes())
+
+    streamed = handler.supports_streaming(format_info)
+    if streamed:
+        writers = {'pcm_writer': pcm_writer, 'soundfile': soundfile_blocks}
+    else:
+        writers = {'from_pcm': lambda: handler.from_pcm(pcm, output, format_info), 'wave_module': wave_module}
+    result = {'size_mb': size_mb, 'runs': runs, 'streamed': streamed, 'writers': {}}
+    for name, write in writers.items():
+        seconds = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            write()
+            seconds.append(time.perf_counter() - start)
+            os.remove(output)
+        stats = summarize(seconds)
+        stats['mb_per_s'] = size_mb / stats['median']
+        result['writers'][name] = stats
+    return result
+
+
+def compare_reports(old_report, new_report):
+    """Print median latency changes per phase for cases present in both reports"""
+    def case_key(case):
+        return case['format'], case['payload_bytes'], case.get('layout', 'sequential')
+    
+    old_cases = {case_key(c): c for c in old_report['results']}
+    print(f"\nComparison vs {old_report.get('commit') or 'baseline'} (median ms, change):")
+    for case in new_report['results']:
+        old = old_cases.get(case_key(case))
+        if not old:
+            continue
+        print(f"  {case['format'].upper()} {case['payload_bytes']} bytes {case.get('layout', 'sequential')}")
+        for phase in PHASES:
+            before = old['phases'].get(phase, {}).get('median')
+            after = case['phases'][phase]['median']
+            if before:
+                print(f"    {phase:<14}{before * 1000:9.2f} -> {after * 1000:9.2f}  "
+                      f"({(after - before) / before:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="encodes per case (default 5)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 200_000],
+                        help="payload sizes in bytes")
+    parser.add_argument('--formats', nargs='+', default=['wav', 'flac'], choices=['wav', 'flac'])
+    parser.add_argument('--layouts', nargs='+', default=['sequential'], choices=list(EMBEDDING_LAYOUTS),
+                        help="embedding layouts to compare (default sequential)")
+    parser.add_argument('--output', default=None, help="report path (default benchmark_<commit>.json)")
+    parser.add_argument('--compare', default=None, help="previous report to compare against")
+    parser.add_argument('--wav-write-mb', type=int, default=None,
+                        help="only time writing a WAV output of this many MB (e.g. 1024)")
+    args = parser.parse_args(argv)
+
+    output_path = os.path.abspath(args.output or f"benchmark_{git_commit() or 'local'}.json")
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': args.runs,
+        'results': [],
+    }
+
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="stego_bench_") as work_dir, \
+            LocalSMTPSink(keep_messages=False) as sink:
+        # DB_FILE is relative, so history rows land in a throwaway database
+        os.chdir(work_dir)
+        try:
+            if args.wav_write_mb:
+                print(f"⏱️ WAV write {args.wav_write_mb} MB x {args.runs}")
+                report['wav_write'] = run_wav_write(work_dir, args.wav_write_mb, args.runs)
+            for audio_format in ([] if args.wav_write_mb else args.formats):
+                for size in args.sizes:
+                    for layout in args.layouts:
+                        print(f"⏱️ {audio_format.upper()} payload {size} bytes, {layout} x {args.runs}")
+                        report['results'].append(run_case(work_dir, sink, audio_format, size, args.runs, layout))
+        finally:
+            os.chdir(original_cwd)
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if 'wav_write' in report:
+        mode = "streamed" if report['wav_write']['streamed'] else "in memory"
+        print(f"\nWAV write, {report['wav_write']['size_mb']} MB {mode} (median):")
+        for name, stats in report['wav_write']['writers'].items():
+            print(f"  {name:<14}{stats['median'] * 1000:10.1f}ms  {stats['mb_per_s']:8.1f} MB/s")
+
+    print(f"\n{'case':<32}" + "".join(f"{phase:>12}" for phase in PHASES))
+    for case in report['results']:
+        label = f"{case['format'].upper()} {case['payload_bytes']}B {case['layout']}"
+        print(f"{label:<32}" + "".join(f"{case['phases'][p]['median'] * 1000:>10.2f}ms" for p in PHASES))
+    print(f"\n📄 Report written to {output_path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
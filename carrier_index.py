@@ -0,0 +1,132 @@
+# carrier_index.py
+import os
+from bisect import bisect_left
+from audio_format_handler import AudioFormatHandler
+from database import DatabaseManager
+
+CARRIER_EXTENSIONS = ('.wav', '.flac', '.rf64', '.w64')
+
+
+def required_samples(payload_bytes, lsb_depth=1):
+    """Samples needed to hold payload_bytes plus the 32-bit length header"""
+    return -(-(32 + payload_bytes * 8) // lsb_depth)
+
+
+class CarrierIndex:
+    """Library of scanned carriers in the carrier_index table, for automatic carrier selection.
+
+    Rows are kept sorted by total sample count in memory, so picking the
+    smallest carrier that fits a payload is a bisect, at any LSB depth. Each
+    directory scope is loaded once and reused until a scan changes the index,
+    so keep one CarrierIndex around rather than creating one per pick.
+    """
+
+    def __init__(self, db=None, handler=None):
+        self.db = db or DatabaseManager()
+        self.handler = handler or AudioFormatHandler()
+        self._scopes = {}  # None (whole index) or tuple of directories -> (rows, total_samples)
+
+    def scan(self, directories, recursive=True):
+        """Index every WAV/FLAC under directories; unchanged files are skipped by stat fingerprint.
+
+        Returns (indexed, unchanged, removed) counts.
+        """
+        if isinstance(directories, str):
+            directories = [directories]
+        indexed = unchanged = 0
+        stale = []
+        for directory in directories:
+            known = {row['file_path']: row for row in self.db.get_carriers(directory)
+                     if recursive or os.path.dirname(row['file_path']) == os.path.abspath(directory)}
+            seen = set()
+            for file_path in self._walk(directory, recursive):
+                file_path = os.path.abspath(file_path)
+                seen.add(file_path)
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                row = known.get(file_path)
+                if row and (row['file_size'], row['file_mtime_ns']) == (st.st_size, st.st_mtime_ns):
+                    unchanged += 1
+                    continue
+                if self._index_file(file_path, st):
+                    indexed += 1
+                elif row:
+                    stale.append(file_path)
+            stale.extend(path for path in known if path not in seen)
+
+        if stale:
+            self.db.delete_carriers(stale)
+        if indexed or stale:
+            self._scopes.clear()
+        print(f"🎧 Carrier index: {indexed} indexed, {unchanged} unchanged, {len(stale)} removed")
+        return indexed, unchanged, len(stale)
+
+    @staticmethod
+    def _walk(directory, recursive):
+        if recursive:
+            for root, dirs, files in os.walk(directory):
+                for name in files:
+                    if name.lower().endswith(CARRIER_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.lower().endswith(CARRIER_EXTENSIONS):
+                    yield entry.path
+
+    def _index_file(self, file_path, st):
+        format_info = self.handler.detect_format(file_path)
+        if 'error' in format_info:
+            print(f"Skipping carrier {file_path}: {format_info['error']}")
+            return False
+        capacity = self.handler.estimate_capacity(format_info, 0)
+        total_samples = capacity['available_bits'] + 32
+        self.db.save_carrier(file_path, st.st_size, st.st_mtime_ns, format_info, total_samples,
+                             max(0, capacity['available_bits'] // 8))
+        return True
+
+    @staticmethod
+    def _scope(directories):
+        if directories is None:
+            return None
+        if isinstance(directories, str):
+            directories = [directories]
+        return tuple(sorted({os.path.abspath(directory) for directory in directories}))
+
+    def _load(self, directories=None):
+        """(rows, total_samples) for carriers under directories, or the whole index when None"""
+        scope = self._scope(directories)
+        loaded = self._scopes.get(scope)
+        if loaded is None:
+            if scope is None:
+                rows = self.db.get_carriers()  # already ordered by total_samples
+            else:
+                # Nested directories overlap, so merge by path before sorting
+                unique = {row['file_path']: row for directory in scope for row in self.db.get_carriers(directory)}
+                rows = sorted(unique.values(), key=lambda row: (row['total_samples'], row['file_path']))
+            loaded = self._scopes[scope] = (rows, [row['total_samples'] for row in rows])
+        return loaded
+
+    def carriers(self, directories=None):
+        return list(self._load(directories)[0])
+
+    def pick_carrier(self, payload_bytes, lsb_depth=1, audio_format=None, directories=None):
+        """Smallest indexed carrier under directories (anywhere when None) that can hold payload_bytes, or None.
+
+        Candidates are checked against the file on disk; ones that changed or
+        vanished since the scan are skipped (rescan to refresh them).
+        """
+        rows, samples = self._load(directories)
+        start = bisect_left(samples, required_samples(payload_bytes, lsb_depth))
+        for index in range(start, len(rows)):
+            row = rows[index]
+            if audio_format and row['audio_format'] != audio_format:
+                continue
+            try:
+                st = os.stat(row['file_path'])
+            except OSError:
+                continue
+            if (st.st_size, st.st_mtime_ns) == (row['file_size'], row['file_mtime_ns']):
+                return dict(row)
+        return None
@@ -9,7 +9,12 @@ import subprocess
 import platform
 import tempfile
 import shutil
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from seven_zip_runner import (
+    run_7z, SevenZipStalledError, SevenZipCancelledError
+)
 
 DB_FILE = "steganography.db"
 
@@ -146,6 +151,74 @@ class DatabaseManager:
             """
         )
 
+        # ARCHIVE MANIFESTS ---------------------------------------------
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archive_manifests (
+                archive_path      TEXT PRIMARY KEY,
+                archive_size      INTEGER NOT NULL,            -- stat fingerprint
+                archive_mtime_ns  INTEGER NOT NULL,            -- stat fingerprint
+                member_count      INTEGER,
+                total_size        INTEGER,                     -- uncompressed bytes
+                members_json      TEXT,                        -- [[name, size, crc32], ...]
+                verified          BOOLEAN DEFAULT 0,           -- archive known to be intact
+                updated_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+        # EMAIL OUTBOX ---------------------------------------------------
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id                   INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id              INTEGER NOT NULL,
+                receiver_email       TEXT NOT NULL,
+                sender_email         TEXT,
+                audio_path           TEXT NOT NULL,
+                decryption_key       TEXT NOT NULL,
+                data_type            TEXT,
+                audio_format         TEXT,
+                steganography_method TEXT,
+                custom_body          TEXT,
+                status               TEXT DEFAULT 'pending',   -- pending / sending / sent / failed
+                attempts             INTEGER DEFAULT 0,
+                next_attempt_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_error           TEXT,
+                parts_sent           INTEGER DEFAULT 0,        -- split attachments: parts delivered
+                parts_total          INTEGER,                  -- split attachments: parts prepared
+                created_at           TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at              TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)"
+        )
+
+        # CARRIER INDEX --------------------------------------------------
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS carrier_index (
+                file_path      TEXT PRIMARY KEY,
+                file_size      INTEGER NOT NULL,               -- stat fingerprint
+                file_mtime_ns  INTEGER NOT NULL,               -- stat fingerprint
+                audio_format   TEXT,
+                sample_rate    INTEGER,
+                channels       INTEGER,
+                bit_depth      INTEGER,
+                duration       REAL,
+                total_samples  INTEGER NOT NULL,               -- capacity at any LSB depth derives from this
+                capacity_bytes INTEGER NOT NULL,               -- payload bytes at 1 LSB per sample
+                indexed_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_carrier_index_samples ON carrier_index (total_samples)"
+        )
+
         self.conn.commit()
 
     # -------------------------------------------------------------------
@@ -172,6 +245,14 @@ class DatabaseManager:
             ("user_preferences", "enable_7zip_encryption", "BOOLEAN DEFAULT 1"),
             ("user_preferences", "enable_folder_hiding", "BOOLEAN DEFAULT 0"),
             ("user_preferences", "compression_level", "INTEGER DEFAULT 9"),
+            # Per-user SMTP endpoint (NULL = Gmail defaults)
+            ("credentials", "smtp_host", "TEXT"),
+            ("credentials", "smtp_port", "INTEGER"),
+            ("credentials", "smtp_security", "TEXT"),
+            ("credentials", "smtp_timeout", "REAL"),
+            # Resume split attachments where the last attempt stopped
+            ("email_outbox", "parts_sent", "INTEGER DEFAULT 0"),
+            ("email_outbox", "parts_total", "INTEGER"),
         ]
 
         for table, col, coltype in new_cols:
@@ -233,13 +314,32 @@ class DatabaseManager:
         self.conn.commit()
         return True, "Security preferences updated successfully"
 
-    def create_7zip_archive(self, folder_path, archive_path, password, compression_level=9):
-        """Create encrypted 7-Zip archive from folder"""
+    def create_7zip_archive(self, folder_path, archive_path, password, compression_level=9, threads=None,
+                            progress_callback=None, cancel_event=None, stall_timeout=None):
+        """Create encrypted 7-Zip archive from folder
+        
+        stall_timeout (seconds without 7-Zip output) defaults to one scaled to the folder size.
+        """
+        success, message, members = self._build_7zip_archive(
+            folder_path, archive_path, password, compression_level, threads,
+            progress_callback, cancel_event, stall_timeout
+        )
+        if success:
+            self.save_archive_manifest(archive_path, members)
+        return success, message
+
+    @staticmethod
+    def _build_7zip_archive(folder_path, archive_path, password, compression_level=9, threads=None,
+                            progress_callback=None, cancel_event=None, stall_timeout=None):
+        """Run 7-Zip for one folder without touching the database (safe to call from worker threads)"""
         try:
             # Remove existing archive
             if os.path.exists(archive_path):
                 os.remove(archive_path)
 
+            # Record what goes into the archive while the plain folder is still there
+            members = DatabaseManager.collect_folder_manifest(folder_path)
+
             # 7-Zip command for creating encrypted archive
             cmd = [
                 '7z', 'a',                      # Add to archive
@@ -251,22 +351,39 @@ class DatabaseManager:
                 archive_path,                   # Output archive
                 f'{folder_path}/*'              # Input folder contents
             ]
+            if threads:
+                cmd.insert(-2, f'-mmt={threads}')   # Cap 7-Zip's own worker threads
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            result = run_7z(cmd, progress_callback=progress_callback, cancel_event=cancel_event,
+                            total_bytes=sum(m[1] for m in members), stall_timeout=stall_timeout)
 
             if result.returncode == 0:
-                return True, f"7-Zip archive created successfully: {os.path.basename(archive_path)}"
+                return True, f"7-Zip archive created successfully: {os.path.basename(archive_path)}", members
             else:
-                return False, f"7-Zip error: {result.stderr.strip() or 'Unknown error'}"
-
-        except subprocess.TimeoutExpired:
-            return False, "7-Zip operation timed out - folder may be too large"
+                return False, f"7-Zip error: {result.stderr.strip() or 'Unknown error'}", None
+
+        except SevenZipStalledError as e:
+            DatabaseManager._remove_partial_archive(archive_path)
+            return False, f"7-Zip stopped making progress for {e.stall_timeout:.0f} seconds", None
+        except SevenZipCancelledError:
+            DatabaseManager._remove_partial_archive(archive_path)
+            return False, "7-Zip operation cancelled", None
         except FileNotFoundError:
-            return False, "7-Zip command not found - please install 7-Zip"
+            return False, "7-Zip command not found - please install 7-Zip", None
         except Exception as e:
-            return False, f"7-Zip archive creation failed: {str(e)}"
+            return False, f"7-Zip archive creation failed: {str(e)}", None
+
+    @staticmethod
+    def _remove_partial_archive(archive_path):
+        """Delete a half-written archive left behind by an aborted 7-Zip run"""
+        try:
+            if os.path.exists(archive_path):
+                os.remove(archive_path)
+        except OSError:
+            pass
 
-    def extract_7zip_archive(self, archive_path, output_path, password):
+    def extract_7zip_archive(self, archive_path, output_path, password,
+                             progress_callback=None, cancel_event=None, stall_timeout=None):
         """Extract 7-Zip archive to specified location"""
         try:
             # Create output directory
@@ -281,18 +398,183 @@ class DatabaseManager:
                 archive_path                    # Archive file
             ]
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            result = run_7z(cmd, progress_callback=progress_callback, cancel_event=cancel_event,
+                            total_bytes=os.path.getsize(archive_path), stall_timeout=stall_timeout)
 
             if result.returncode == 0:
                 return True, f"Archive extracted successfully to: {output_path}"
             else:
                 return False, f"7-Zip extraction error: {result.stderr.strip() or 'Invalid password or corrupted archive'}"
 
-        except subprocess.TimeoutExpired:
-            return False, "7-Zip extraction timed out"
+        except SevenZipStalledError as e:
+            return False, f"7-Zip extraction stopped making progress for {e.stall_timeout:.0f} seconds"
+        except SevenZipCancelledError:
+            return False, "7-Zip extraction cancelled"
         except Exception as e:
             return False, f"7-Zip extraction failed: {str(e)}"
 
+    # ───────────────────────── ARCHIVE MANIFESTS ─────────────────────────
+    @staticmethod
+    def _archive_fingerprint(archive_path):
+        """Cheap stat fingerprint used to detect archives changed behind our back"""
+        st = os.stat(archive_path)
+        return st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def collect_folder_manifest(folder_path, arc_prefix=""):
+        """List (member_name, size, crc32) for every file in a folder, named as 7-Zip stores them"""
+        members = []
+        for root, dirs, files in os.walk(folder_path):
+            for name in files:
+                file_path = os.path.join(root, name)
+                member_name = os.path.relpath(file_path, folder_path).replace(os.sep, "/")
+                if arc_prefix:
+                    member_name = f"{arc_prefix}/{member_name}"
+                crc = 0
+                size = 0
+                with open(file_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        crc = zlib.crc32(chunk, crc)
+                        size += len(chunk)
+                members.append((member_name, size, crc))
+        members.sort()
+        return members
+
+    def save_archive_manifest(self, archive_path, members, verified=False):
+        """Store the member list of an archive we just wrote, keyed by its stat fingerprint
+        
+        Manifests start out unverified; mark_archive_verified sets the flag once
+        `7z t` passed and the stored CRCs matched the archive.
+        """
+        try:
+            archive_size, archive_mtime_ns = self._archive_fingerprint(archive_path)
+            cur = self.conn.cursor()
+            cur.execute(
+                """
+                INSERT OR REPLACE INTO archive_manifests
+                (archive_path, archive_size, archive_mtime_ns, member_count,
+                 total_size, members_json, verified, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (os.path.abspath(archive_path), archive_size, archive_mtime_ns, len(members),
+                 sum(m[1] for m in members), json.dumps([list(m) for m in members]),
+                 verified, datetime.now()),
+            )
+            self.conn.commit()
+            return True, "Archive manifest saved"
+        except Exception as e:
+            print(f"Archive manifest save error: {e}")
+            return False, str(e)
+
+    def get_archive_manifest(self, archive_path):
+        """Return the cached manifest, or None if missing or the archive changed since it was written"""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT archive_size, archive_mtime_ns, member_count, total_size,
+                   members_json, verified, updated_at
+            FROM archive_manifests WHERE archive_path = ?
+            """,
+            (os.path.abspath(archive_path),),
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+
+        try:
+            fingerprint = self._archive_fingerprint(archive_path)
+        except OSError:
+            return None
+        if fingerprint != (row[0], row[1]):
+            return None
+
+        return {
+            "archive_path": archive_path,
+            "archive_size": row[0],
+            "archive_mtime_ns": row[1],
+            "member_count": row[2],
+            "total_size": row[3],
+            "members": [tuple(m) for m in json.loads(row[4])] if row[4] else None,
+            "verified": bool(row[5]),
+            "updated_at": row[6],
+        }
+
+    def mark_archive_verified(self, archive_path):
+        """Refresh the fingerprint after `7z t` passed and the manifest CRCs matched the archive"""
+        try:
+            archive_size, archive_mtime_ns = self._archive_fingerprint(archive_path)
+            cur = self.conn.cursor()
+            cur.execute(
+                """
+                UPDATE archive_manifests
+                SET archive_size = ?, archive_mtime_ns = ?, verified = 1, updated_at = ?
+                WHERE archive_path = ?
+                """,
+                (archive_size, archive_mtime_ns, datetime.now(), os.path.abspath(archive_path)),
+            )
+            if not cur.rowcount:
+                # Archive written by an older version - members are unknown
+                cur.execute(
+                    """
+                    INSERT INTO archive_manifests
+                    (archive_path, archive_size, archive_mtime_ns, verified, updated_at)
+                    VALUES (?, ?, ?, 1, ?)
+                    """,
+                    (os.path.abspath(archive_path), archive_size, archive_mtime_ns, datetime.now()),
+                )
+            self.conn.commit()
+            return True, "Archive marked as verified"
+        except Exception as e:
+            return False, f"Failed to update archive manifest: {e}"
+
+    def delete_archive_manifest(self, archive_path):
+        """Forget the manifest of an archive"""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM archive_manifests WHERE archive_path = ?", (os.path.abspath(archive_path),))
+        self.conn.commit()
+
+    # ─────────────────────────── CARRIER INDEX ───────────────────────────
+    def save_carrier(self, file_path, file_size, file_mtime_ns, format_info, total_samples, capacity_bytes):
+        """Insert or refresh one indexed carrier"""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT OR REPLACE INTO carrier_index
+            (file_path, file_size, file_mtime_ns, audio_format, sample_rate, channels,
+             bit_depth, duration, total_samples, capacity_bytes, indexed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (os.path.abspath(file_path), file_size, file_mtime_ns, format_info.get('format'),
+             format_info.get('sample_rate'), format_info.get('channels'), format_info.get('bit_depth'),
+             format_info.get('duration'), total_samples, capacity_bytes, datetime.now()),
+        )
+        self.conn.commit()
+
+    def get_carriers(self, directory=None):
+        """Indexed carriers ordered by total_samples (optionally only those under directory)"""
+        cur = self.conn.cursor()
+        query = """
+            SELECT file_path, file_size, file_mtime_ns, audio_format, sample_rate, channels,
+                   bit_depth, duration, total_samples, capacity_bytes
+            FROM carrier_index
+        """
+        params = ()
+        if directory:
+            prefix = os.path.join(os.path.abspath(directory), "")
+            query += " WHERE substr(file_path, 1, ?) = ?"
+            params = (len(prefix), prefix)
+        cur.execute(query + " ORDER BY total_samples, file_path", params)
+        columns = ["file_path", "file_size", "file_mtime_ns", "audio_format", "sample_rate", "channels",
+                   "bit_depth", "duration", "total_samples", "capacity_bytes"]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    def delete_carriers(self, file_paths):
+        """Drop carriers that vanished or stopped being valid audio"""
+        cur = self.conn.cursor()
+        cur.executemany("DELETE FROM carrier_index WHERE file_path = ?",
+                        [(os.path.abspath(p),) for p in file_paths])
+        self.conn.commit()
+
     def hide_folder_windows(self, folder_path):
         """Hide folder using Windows attributes"""
         try:
@@ -399,9 +681,14 @@ class DatabaseManager:
         cur = self.conn.cursor()
         cur.execute(
             """
-            INSERT OR REPLACE INTO credentials
+            INSERT INTO credentials
             (user_id, sender_email, smtp_username, smtp_password, updated_at)
             VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                sender_email = excluded.sender_email,
+                smtp_username = excluded.smtp_username,
+                smtp_password = excluded.smtp_password,
+                updated_at = excluded.updated_at
             """,
             (user_id, sender, smtp_user, smtp_pass, datetime.now()),
         )
@@ -414,6 +701,158 @@ class DatabaseManager:
             (user_id,),
         )
         return cur.fetchone() or ("", "", "")
+
+    def save_smtp_settings(self, user_id, host=None, port=None, security=None, timeout=None):
+        """Store the user's SMTP endpoint; None values fall back to the Gmail defaults"""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO credentials (user_id, smtp_host, smtp_port, smtp_security, smtp_timeout, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                smtp_host = excluded.smtp_host,
+                smtp_port = excluded.smtp_port,
+                smtp_security = excluded.smtp_security,
+                smtp_timeout = excluded.smtp_timeout,
+                updated_at = excluded.updated_at
+            """,
+            (user_id, host or None, port or None, security or None, timeout or None, datetime.now()),
+        )
+        self.conn.commit()
+
+    def get_smtp_settings(self, user_id):
+        """SMTP endpoint dict (host, port, security, timeout); unset values are None"""
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT smtp_host, smtp_port, smtp_security, smtp_timeout FROM credentials WHERE user_id = ?",
+            (user_id,),
+        )
+        row = cur.fetchone() or (None, None, None, None)
+        return {'host': row[0], 'port': row[1], 'security': row[2], 'timeout': row[3]}
+    # ─────────────────────────── EMAIL OUTBOX ──────────────────────────
+    def enqueue_email(self, user_id, receiver_email, sender_email, audio_path, key,
+                      data_type="message", audio_format=None, method=None, custom_body=None):
+        """Queue a key + stego audio email for the background sender; returns the outbox id"""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO email_outbox (user_id, receiver_email, sender_email, audio_path,
+                                      decryption_key, data_type, audio_format,
+                                      steganography_method, custom_body, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, receiver_email, sender_email, audio_path,
+             key.decode() if isinstance(key, bytes) else key,
+             data_type, audio_format, method, custom_body, datetime.now(), datetime.now()),
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def get_due_outbox_emails(self, limit=20):
+        """Pending emails whose next attempt is due, oldest first"""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT id, user_id, receiver_email, sender_email, audio_path, decryption_key,
+                   data_type, audio_format, steganography_method, custom_body, attempts,
+                   COALESCE(parts_sent, 0), parts_total
+            FROM email_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at
+            LIMIT ?
+            """,
+            (datetime.now(), limit),
+        )
+        return cur.fetchall()
+
+    def get_next_outbox_due_time(self):
+        """When the earliest pending email becomes due (None if the outbox is empty)"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT MIN(next_attempt_at) FROM email_outbox WHERE status = 'pending'")
+        row = cur.fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def update_outbox_status(self, outbox_id, status, error=None, next_attempt_at=None):
+        """Move an outbox email to sending / sent / pending (retry) / failed"""
+        cur = self.conn.cursor()
+        if status == "sending":
+            cur.execute(
+                "UPDATE email_outbox SET status = 'sending', attempts = attempts + 1 WHERE id = ?",
+                (outbox_id,),
+            )
+        elif status == "sent":
+            cur.execute(
+                "UPDATE email_outbox SET status = 'sent', last_error = NULL, sent_at = ? WHERE id = ?",
+                (datetime.now(), outbox_id),
+            )
+        else:
+            cur.execute(
+                """
+                UPDATE email_outbox SET status = ?, last_error = ?,
+                       next_attempt_at = COALESCE(?, next_attempt_at)
+                WHERE id = ?
+                """,
+                (status, error, next_attempt_at, outbox_id),
+            )
+        self.conn.commit()
+
+    def update_outbox_progress(self, outbox_id, parts_sent, parts_total):
+        """Record how many parts of a split attachment were delivered, so a retry resumes after them"""
+        cur = self.conn.cursor()
+        cur.execute(
+            "UPDATE email_outbox SET parts_sent = ?, parts_total = ? WHERE id = ?",
+            (parts_sent, parts_total, outbox_id),
+        )
+        self.conn.commit()
+
+    def requeue_interrupted_emails(self):
+        """Emails left in 'sending' by a crash or exit go back to pending"""
+        cur = self.conn.cursor()
+        cur.execute("UPDATE email_outbox SET status = 'pending' WHERE status = 'sending'")
+        self.conn.commit()
+        return cur.rowcount
+
+    def get_outbox_status(self, outbox_id):
+        """Delivery status of one queued email"""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT id, receiver_email, status, attempts, next_attempt_at, last_error,
+                   created_at, sent_at, COALESCE(parts_sent, 0), parts_total
+            FROM email_outbox WHERE id = ?
+            """,
+            (outbox_id,),
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "receiver_email": row[1],
+            "status": row[2],
+            "attempts": row[3],
+            "next_attempt_at": row[4],
+            "last_error": row[5],
+            "created_at": row[6],
+            "sent_at": row[7],
+            "parts_sent": row[8],
+            "parts_total": row[9],
+        }
+
+    def get_user_outbox(self, user_id, limit=50):
+        """Recent queued emails for a user, newest first"""
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT id, receiver_email, data_type, status, attempts, last_error, created_at, sent_at
+            FROM email_outbox WHERE user_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (user_id, limit),
+        )
+        return cur.fetchall()
+
     # Add this to your DatabaseManager class
     def save_log(self, user_id, history_id, operation, data_type, message):
         """Save operation log"""
@@ -817,70 +1256,171 @@ class DatabaseManager:
         except Exception as e:
             return False, f"Failed to create secure folder: {str(e)}", None
 
-    def secure_folder_now(self, folder_id, password, user_id):
+    def _prepare_folder_for_securing(self, folder_id, password, user_id):
+        """Validate a folder before archiving; returns (success, message, job)"""
+        # Get folder info
+        folder_info = self.get_folder_info(folder_id, user_id)
+        if not folder_info:
+            return False, "Folder not found", None
+        
+        folder_path = folder_info[2]
+        folder_name = folder_info[1]
+        archive_path = folder_info[7]  # archive_path column
+        
+        # Verify folder password
+        verify_success, verify_msg = self.verify_folder_password(folder_id, password, user_id)
+        if not verify_success:
+            return False, f"Password verification failed: {verify_msg}", None
+        
+        # Check if folder exists
+        if not os.path.exists(folder_path):
+            return False, f"Folder does not exist: {folder_path}", None
+        
+        # Check if archive already exists and folder is gone (already secured)
+        if archive_path and os.path.exists(archive_path) and not os.path.exists(folder_path):
+            return False, f"Folder '{folder_name}' is already secured as encrypted archive", None
+        
+        # Ensure archive path is set
+        if not archive_path:
+            archive_path = folder_path + "_secure.7z"
+        
+        job = {
+            "folder_id": folder_id,
+            "folder_name": folder_name,
+            "folder_path": folder_path,
+            "archive_path": archive_path,
+            "password": password,
+        }
+        return True, "Ready to secure", job
+
+    def _finalize_secured_folder(self, job, members, user_id):
+        """Remove the plain folder and record the archive once 7-Zip succeeded"""
+        self.save_archive_manifest(job["archive_path"], members)
+        
+        # Remove original folder for security
+        shutil.rmtree(job["folder_path"])
+        
+        # Update database
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            UPDATE secure_folders 
+            SET is_encrypted = ?, archive_path = ?, last_used = ?
+            WHERE id = ?
+            """,
+            (True, job["archive_path"], datetime.now(), job["folder_id"])
+        )
+        self.conn.commit()
+        
+        # Log the operation
+        self.save_log(user_id, None, "7zip_encryption", "secure_folder", 
+                    f"Folder secured as 7-Zip archive: {job['folder_name']}")
+        
+        return True, f"✅ Folder '{job['folder_name']}' secured successfully!\n📦 Archive: {os.path.basename(job['archive_path'])}\n🎯 Double-click .7z file to access with your password!"
+
+    def secure_folder_now(self, folder_id, password, user_id, stall_timeout=None):
         """Convert folder to encrypted 7-Zip archive (user-controlled)"""
         try:
-            # Get folder info
-            folder_info = self.get_folder_info(folder_id, user_id)
-            if not folder_info:
-                return False, "Folder not found"
-            
-            folder_path = folder_info[2]
-            folder_name = folder_info[1]
-            archive_path = folder_info[7]  # archive_path column
-            
-            # Verify folder password
-            verify_success, verify_msg = self.verify_folder_password(folder_id, password, user_id)
-            if not verify_success:
-                return False, f"Password verification failed: {verify_msg}"
-            
-            # Check if folder exists
-            if not os.path.exists(folder_path):
-                return False, f"Folder does not exist: {folder_path}"
-            
-            # Check if archive already exists and folder is gone (already secured)
-            if archive_path and os.path.exists(archive_path) and not os.path.exists(folder_path):
-                return False, f"Folder '{folder_name}' is already secured as encrypted archive"
-            
-            # Ensure archive path is set
-            if not archive_path:
-                archive_path = folder_path + "_secure.7z"
+            ready, ready_msg, job = self._prepare_folder_for_securing(folder_id, password, user_id)
+            if not ready:
+                return False, ready_msg
             
             # Get compression level
             _, _, compression_level = self.get_user_security_preferences(user_id)
             
             # Create 7-Zip archive
-            archive_success, archive_msg = self.create_7zip_archive(
-                folder_path, archive_path, password, compression_level
+            archive_success, archive_msg, members = self._build_7zip_archive(
+                job["folder_path"], job["archive_path"], password, compression_level,
+                stall_timeout=stall_timeout
             )
             
             if archive_success:
-                # Remove original folder for security
-                shutil.rmtree(folder_path)
-                
-                # Update database
-                cur = self.conn.cursor()
-                cur.execute(
-                    """
-                    UPDATE secure_folders 
-                    SET is_encrypted = ?, archive_path = ?, last_used = ?
-                    WHERE id = ?
-                    """,
-                    (True, archive_path, datetime.now(), folder_id)
-                )
-                self.conn.commit()
-                
-                # Log the operation
-                self.save_log(user_id, None, "7zip_encryption", "secure_folder", 
-                            f"Folder secured as 7-Zip archive: {folder_name}")
-                
-                return True, f"✅ Folder '{folder_name}' secured successfully!\n📦 Archive: {os.path.basename(archive_path)}\n🎯 Double-click .7z file to access with your password!"
+                return self._finalize_secured_folder(job, members, user_id)
             else:
                 return False, f"7-Zip archive creation failed: {archive_msg}"
                 
         except Exception as e:
             return False, f"Error securing folder: {str(e)}"
 
+    def secure_folders_now(self, folder_passwords, user_id, max_workers=None,
+                           threads_per_archive=2, progress_callback=None, cancel_event=None,
+                           stall_timeout=None):
+        """Secure several folders at once on a bounded pool of 7-Zip workers.
+
+        folder_passwords maps folder_id -> password. Each 7-Zip run is capped at
+        threads_per_archive threads and the pool is sized so the runs together
+        roughly fill the CPUs. progress_callback(folder_id, state, message) is
+        called with state 'queued', 'done' or 'failed' from this thread and with
+        'progress' (percent text) from the worker threads. Setting cancel_event
+        aborts running and queued archives; stall_timeout overrides the
+        size-scaled 7-Zip stall timeout.
+        A failing folder never stops the rest; returns {folder_id: (success, message)}.
+        """
+        results = {}
+
+        def report(folder_id, state, message):
+            if progress_callback:
+                try:
+                    progress_callback(folder_id, state, message)
+                except Exception as e:
+                    print(f"Progress callback error: {e}")
+
+        # Password checks and DB reads stay on this thread (shared connection)
+        jobs = []
+        for folder_id, password in folder_passwords.items():
+            try:
+                ready, ready_msg, job = self._prepare_folder_for_securing(folder_id, password, user_id)
+            except Exception as e:
+                ready, ready_msg, job = False, f"Error securing folder: {str(e)}", None
+            if ready:
+                jobs.append(job)
+                report(folder_id, "queued", ready_msg)
+            else:
+                results[folder_id] = (False, ready_msg)
+                report(folder_id, "failed", ready_msg)
+
+        if not jobs:
+            return results
+
+        _, _, compression_level = self.get_user_security_preferences(user_id)
+        threads_per_archive = max(1, threads_per_archive)
+        if max_workers is None:
+            max_workers = (os.cpu_count() or 1) // threads_per_archive
+        max_workers = max(1, min(max_workers, len(jobs)))
+
+        def folder_progress(folder_id):
+            def on_progress(progress):
+                text = f"{progress['percent']}%"
+                if progress['bytes_per_sec']:
+                    text += f" ({progress['bytes_per_sec'] / (1024 * 1024):.1f} MB/s"
+                    if progress['eta'] is not None:
+                        text += f", ~{progress['eta']:.0f}s left"
+                    text += ")"
+                report(folder_id, "progress", text)
+            return on_progress
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(self._build_7zip_archive, job["folder_path"], job["archive_path"],
+                            job["password"], compression_level, threads_per_archive,
+                            folder_progress(job["folder_id"]), cancel_event, stall_timeout): job
+                for job in jobs
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    archive_success, archive_msg, members = future.result()
+                    if archive_success:
+                        outcome = self._finalize_secured_folder(job, members, user_id)
+                    else:
+                        outcome = (False, f"7-Zip archive creation failed: {archive_msg}")
+                except Exception as e:
+                    outcome = (False, f"Error securing folder: {str(e)}")
+                results[job["folder_id"]] = outcome
+                report(job["folder_id"], "done" if outcome[0] else "failed", outcome[1])
+
+        return results
+
     def access_secure_folder(self, folder_id, password, user_id):
         """Access secure folder (extract from 7-Zip if needed)"""
         try:
@@ -0,0 +1,143 @@
+# email_outbox.py
+import random
+import threading
+from datetime import datetime, timedelta
+from database import DatabaseManager
+from email_utils import deliver_stego_email, publish_notification
+from attachment_prep import (
+    prepare_stego_attachment, cleanup_prepared_attachment, DEFAULT_MAX_ATTACHMENT_BYTES
+)
+
+
+class EmailOutboxWorker(threading.Thread):
+    """Background sender that drains the email_outbox table.
+
+    Failed sends are retried with exponential backoff (base_delay doubling per
+    attempt, capped at max_delay, with jitter) until max_attempts is reached,
+    after which the email is marked 'failed'.
+
+    Before sending, WAV attachments are re-encoded to FLAC and anything larger
+    than max_attachment_bytes is split across several emails. Delivered parts
+    are recorded, so a retry resumes with the part that failed.
+    """
+
+    def __init__(self, poll_interval=30, base_delay=5, max_delay=900, max_attempts=8,
+                 max_attachment_bytes=DEFAULT_MAX_ATTACHMENT_BYTES, convert_wav=True):
+        super().__init__(name="EmailOutboxWorker", daemon=True)
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.max_attachment_bytes = max_attachment_bytes
+        self.convert_wav = convert_wav
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    def wake(self):
+        """Check the outbox now instead of waiting for the next poll"""
+        self._wake_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before the next attempt after `attempts` failures"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def run(self):
+        # SQLite connections are per thread, so the worker opens its own
+        db = DatabaseManager()
+        db.requeue_interrupted_emails()
+
+        while not self._stop_event.is_set():
+            try:
+                for item in db.get_due_outbox_emails():
+                    if self._stop_event.is_set():
+                        break
+                    self._deliver(db, item)
+                wait = self.poll_interval
+                next_due = db.get_next_outbox_due_time()
+                if next_due:
+                    wait = max(0.1, min(wait, (next_due - datetime.now()).total_seconds()))
+            except Exception as e:
+                print(f"Email outbox error: {e}")
+                wait = self.poll_interval
+
+            self._wake_event.wait(wait)
+            self._wake_event.clear()
+
+    def _deliver(self, db, item):
+        (outbox_id, user_id, receiver_email, sender_email, audio_path, key,
+         data_type, audio_format, method, custom_body, attempts, parts_sent, parts_total) = item
+
+        db.update_outbox_status(outbox_id, "sending")
+        attempts += 1
+        prepared = None
+        try:
+            saved_sender, smtp_username, smtp_password = db.get_credentials(user_id)
+            smtp_settings = db.get_smtp_settings(user_id)
+            prepared = prepare_stego_attachment(audio_path, self.max_attachment_bytes, self.convert_wav)
+            total = prepared['parts']
+            # Same file and size limit give the same split; if it changed, start over
+            first = parts_sent + 1 if parts_total == total else 1
+            for index, part_path in enumerate(prepared['paths'], 1):
+                if index < first:
+                    continue
+                deliver_stego_email(receiver_email, key.encode(), part_path,
+                                    sender_email or saved_sender, smtp_username, smtp_password,
+                                    data_type, prepared['audio_format'], method, custom_body,
+                                    smtp_settings=smtp_settings,
+                                    part=(index, total) if total > 1 else None)
+                if total > 1:
+                    db.update_outbox_progress(outbox_id, index, total)
+            db.update_outbox_status(outbox_id, "sent")
+            print(f"📧 Outbox email {outbox_id} sent to {receiver_email} ({prepared['message']})")
+            publish_notification('info', "Email Sent",
+                                 f"Encoded {data_type} sent to {receiver_email}",
+                                 outbox_id=outbox_id, receiver_email=receiver_email)
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                db.update_outbox_status(outbox_id, "failed", error=str(e))
+                print(f"❌ Outbox email {outbox_id} failed after {attempts} attempts: {e}")
+                publish_notification('error', "Email Failed",
+                                     f"Could not send to {receiver_email} after {attempts} attempts:\n{e}",
+                                     outbox_id=outbox_id, receiver_email=receiver_email)
+            else:
+                next_attempt = datetime.now() + timedelta(seconds=self.retry_delay(attempts))
+                db.update_outbox_status(outbox_id, "pending", error=str(e), next_attempt_at=next_attempt)
+                print(f"⚠️ Outbox email {outbox_id} attempt {attempts} failed, retrying at "
+                      f"{next_attempt.strftime('%H:%M:%S')}: {e}")
+        finally:
+            cleanup_prepared_attachment(prepared)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_outbox_worker():
+    """Start the shared outbox worker once per process and return it"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = EmailOutboxWorker()
+            _worker.start()
+        return _worker
+
+
+def queue_email(user_id, receiver_email, key, audio_path, sender_email=None, data_type="message",
+                audio_format=None, steganography_method=None, custom_body=None, db=None):
+    """Queue a key + stego audio email and return its outbox id immediately"""
+    db = db or DatabaseManager()
+    outbox_id = db.enqueue_email(user_id, receiver_email, sender_email, audio_path, key,
+                                 data_type, audio_format, steganography_method, custom_body)
+    start_outbox_worker().wake()
+    return outbox_id
+
+
+def get_delivery_status(outbox_id, db=None):
+    """Delivery status dict for a queued email ('pending', 'sending', 'sent' or 'failed')"""
+    db = db or DatabaseManager()
+    return db.get_outbox_status(outbox_id)
@@ -1,19 +1,361 @@
 import smtplib
-from email.mime.multipart import MIMEMultipart
+import base64
+import re
+import uuid
+import hashlib
+from email import policy
+from email.utils import formatdate, make_msgid
 from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
 import os
-from tkinter import messagebox
+import time
+import atexit
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
 
-def send_email(receiver_email, key, audio_path, sender_email, smtp_username, smtp_password, 
-               data_type="message", audio_format=None, steganography_method=None, custom_body=None):
-    """Enhanced email sending with custom body support for informative emails"""
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+SMTP_TIMEOUT = 30
+
+# 'starttls' upgrades a plain connection (port 587), 'ssl' is implicit TLS (port 465),
+# 'none' is an unencrypted session for trusted relays and the local test sink
+SMTP_SECURITY_MODES = ("starttls", "ssl", "none")
+
+
+class EmailError(Exception):
+    """Base class for email delivery failures"""
+
+
+class EmailAttachmentError(EmailError):
+    """An attachment could not be read"""
+
+
+class EmailSendError(EmailError):
+    """The SMTP server could not be reached or rejected the message"""
+
+
+class EmailAuthenticationError(EmailSendError):
+    """The SMTP server rejected the username/password"""
+
+
+# Notification listeners - the GUI subscribes to turn these into message boxes,
+# so nothing in this module touches tkinter and sends can run from any thread
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+def subscribe_notifications(callback):
+    """Register callback(event) for send notifications; returns the callback"""
+    with _listeners_lock:
+        _listeners.append(callback)
+    return callback
+
+
+def unsubscribe_notifications(callback):
+    with _listeners_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def publish_notification(level, title, message, **details):
+    """Tell subscribers about a send result. level is 'info' or 'error'.
+    
+    Callbacks run on the sending thread; without subscribers the event is printed.
+    """
+    event = {'level': level, 'title': title, 'message': message, **details}
+    with _listeners_lock:
+        listeners = list(_listeners)
+    if not listeners:
+        print(f"{'❌' if level == 'error' else '📧'} {title}: {message}")
+    for callback in listeners:
+        try:
+            callback(event)
+        except Exception as e:
+            print(f"Email notification callback error: {e}")
+
+
+def resolve_smtp_settings(smtp_settings=None):
+    """Fill in Gmail defaults for any SMTP endpoint setting that is missing"""
+    smtp_settings = smtp_settings or {}
+    security = (smtp_settings.get('security') or "starttls").lower()
+    if security not in SMTP_SECURITY_MODES:
+        raise ValueError(f"Unknown SMTP security mode: {security}")
+    return {
+        'host': smtp_settings.get('host') or SMTP_HOST,
+        'port': int(smtp_settings.get('port') or (465 if security == "ssl" else SMTP_PORT)),
+        'security': security,
+        'timeout': float(smtp_settings.get('timeout') or SMTP_TIMEOUT),
+    }
+
+
+def open_smtp_connection(host, port, security="starttls", timeout=SMTP_TIMEOUT):
+    """Open an SMTP session using the requested transport security"""
+    if security == "ssl":
+        return smtplib.SMTP_SSL(host, port, timeout=timeout)
+    server = smtplib.SMTP(host, port, timeout=timeout)
+    if security == "starttls":
+        try:
+            server.starttls()
+        except Exception:
+            server.close()
+            raise
+    return server
+
+
+# Attachments are read in multiples of 57 bytes so every chunk encodes to whole 76-char base64 lines
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+
+
+class StreamingEmail:
+    """multipart/mixed message whose attachments are base64-encoded from disk while sending.
+    
+    Only one chunk of each attachment is held in memory at a time, so peak memory
+    stays flat however large the stego audio is. Raises OSError up front when an
+    attachment can't be opened.
+    """
+    
+    def __init__(self, sender_email, receiver_email, subject, body, attachments=(),
+                 chunk_size=ATTACHMENT_CHUNK_SIZE):
+        self.sender_email = sender_email
+        self.receiver_email = receiver_email
+        self.subject = subject
+        self.body = body
+        self.attachments = list(attachments)
+        self.chunk_size = max(57, chunk_size - chunk_size % 57)
+        self.boundary = "=" * 15 + uuid.uuid4().hex + "=="
+        for path in self.attachments:
+            with open(path, "rb"):
+                pass
+    
+    @staticmethod
+    def _header_block(fields):
+        """Folded, CRLF-terminated header lines followed by the blank separator line"""
+        return b"".join(policy.SMTP.fold_binary(name, value) for name, value in fields) + b"\r\n"
+    
+    def _headers(self):
+        return self._header_block([
+            ('Content-Type', f'multipart/mixed; boundary="{self.boundary}"'),
+            ('MIME-Version', "1.0"),
+            ('From', self.sender_email),
+            ('To', self.receiver_email),
+            ('Subject', self.subject),
+            ('Date', formatdate(localtime=True)),
+            ('Message-ID', make_msgid()),
+        ])
+    
+    def _attachment_header(self, path):
+        name = os.path.basename(path)
+        return self._header_block([
+            ('Content-Type', f'application/octet-stream; Name="{name}"'),
+            ('Content-Transfer-Encoding', "base64"),
+            ('Content-Disposition', f'attachment; filename="{name}"'),
+        ])
+    
+    def iter_bytes(self):
+        """Yield the message as CRLF-terminated byte chunks"""
+        delimiter = f"--{self.boundary}\r\n".encode()
+        yield self._headers()
+        yield delimiter
+        yield MIMEText(self.body, 'plain').as_bytes(policy=policy.SMTP)
+        for path in self.attachments:
+            yield b"\r\n" + delimiter
+            yield self._attachment_header(path)
+            with open(path, "rb") as attachment:
+                while True:
+                    chunk = attachment.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+        yield f"\r\n--{self.boundary}--\r\n".encode()
+    
+    def as_bytes(self):
+        return b"".join(self.iter_bytes())
+
+
+_LEADING_DOT_RE = re.compile(rb"(?m)^\.")
+
+
+def _send_streaming(server, from_addr, to_addrs, message):
+    """SMTP transaction that writes the DATA section chunk by chunk (cf. SMTP.sendmail)"""
+    if isinstance(to_addrs, str):
+        to_addrs = [to_addrs]
+    server.ehlo_or_helo_if_needed()
+    
+    code, resp = server.mail(from_addr)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+    refused = {}
+    for addr in to_addrs:
+        code, resp = server.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+    if len(refused) == len(to_addrs):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+    
+    code, resp = server.docmd("data")
+    if code != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(code, resp)
+    for chunk in message.iter_bytes():
+        # Base64 lines never start with '.', but headers and the text body can
+        server.send(_LEADING_DOT_RE.sub(b"..", chunk))
+    server.send(b".\r\n")
+    code, resp = server.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+
+class SMTPConnectionPool:
+    """Keeps logged-in SMTP connections open between sends, keyed by (host, port, security, user, password digest).
+    
+    Connections idle longer than keepalive_interval are probed with NOOP before
+    reuse, connections idle longer than max_idle are dropped, and a send that
+    finds the server gone is retried once on a fresh connection.
+    """
+    
+    def __init__(self, keepalive_interval=60, max_idle=300, max_per_key=4, timeout=30):
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self.max_per_key = max_per_key
+        self.timeout = timeout
+        self._idle = {}  # key -> [(server, last_used), ...]
+        self._lock = threading.Lock()
+    
+    def _connect(self, host, port, username, password, security, timeout):
+        server = open_smtp_connection(host, port, security, timeout or self.timeout)
+        try:
+            if username:
+                server.login(username, password)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+    
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    @staticmethod
+    def _key(host, port, security, username, password):
+        # Include a password digest so a changed password never reuses the old login
+        digest = hashlib.sha256((password or "").encode()).hexdigest()
+        return (host, port, security, username, digest)
+    
+    def acquire(self, host, port, username, password, security="starttls", timeout=None):
+        """Check out a live connection, reusing an idle one when possible"""
+        key = self._key(host, port, security, username, password)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                entry = idle.pop() if idle else None
+            if entry is None:
+                return self._connect(host, port, username, password, security, timeout)
+            
+            server, last_used = entry
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.max_idle:
+                self._close(server)
+                continue
+            if idle_for > self.keepalive_interval:
+                try:
+                    code, _ = server.noop()
+                    if code != 250:
+                        raise smtplib.SMTPServerDisconnected(f"NOOP returned {code}")
+                except (smtplib.SMTPException, OSError):
+                    self._close(server)
+                    continue
+            return server
+    
+    def release(self, host, port, username, password, server, security="starttls"):
+        """Return a healthy connection to the pool"""
+        key = self._key(host, port, security, username, password)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_key:
+                idle.append((server, time.monotonic()))
+                return
+        self._close(server)
+    
+    @contextmanager
+    def connection(self, host, port, username, password, security="starttls", timeout=None):
+        """Borrow a connection; it is dropped instead of returned if anything goes wrong"""
+        server = self.acquire(host, port, username, password, security, timeout)
+        try:
+            yield server
+        except BaseException:
+            self._close(server)
+            raise
+        self.release(host, port, username, password, server, security)
+    
+    def sendmail(self, host, port, username, password, from_addr, to_addrs, msg,
+                 security="starttls", timeout=None):
+        """Send one message, reconnecting once if the pooled connection went away"""
+        for attempt in (1, 2):
+            try:
+                with self.connection(host, port, username, password, security, timeout) as server:
+                    return server.sendmail(from_addr, to_addrs, msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                if attempt == 2:
+                    raise
+    
+    def send_streaming(self, host, port, username, password, from_addr, to_addrs, message,
+                       security="starttls", timeout=None):
+        """Like sendmail, but streams a StreamingEmail instead of a prebuilt string"""
+        for attempt in (1, 2):
+            try:
+                with self.connection(host, port, username, password, security, timeout) as server:
+                    return _send_streaming(server, from_addr, to_addrs, message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                if attempt == 2:
+                    raise
+    
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for server, _ in entries:
+            self._close(server)
+
+
+smtp_pool = SMTPConnectionPool()
+atexit.register(smtp_pool.close_all)
+
+
+def _split_notice(audio_path, part):
+    index, total = part
+    base_name = os.path.basename(audio_path).rsplit(".part", 1)[0]
+    return f"""📦 PART {index} OF {total}
+The encoded audio was too large for one email and was split into {total} parts.
+Save all {total} attachments to one folder and join them in order before decoding:
+  Windows:     copy /b "{base_name}.part*" "{base_name}"
+  macOS/Linux: cat "{base_name}".part* > "{base_name}"
+
+"""
+
+
+def build_stego_email(receiver_email, key, audio_path, sender_email, data_type="message",
+                      audio_format=None, steganography_method=None, custom_body=None, part=None):
+    """Build the key + stego audio message as a StreamingEmail (raises OSError if the audio can't be attached)
+    
+    part=(index, total) marks one piece of a split attachment.
+    """
     
     # Simple subject line
     format_text = f" ({audio_format.upper()})" if audio_format else ""
     subject = f"The Key and Encoded Audio{format_text} ({data_type})"
+    if part:
+        subject += f" - part {part[0]} of {part[1]}"
     
     # Use custom body if provided, otherwise use default message
     if custom_body:
@@ -59,43 +401,77 @@ Encoded: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 Keep this key safe and secure!
 """
     
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = receiver_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(message, 'plain'))
+    if part:
+        message = _split_notice(audio_path, part) + message
+    
+    # Audio is attached while sending, one chunk at a time
+    return StreamingEmail(sender_email, receiver_email, subject, message, [audio_path])
+
+
+def _pool_send(smtp_settings, smtp_username, smtp_password, sender_email, receiver_email, msg):
+    """Send over the shared pool, translating failures into EmailSendError subclasses"""
+    settings = resolve_smtp_settings(smtp_settings)
+    try:
+        return smtp_pool.send_streaming(settings['host'], settings['port'], smtp_username, smtp_password,
+                                        sender_email, receiver_email, msg,
+                                        security=settings['security'], timeout=settings['timeout'])
+    except smtplib.SMTPAuthenticationError as e:
+        raise EmailAuthenticationError(f"Authentication failed: {str(e)}") from e
+    except (smtplib.SMTPException, OSError) as e:
+        raise EmailSendError(f"Failed to send email: {str(e)}") from e
+
+
+def deliver_stego_email(receiver_email, key, audio_path, sender_email, smtp_username, smtp_password,
+                        data_type="message", audio_format=None, steganography_method=None, custom_body=None,
+                        smtp_settings=None, part=None):
+    """Send the key + stego audio without any UI - safe to call from worker threads.
     
-    # Attach audio file (same as your working code)
+    Returns a result dict (success, receiver_email, data_type, audio_format,
+    refused, elapsed_seconds) and raises EmailAttachmentError, EmailAuthenticationError
+    or EmailSendError on failure.
+    """
+    start = time.perf_counter()
     try:
-        with open(audio_path, "rb") as attachment:
-            part = MIMEApplication(attachment.read(), Name=os.path.basename(audio_path))
-            part['Content-Disposition'] = f'attachment; filename="{os.path.basename(audio_path)}"'
-            msg.attach(part)
+        msg = build_stego_email(receiver_email, key, audio_path, sender_email, data_type,
+                                audio_format, steganography_method, custom_body, part)
     except OSError as e:
-        messagebox.showerror("Error", f"Failed to attach audio file: {str(e)}")
-        raise
+        raise EmailAttachmentError(f"Failed to attach audio file: {str(e)}") from e
+    
+    refused = _pool_send(smtp_settings, smtp_username, smtp_password, sender_email, receiver_email, msg)
+    return {
+        'success': True,
+        'receiver_email': receiver_email,
+        'data_type': data_type,
+        'audio_format': audio_format,
+        'refused': refused or {},
+        'elapsed_seconds': time.perf_counter() - start,
+    }
+
+
+def send_email(receiver_email, key, audio_path, sender_email, smtp_username, smtp_password, 
+               data_type="message", audio_format=None, steganography_method=None, custom_body=None,
+               smtp_settings=None):
+    """Enhanced email sending with custom body support for informative emails"""
     
-    # Send email (exactly like your working code)
     try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.sendmail(sender_email, receiver_email, msg.as_string())
-        server.quit()
-        
-        # Enhanced success message
-        success_msg = "Email sent successfully!"
-        if audio_format:
-            success_msg += f"\n\nEncoded {data_type} in {audio_format.upper()} format sent to {receiver_email}"
-        
-        messagebox.showinfo("Success", success_msg)
-        
-    except smtplib.SMTPException as e:
-        messagebox.showerror("Error", f"Failed to send email: {str(e)}")
+        result = deliver_stego_email(receiver_email, key, audio_path, sender_email, smtp_username,
+                                     smtp_password, data_type, audio_format, steganography_method,
+                                     custom_body, smtp_settings)
+    except EmailError as e:
+        publish_notification('error', "Error", str(e), receiver_email=receiver_email)
         raise
+    
+    # Enhanced success message
+    success_msg = "Email sent successfully!"
+    if audio_format:
+        success_msg += f"\n\nEncoded {data_type} in {audio_format.upper()} format sent to {receiver_email}"
+    
+    publish_notification('info', "Success", success_msg, receiver_email=receiver_email)
+    return result
 
 
-def send_data_export_email(receiver_email, export_files, sender_email, smtp_username, smtp_password, export_format):
+def send_data_export_email(receiver_email, export_files, sender_email, smtp_username, smtp_password, export_format,
+                           smtp_settings=None):
     """Send data export using the same reliable method"""
     
     subject = f"Your Audio Steganography Data Export ({export_format.upper()})"
@@ -112,37 +488,25 @@ This data contains your complete steganography history and settings.
 Keep these files secure.
 """
     
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = receiver_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(message, 'plain'))
-    
-    # Attach all export files
+    # Attach all export files (streamed from disk while sending)
     try:
-        for file_path in export_files:
-            with open(file_path, "rb") as attachment:
-                part = MIMEApplication(attachment.read(), Name=os.path.basename(file_path))
-                part['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-                msg.attach(part)
+        msg = StreamingEmail(sender_email, receiver_email, subject, message, export_files)
     except OSError as e:
-        messagebox.showerror("Error", f"Failed to attach export files: {str(e)}")
+        publish_notification('error', "Error", f"Failed to attach export files: {str(e)}",
+                             receiver_email=receiver_email)
         return False
     
-    # Send using the same reliable method
+    # Send using the same pooled connection
     try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.sendmail(sender_email, receiver_email, msg.as_string())
-        server.quit()
-        
-        messagebox.showinfo("Export Sent", f"Data export sent successfully to {receiver_email}!")
-        return True
-        
-    except smtplib.SMTPException as e:
-        messagebox.showerror("Export Send Failed", f"Failed to send export: {str(e)}")
+        _pool_send(smtp_settings, smtp_username, smtp_password, sender_email, receiver_email, msg)
+    except EmailSendError as e:
+        publish_notification('error', "Export Send Failed", f"Failed to send export: {str(e)}",
+                             receiver_email=receiver_email)
         return False
+    
+    publish_notification('info', "Export Sent", f"Data export sent successfully to {receiver_email}!",
+                         receiver_email=receiver_email)
+    return True
 
 
 def show_password_info():
@@ -156,6 +520,7 @@ def show_password_info():
         "5. Copy the 16-character code (no spaces) and paste here.\n"
         "Note: If spaces appear, remove them."
     )
+    from tkinter import messagebox
     messagebox.showinfo("SMTP Password Guide", info_text)
 
 
@@ -185,17 +550,20 @@ def validate_email_address(email):
     return False, "Invalid email format"
 
 
-def test_smtp_connection(smtp_username, smtp_password, sender_email):
+def test_smtp_connection(smtp_username, smtp_password, sender_email, smtp_settings=None):
     """Test SMTP connection using the working method"""
     try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
+        settings = resolve_smtp_settings(smtp_settings)
+        # Always a fresh connection - this is meant to prove the credentials work
+        server = open_smtp_connection(settings['host'], settings['port'],
+                                      settings['security'], settings['timeout'])
+        if smtp_username:
+            server.login(smtp_username, smtp_password)
         server.quit()
         return True, "SMTP connection successful!"
     except smtplib.SMTPAuthenticationError:
         return False, "Authentication failed. Check your email and app password."
     except smtplib.SMTPConnectError:
-        return False, "Could not connect to Gmail SMTP server."
+        return False, f"Could not connect to SMTP server {settings['host']}:{settings['port']}."
     except Exception as e:
         return False, f"Connection test failed: {str(e)}"
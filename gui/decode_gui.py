@@ -212,7 +212,8 @@ def decode_dialog(user_id):
     def browse_file():
         path, info = select_audio_file_dialog("Select Encoded Audio File")
         if path and info and 'error' not in info:
-            audio_path_var.set(path)
+            # decode_data transcodes again from the cache, so history records the user's file
+            audio_path_var.set(info.get('source_path', path))
             format_info.clear()
             format_info.update(info)
             file_info_label.config(text=show_format_info(info), fg="green")
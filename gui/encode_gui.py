@@ -3,10 +3,14 @@ from tkinter import filedialog, messagebox, ttk
 import os
 import time
 from database import DatabaseManager
-from steganography_utils import encode_data, validate_image_file, validate_pdf_file, get_file_size_mb
-from email_utils import send_email, test_smtp_connection, show_password_info, validate_email_address
-from gui.file_operations import select_audio_file_dialog
+from email_outbox import queue_email
+from steganography_utils import (encode_data, validate_image_file, validate_pdf_file, get_file_size_mb,
+                                 estimate_encoded_size, EMBEDDING_LAYOUTS)
+from email_utils import (test_smtp_connection, show_password_info, validate_email_address,
+                         resolve_smtp_settings, SMTP_SECURITY_MODES)
+from gui.file_operations import select_audio_file_dialog, auto_select_carrier_dialog
 from gui.utils import show_format_info
+from gui.widgets import preview_encoded_audio
 from audio_player import AudioPreviewWidget
 
 # Simple theme variables
@@ -214,10 +218,10 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
     
     audio_preview = AudioPreviewWidget(window)
     
-    def browse_audio():
-        path, info = select_audio_file_dialog("Select Audio File for Message")
+    def load_audio(path, info):
         if path and info and 'error' not in info:
-            audio_path_var.set(path)
+            # Show and encode from the user's file; a transcoded carrier is only used for preview
+            audio_path_var.set(info.get('source_path', path))
             format_info.clear()
             format_info.update(info)
             info_label.config(text=show_format_info(info), fg="green")
@@ -235,8 +239,30 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
             audio_path_var.set("")
             info_label.config(text="No audio file selected", fg="gray")
     
+    def browse_audio():
+        load_audio(*select_audio_file_dialog("Select Audio File for Message"))
+    
+    def auto_pick_audio():
+        message = message_entry.get().strip()
+        if not message:
+            status_label.config(text="❌ Enter the message first so a carrier can be sized", fg="red")
+            return
+        payload_bytes = len(message.encode('utf-8'))
+        needed = estimate_encoded_size(payload_bytes, recipient_entry.get().strip() or None)
+        load_audio(*auto_select_carrier_dialog(needed))
+    
     tk.Button(audio_frame, text="Browse & Load Audio", command=browse_audio,
               bg=get_highlight_color(), fg="white", font=("Arial", 10)).pack(side=tk.LEFT)
+    tk.Button(audio_frame, text="Auto-pick", command=auto_pick_audio,
+              bg=get_highlight_color(), fg="white", font=("Arial", 10)).pack(side=tk.LEFT, padx=(5, 0))
+    
+    # Where in the carrier the payload bits go
+    layout_frame = tk.Frame(window, bg=get_bg_color())
+    layout_frame.pack(pady=5)
+    tk.Label(layout_frame, text="Embedding layout:", bg=get_bg_color(), fg=get_fg_color()).pack(side=tk.LEFT)
+    layout_var = tk.StringVar(value="sequential")
+    ttk.Combobox(layout_frame, textvariable=layout_var, values=list(EMBEDDING_LAYOUTS),
+                 state="readonly", width=12).pack(side=tk.LEFT, padx=(5, 0))
     
     def perform_encode():
         # Stop any playing audio before encoding
@@ -276,7 +302,7 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
         os.makedirs(output_dir, exist_ok=True)
         
         timestamp = int(time.time())
-        base_name = os.path.basename(audio_path)
+        base_name = f"{os.path.splitext(os.path.basename(audio_path))[0]}.{format_info['format']}"
         output_filename = f"encoded_message_{format_info['format']}_{timestamp}_{base_name}"
         output_path = os.path.join(output_dir, output_filename)
         
@@ -295,7 +321,7 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
             
             # Encode
             key = encode_data(audio_path, message, output_path, "message", 
-                            user_id, message, recipient)
+                            user_id, message, recipient, layout=layout_var.get())
             
             progress.destroy()
             # Create informative email body
@@ -304,6 +330,7 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
             🎵 You have received a TEXT MESSAGE from {sender_email}
 
             Data Type: Text Message
+            Carrier Audio: {os.path.basename(audio_path)}
             Audio Format: {format_info['format'].upper()}
             Encoding Method: LSB Steganography
 
@@ -318,10 +345,9 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
             Best regards,
             Audio Steganography System"""
 
-            # Send email with custom body
-            send_email(recipient, key, output_path, sender_email, 
-                    smtp_username, smtp_password, "message", 
-                    format_info['format'], 'lsb', custom_body=email_body)
+            # Queue email with custom body - the outbox worker sends it in the background
+            queue_email(user_id, recipient, key, output_path, sender_email, "message",
+                        format_info['format'], 'lsb', custom_body=email_body)
 
             
             # Show simple success message
@@ -329,9 +355,11 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
                                f"✅ Message encoded successfully!\n\n"
                                f"📄 Output: {output_filename}\n"
                                f"🎵 Format: {format_info['format'].upper()}\n"
-                               f"📧 Email sent to: {recipient}")
+                               f"📧 Email queued for: {recipient}")
             
-            window.destroy()
+            cleanup_and_close()
+            # Let the user hear the result, with the changed LSBs marked against the carrier
+            preview_encoded_audio(output_path, format_info['format'], audio_path)
             
         except Exception as e:
             if 'progress' in locals():
@@ -457,10 +485,10 @@ def encode_image_dialog(user_id, sender_email, smtp_username, smtp_password):
     
     audio_preview = AudioPreviewWidget(window)
     
-    def browse_audio():
-        path, info = select_audio_file_dialog("Select Audio File for Image")
+    def load_audio(path, info):
         if path and info and 'error' not in info:
-            audio_path_var.set(path)
+            # Show and encode from the user's file; a transcoded carrier is only used for preview
+            audio_path_var.set(info.get('source_path', path))
             format_info.clear()
             format_info.update(info)
             audio_info_label.config(text=show_format_info(info), fg="green")
@@ -478,8 +506,29 @@ def encode_image_dialog(user_id, sender_email, smtp_username, smtp_password):
             audio_path_var.set("")
             audio_info_label.config(text="No audio file selected", fg="gray")
     
+    def browse_audio():
+        load_audio(*select_audio_file_dialog("Select Audio File for Image"))
+    
+    def auto_pick_audio():
+        if not image_path_var.get():
+            status_label.config(text="❌ Select the image first so a carrier can be sized", fg="red")
+            return
+        payload_bytes = os.path.getsize(image_path_var.get())
+        needed = estimate_encoded_size(payload_bytes, recipient_entry.get().strip() or None)
+        load_audio(*auto_select_carrier_dialog(needed))
+    
     tk.Button(audio_frame, text="Browse & Load Audio", command=browse_audio,
               bg=get_highlight_color(), fg="white", font=("Arial", 10)).pack(side=tk.LEFT)
+    tk.Button(audio_frame, text="Auto-pick", command=auto_pick_audio,
+              bg=get_highlight_color(), fg="white", font=("Arial", 10)).pack(side=tk.LEFT, padx=(5, 0))
+    
+    # Where in the carrier the payload bits go
+    layout_frame = tk.Frame(window, bg=get_bg_color())
+    layout_frame.pack(pady=5)
+    tk.Label(layout_frame, text="Embedding layout:", bg=get_bg_color(), fg=get_fg_color()).pack(side=tk.LEFT)
+    layout_var = tk.StringVar(value="sequential")
+    ttk.Combobox(layout_frame, textvariable=layout_var, values=list(EMBEDDING_LAYOUTS),
+                 state="readonly", width=12).pack(side=tk.LEFT, padx=(5, 0))
     
     # Recipient email
     tk.Label(window, text="Recipient Email:", bg=get_bg_color(), fg=get_fg_color()).pack(pady=(15,5))
@@ -521,7 +570,7 @@ def encode_image_dialog(user_id, sender_email, smtp_username, smtp_password):
             os.makedirs(output_dir, exist_ok=True)
             
             timestamp = int(time.time())
-            base_name = os.path.basename(audio_path)
+            base_name = f"{os.path.splitext(os.path.basename(audio_path))[0]}.{format_info['format']}"
             output_filename = f"encoded_image_{format_info['format']}_{timestamp}_{base_name}"
             output_path = os.path.join(output_dir, output_filename)
             
@@ -539,7 +588,7 @@ def encode_image_dialog(user_id, sender_email, smtp_username, smtp_password):
             
             # Encode
             key = encode_data(audio_path, image_data, output_path, "image", 
-                            user_id, image_path, recipient)
+                            user_id, image_path, recipient, layout=layout_var.get())
             
             progress.destroy()
             
@@ -549,6 +598,7 @@ def encode_image_dialog(user_id, sender_email, smtp_username, smtp_password):
 🖼️ You have received a JPG IMAGE from {sender_email}
 
 Data Type: JPG Image
+Carrier Audio: {os.path.basename(audio_path)}
 Audio Format: {format_info['format'].upper()}
 Encoding Method: LSB Steganography
 
@@ -563,18 +613,19 @@ The encoded audio file is attached to this email.
 Best regards,
 Audio Steganography System"""
 
-            # Send email with custom body
-            send_email(recipient, key, output_path, sender_email, 
-                      smtp_username, smtp_password, "image", 
-                      format_info['format'], 'lsb', custom_body=email_body)
+            # Queue email with custom body - the outbox worker sends it in the background
+            queue_email(user_id, recipient, key, output_path, sender_email, "image",
+                        format_info['format'], 'lsb', custom_body=email_body)
             
             messagebox.showinfo("Encoding Complete", 
                                f"✅ Image encoded successfully!\n\n"
                                f"📄 Output: {output_filename}\n"
                                f"🎵 Format: {format_info['format'].upper()}\n"
-                               f"📧 Email sent to: {recipient}")
+                               f"📧 Email queued for: {recipient}")
             
-            window.destroy()
+            cleanup_and_close()
+            # Let the user hear the result, with the changed LSBs marked against the carrier
+            preview_encoded_audio(output_path, format_info['format'], audio_path)
             
         except Exception as e:
             if 'progress' in locals():
@@ -688,10 +739,10 @@ def encode_pdf_dialog(user_id, sender_email, smtp_username, smtp_password):
     
     audio_preview = AudioPreviewWidget(window)
     
-    def browse_audio():
-        path, info = select_audio_file_dialog("Select Audio File for PDF")
+    def load_audio(path, info):
         if path and info and 'error' not in info:
-            audio_path_var.set(path)
+            # Show and encode from the user's file; a transcoded carrier is only used for preview
+            audio_path_var.set(info.get('source_path', path))
             format_info.clear()
             format_info.update(info)
             audio_info_label.config(text=show_format_info(info), fg="green")
@@ -709,8 +760,29 @@ def encode_pdf_dialog(user_id, sender_email, smtp_username, smtp_password):
             audio_path_var.set("")
             audio_info_label.config(text="No audio file selected", fg="gray")
     
+    def browse_audio():
+        load_audio(*select_audio_file_dialog("Select Audio File for PDF"))
+    
+    def auto_pick_audio():
+        if not pdf_path_var.get():
+            status_label.config(text="❌ Select the PDF first so a carrier can be sized", fg="red")
+            return
+        payload_bytes = os.path.getsize(pdf_path_var.get())
+        needed = estimate_encoded_size(payload_bytes, recipient_entry.get().strip() or None)
+        load_audio(*auto_select_carrier_dialog(needed))
+    
     tk.Button(audio_frame, text="Browse & Load Audio", command=browse_audio,
               bg=get_highlight_color(), fg="white", font=("Arial", 10)).pack(side=tk.LEFT)
+    tk.Button(audio_frame, text="Auto-pick", command=auto_pick_audio,
+              bg=get_highlight_color(), fg="white", font=("Arial", 10)).pack(side=tk.LEFT, padx=(5, 0))
+    
+    # Where in the carrier the payload bits go
+    layout_frame = tk.Frame(window, bg=get_bg_color())
+    layout_frame.pack(pady=5)
+    tk.Label(layout_frame, text="Embedding layout:", bg=get_bg_color(), fg=get_fg_color()).pack(side=tk.LEFT)
+    layout_var = tk.StringVar(value="sequential")
+    ttk.Combobox(layout_frame, textvariable=layout_var, values=list(EMBEDDING_LAYOUTS),
+                 state="readonly", width=12).pack(side=tk.LEFT, padx=(5, 0))
     
     # Recipient email
     tk.Label(window, text="Recipient Email:", bg=get_bg_color(), fg=get_fg_color()).pack(pady=(15,5))
@@ -752,7 +824,7 @@ def encode_pdf_dialog(user_id, sender_email, smtp_username, smtp_password):
             os.makedirs(output_dir, exist_ok=True)
             
             timestamp = int(time.time())
-            base_name = os.path.basename(audio_path)
+            base_name = f"{os.path.splitext(os.path.basename(audio_path))[0]}.{format_info['format']}"
             output_filename = f"encoded_pdf_{format_info['format']}_{timestamp}_{base_name}"
             output_path = os.path.join(output_dir, output_filename)
             
@@ -770,7 +842,7 @@ def encode_pdf_dialog(user_id, sender_email, smtp_username, smtp_password):
             
             # Encode
             key = encode_data(audio_path, pdf_data, output_path, "pdf", 
-                            user_id, pdf_path, recipient)
+                            user_id, pdf_path, recipient, layout=layout_var.get())
             
             progress.destroy()
             
@@ -780,6 +852,7 @@ def encode_pdf_dialog(user_id, sender_email, smtp_username, smtp_password):
 📄 You have received a PDF DOCUMENT from {sender_email}
 
 Data Type: PDF Document  
+Carrier Audio: {os.path.basename(audio_path)}
 Audio Format: {format_info['format'].upper()}
 Encoding Method: LSB Steganography
 
@@ -794,18 +867,19 @@ The encoded audio file is attached to this email.
 Best regards,
 Audio Steganography System"""
 
-            # Send email with custom body
-            send_email(recipient, key, output_path, sender_email, 
-                      smtp_username, smtp_password, "pdf", 
-                      format_info['format'], 'lsb', custom_body=email_body)
+            # Queue email with custom body - the outbox worker sends it in the background
+            queue_email(user_id, recipient, key, output_path, sender_email, "pdf",
+                        format_info['format'], 'lsb', custom_body=email_body)
             
             messagebox.showinfo("Encoding Complete", 
                                f"✅ PDF encoded successfully!\n\n"
                                f"📄 Output: {output_filename}\n"
                                f"🎵 Format: {format_info['format'].upper()}\n"
-                               f"📧 Email sent to: {recipient}")
+                               f"📧 Email queued for: {recipient}")
             
-            window.destroy()
+            cleanup_and_close()
+            # Let the user hear the result, with the changed LSBs marked against the carrier
+            preview_encoded_audio(output_path, format_info['format'], audio_path)
             
         except Exception as e:
             if 'progress' in locals():
@@ -841,7 +915,7 @@ def encode_smtp_dialog(user_id):
     db = DatabaseManager()
     smtp_window = tk.Toplevel()
     smtp_window.title("SMTP Configuration")
-    smtp_window.geometry("500x500")
+    smtp_window.geometry("500x600")
     smtp_window.grab_set()
     smtp_window.configure(bg=get_bg_color())
     
@@ -864,6 +938,11 @@ def encode_smtp_dialog(user_id):
     except:
         default_email = default_username = default_password = ""
     
+    try:
+        smtp_settings = resolve_smtp_settings(db.get_smtp_settings(user_id))
+    except Exception:
+        smtp_settings = resolve_smtp_settings()
+    
     tk.Label(smtp_window, text="📧 Email Configuration", 
              font=("Arial", 14, "bold"), bg=get_bg_color(), fg=get_highlight_color()).pack(pady=15)
     
@@ -905,6 +984,44 @@ def encode_smtp_dialog(user_id):
     tk.Button(smtp_window, text="ℹ️ How to get App Password", 
               command=show_password_info, bg="#FFC107", fg="black").pack(pady=5)
     
+    # SMTP Server (host, port, security, timeout)
+    server_frame = tk.Frame(smtp_window, bg=get_bg_color())
+    server_frame.pack(pady=5)
+    tk.Label(server_frame, text="Server:", bg=get_bg_color(), fg=get_fg_color()).grid(row=0, column=0, sticky="e")
+    host_entry = tk.Entry(server_frame, width=24, bg="white" if not DARK_MODE else get_bg_color(), 
+                          fg="black" if not DARK_MODE else get_fg_color(),
+                          insertbackground="black" if not DARK_MODE else get_fg_color())
+    host_entry.insert(0, smtp_settings['host'])
+    host_entry.grid(row=0, column=1, padx=2)
+    tk.Label(server_frame, text="Port:", bg=get_bg_color(), fg=get_fg_color()).grid(row=0, column=2, sticky="e")
+    port_entry = tk.Entry(server_frame, width=6, bg="white" if not DARK_MODE else get_bg_color(), 
+                          fg="black" if not DARK_MODE else get_fg_color(),
+                          insertbackground="black" if not DARK_MODE else get_fg_color())
+    port_entry.insert(0, str(smtp_settings['port']))
+    port_entry.grid(row=0, column=3, padx=2)
+    tk.Label(server_frame, text="Security:", bg=get_bg_color(), fg=get_fg_color()).grid(row=1, column=0, sticky="e")
+    security_var = tk.StringVar(value=smtp_settings['security'])
+    tk.OptionMenu(server_frame, security_var, *SMTP_SECURITY_MODES).grid(row=1, column=1, sticky="w", padx=2)
+    tk.Label(server_frame, text="Timeout (s):", bg=get_bg_color(), fg=get_fg_color()).grid(row=1, column=2, sticky="e")
+    timeout_entry = tk.Entry(server_frame, width=6, bg="white" if not DARK_MODE else get_bg_color(), 
+                          fg="black" if not DARK_MODE else get_fg_color(),
+                          insertbackground="black" if not DARK_MODE else get_fg_color())
+    timeout_entry.insert(0, f"{smtp_settings['timeout']:g}")
+    timeout_entry.grid(row=1, column=3, padx=2)
+    
+    def get_server_settings():
+        """Read the server fields; raises ValueError on a bad port or timeout"""
+        port = int(port_entry.get().strip())
+        timeout = float(timeout_entry.get().strip())
+        if not 0 < port < 65536 or timeout <= 0:
+            raise ValueError("Port must be 1-65535 and timeout must be positive")
+        return resolve_smtp_settings({
+            'host': host_entry.get().strip(),
+            'port': port,
+            'security': security_var.get(),
+            'timeout': timeout,
+        })
+    
     # Test Connection Status
     test_status_label = tk.Label(smtp_window, text="", font=("Arial", 9), 
                                 wraplength=450, bg=get_bg_color(), fg=get_fg_color())
@@ -950,7 +1067,14 @@ def encode_smtp_dialog(user_id):
         smtp_window.update()
         
         try:
-            success, message = test_smtp_connection(smtp_username, smtp_password, sender_email)
+            server_settings = get_server_settings()
+        except ValueError as e:
+            test_status_label.config(text=f"❌ Invalid server settings: {str(e)}", fg="red")
+            return
+        
+        try:
+            success, message = test_smtp_connection(smtp_username, smtp_password, sender_email,
+                                                    server_settings)
             test_status_label.config(text=message, fg="green" if success else "red")
         except Exception as e:
             test_status_label.config(text=f"❌ Test failed: {str(e)}", fg="red")
@@ -971,9 +1095,16 @@ def encode_smtp_dialog(user_id):
         if not smtp_password:
             messagebox.showerror("Error", "SMTP password required")
             return
+        try:
+            server_settings = get_server_settings()
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid server settings: {str(e)}")
+            return
         
         try:
             db.save_credentials(user_id, sender_email, smtp_username, smtp_password)
+            db.save_smtp_settings(user_id, server_settings['host'], server_settings['port'],
+                                  server_settings['security'], server_settings['timeout'])
             smtp_window.destroy()
             encode_data_dialog(user_id, sender_email, smtp_username, smtp_password)
         except Exception as e:
@@ -1,14 +1,17 @@
+import os
 import tkinter as tk
 from tkinter import filedialog
 from audio_format_handler import AudioFormatHandler
+from carrier_index import CarrierIndex
 from steganography_utils import validate_image_file, validate_pdf_file
 
 def select_audio_file_dialog(title="Select Audio File"):
-    """Select WAV or FLAC file"""
+    """Select WAV or FLAC file (other lossless formats are transcoded to one)"""
     filetypes = [
-        ("WAV or FLAC", "*.wav;*.flac"),
+        ("WAV or FLAC", "*.wav;*.flac;*.rf64;*.w64"),
         ("WAV files", "*.wav"),
         ("FLAC files", "*.flac"),
+        ("Other lossless audio", "*.aif;*.aiff;*.aifc;*.caf;*.au"),
         ("All files", "*.*")
     ]
     
@@ -17,9 +20,36 @@ def select_audio_file_dialog(title="Select Audio File"):
         return None, None
     
     handler = AudioFormatHandler()
-    format_info = handler.detect_format(file_path)
+    file_path, format_info = handler.prepare_carrier(file_path)
     
     if 'error' in format_info:
         return None, format_info
     
     return file_path, format_info
+
+_carrier_index = None
+
+def _get_carrier_index():
+    """Shared CarrierIndex, so loaded rows survive between picks"""
+    global _carrier_index
+    if _carrier_index is None:
+        _carrier_index = CarrierIndex()
+    return _carrier_index
+
+def auto_select_carrier_dialog(payload_bytes, title="Select Carrier Library Folder"):
+    """Index a folder of carriers and pick the smallest one in it that fits payload_bytes"""
+    directory = filedialog.askdirectory(title=title)
+    if not directory:
+        return None, None
+    
+    index = _get_carrier_index()
+    index.scan(directory)
+    carrier = index.pick_carrier(payload_bytes, directories=[directory])
+    if carrier is None:
+        return None, {'error': f'No carrier in {os.path.basename(directory) or directory} '
+                               f'can hold {payload_bytes / 1024:.1f} KB'}
+    
+    format_info = index.handler.detect_format(carrier['file_path'])
+    if 'error' in format_info:
+        return None, format_info
+    return carrier['file_path'], format_info
@@ -1,7 +1,11 @@
+import queue
 import tkinter as tk
+from tkinter import messagebox
 from gui.encode_gui import encode_smtp_dialog
 from gui.decode_gui import decode_dialog
 from gui.history_gui import history_dialog
+from email_outbox import start_outbox_worker
+from email_utils import subscribe_notifications, unsubscribe_notifications
 
 # Simple theme variables
 DARK_MODE = False
@@ -71,6 +75,36 @@ def apply_theme_to_window(window):
     
     update_widget(window)
 
+def show_email_notifications(window, poll_ms=250):
+    """Show email send notifications as message boxes on the Tk thread.
+    
+    Sends run on worker threads, so events are queued and polled from the
+    window's event loop; the subscription ends when the window is destroyed.
+    """
+    events = queue.Queue()
+    callback = subscribe_notifications(events.put)
+    
+    def poll():
+        try:
+            if not window.winfo_exists():
+                return
+            while True:
+                event = events.get_nowait()
+                show = messagebox.showerror if event['level'] == 'error' else messagebox.showinfo
+                show(event['title'], event['message'], parent=window)
+        except queue.Empty:
+            pass
+        except tk.TclError:
+            return
+        window.after(poll_ms, poll)
+    
+    def on_destroy(event):
+        if event.widget is window:
+            unsubscribe_notifications(callback)
+    
+    window.bind("<Destroy>", on_destroy, add="+")
+    window.after(poll_ms, poll)
+
 def main_app(user_id, master_root=None):
     """Main application window with simple, reliable theme management"""
     if master_root:
@@ -82,6 +116,10 @@ def main_app(user_id, master_root=None):
     app_window.geometry("800x600")
     app_window.grab_set()
     
+    # Deliver emails queued by encodes (including ones left over from a previous run)
+    show_email_notifications(app_window)
+    start_outbox_worker()
+    
     # Set initial colors (light mode)
     app_window.configure(bg=get_bg_color())
     
@@ -1,3 +1,4 @@
+import os
 from steganography_utils import get_file_size_mb, estimate_audio_duration_needed
 
 def show_format_info(format_info):
@@ -5,7 +6,11 @@ def show_format_info(format_info):
     if not format_info or 'error' in format_info:
         return "Error: Invalid audio format information"
     
+    source = ""
+    if format_info.get('source_path'):
+        source = f"Source: {os.path.basename(format_info['source_path'])} (transcoded)\n"
     return (
+        source +
         f"Format: {format_info['format'].upper()}\n"
         f"Codec: {format_info.get('codec', 'Unknown')}\n"
         f"Sample Rate: {format_info.get('sample_rate', 0)} Hz\n"
@@ -2,12 +2,15 @@ import tkinter as tk
 import os
 from audio_player import AudioPreviewWidget
 
-def preview_encoded_audio(audio_path, audio_format):
-    """Show a dedicated audio preview window for encoded files"""
+def preview_encoded_audio(audio_path, audio_format, original_path=None):
+    """Show a dedicated audio preview window for encoded files
+    
+    Pass the original carrier as original_path to highlight the changed LSBs.
+    """
     
     preview_window = tk.Toplevel()
     preview_window.title("Encoded Audio Preview")
-    preview_window.geometry("500x300")
+    preview_window.geometry("520x460")
     preview_window.grab_set()
     
     tk.Label(preview_window, text="🎵 Encoded Audio Preview", 
@@ -34,9 +37,11 @@ def preview_encoded_audio(audio_path, audio_format):
     audio_preview = AudioPreviewWidget(preview_window)
     
     # Load audio file
-    if audio_preview.load_audio_file(audio_path):
+    if audio_preview.load_audio_file(audio_path, original_path):
         tk.Label(preview_window, text="🔊 Use the controls above to play the encoded audio", 
                  font=("Arial", 9), fg="gray").pack(pady=5)
+        tk.Label(preview_window, text="🟧 Payload region in the LSB plane   🟥 Changed LSBs vs original", 
+                 font=("Arial", 8), fg="gray").pack()
     else:
         tk.Label(preview_window, text="❌ Failed to load audio file for preview", 
                  font=("Arial", 10), fg="red").pack(pady=10)
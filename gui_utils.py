@@ -10,8 +10,10 @@ from steganography_utils import (
 )
 import ast
 import inspect
-from email_utils import send_email, show_password_info, validate_email_address, test_smtp_connection
+from email_utils import (show_password_info, validate_email_address, test_smtp_connection,
+                         resolve_smtp_settings, SMTP_SECURITY_MODES)
 from database import DatabaseManager
+from email_outbox import queue_email
 from audio_format_handler import AudioFormatHandler
 from audio_player import AudioPreviewWidget
 import tempfile
@@ -395,7 +397,7 @@ def encode_smtp_dialog(user_id):
     db = DatabaseManager()
     smtp_window = tk.Toplevel()
     smtp_window.title("SMTP Configuration")
-    smtp_window.geometry("500x500")  # Increased height for additional widgets
+    smtp_window.geometry("500x600")  # Increased height for additional widgets
     smtp_window.grab_set()
     
     # Load saved credentials
@@ -407,6 +409,11 @@ def encode_smtp_dialog(user_id):
     except:
         default_email = default_username = default_password = ""
     
+    try:
+        smtp_settings = resolve_smtp_settings(db.get_smtp_settings(user_id))
+    except Exception:
+        smtp_settings = resolve_smtp_settings()
+    
     tk.Label(smtp_window, text="📧 Email Configuration", 
              font=("Arial", 14, "bold")).pack(pady=15)
     
@@ -437,6 +444,38 @@ def encode_smtp_dialog(user_id):
     tk.Button(smtp_window, text="ℹ️ How to get App Password", 
               command=show_password_info, bg="#FFC107", fg="black").pack(pady=5)
     
+    # SMTP Server (host, port, security, timeout)
+    server_frame = tk.Frame(smtp_window)
+    server_frame.pack(pady=5)
+    tk.Label(server_frame, text="Server:").grid(row=0, column=0, sticky="e")
+    host_entry = tk.Entry(server_frame, width=24)
+    host_entry.insert(0, smtp_settings['host'])
+    host_entry.grid(row=0, column=1, padx=2)
+    tk.Label(server_frame, text="Port:").grid(row=0, column=2, sticky="e")
+    port_entry = tk.Entry(server_frame, width=6)
+    port_entry.insert(0, str(smtp_settings['port']))
+    port_entry.grid(row=0, column=3, padx=2)
+    tk.Label(server_frame, text="Security:").grid(row=1, column=0, sticky="e")
+    security_var = tk.StringVar(value=smtp_settings['security'])
+    tk.OptionMenu(server_frame, security_var, *SMTP_SECURITY_MODES).grid(row=1, column=1, sticky="w", padx=2)
+    tk.Label(server_frame, text="Timeout (s):").grid(row=1, column=2, sticky="e")
+    timeout_entry = tk.Entry(server_frame, width=6)
+    timeout_entry.insert(0, f"{smtp_settings['timeout']:g}")
+    timeout_entry.grid(row=1, column=3, padx=2)
+    
+    def get_server_settings():
+        """Read the server fields; raises ValueError on a bad port or timeout"""
+        port = int(port_entry.get().strip())
+        timeout = float(timeout_entry.get().strip())
+        if not 0 < port < 65536 or timeout <= 0:
+            raise ValueError("Port must be 1-65535 and timeout must be positive")
+        return resolve_smtp_settings({
+            'host': host_entry.get().strip(),
+            'port': port,
+            'security': security_var.get(),
+            'timeout': timeout,
+        })
+    
     # Test Connection Status
     test_status_label = tk.Label(smtp_window, text="", font=("Arial", 9), wraplength=450)
     test_status_label.pack(pady=5)
@@ -481,7 +520,14 @@ def encode_smtp_dialog(user_id):
         smtp_window.update()
         
         try:
-            success, message = test_smtp_connection(smtp_username, smtp_password, sender_email)
+            server_settings = get_server_settings()
+        except ValueError as e:
+            test_status_label.config(text=f"❌ Invalid server settings: {str(e)}", fg="red")
+            return
+        
+        try:
+            success, message = test_smtp_connection(smtp_username, smtp_password, sender_email,
+                                                    server_settings)
             test_status_label.config(text=message, fg="green" if success else "red")
         except Exception as e:
             test_status_label.config(text=f"❌ Test failed: {str(e)}", fg="red")
@@ -502,9 +548,16 @@ def encode_smtp_dialog(user_id):
         if not smtp_password:
             messagebox.showerror("Error", "SMTP password required")
             return
+        try:
+            server_settings = get_server_settings()
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid server settings: {str(e)}")
+            return
         
         try:
             db.save_credentials(user_id, sender_email, smtp_username, smtp_password)
+            db.save_smtp_settings(user_id, server_settings['host'], server_settings['port'],
+                                  server_settings['security'], server_settings['timeout'])
             smtp_window.destroy()
             encode_data_dialog(user_id, sender_email, smtp_username, smtp_password)
         except Exception as e:
@@ -713,17 +766,16 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
             
             progress.destroy()
             
-            # Send email
-            send_email(recipient, key, output_path, sender_email, 
-                      smtp_username, smtp_password, "message", 
-                      format_info['format'], 'lsb')
+            # Queue email - the outbox worker sends it in the background
+            queue_email(user_id, recipient, key, output_path, sender_email, "message",
+                        format_info['format'], 'lsb')
             
             # Show simple success message (no preview option)
             messagebox.showinfo("Encoding Complete", 
                                f"✅ Message encoded successfully!\n\n"
                                f"📄 Output: {output_filename}\n"
                                f"🎵 Format: {format_info['format'].upper()}\n"
-                               f"📧 Email sent to: {recipient}")
+                               f"📧 Email queued for: {recipient}")
             
             window.destroy()
             
@@ -771,13 +823,16 @@ def encode_message_dialog(user_id, sender_email, smtp_username, smtp_password):
 
 
 
-def preview_encoded_audio(audio_path, audio_format):
-    """Show a dedicated audio preview window for encoded files"""
+def preview_encoded_audio(audio_path, audio_format, original_path=None):
+    """Show a dedicated audio preview window for encoded files
+    
+    Pass the original carrier as original_path to highlight the changed LSBs.
+    """
     from audio_player import AudioPreviewWidget
     
     preview_window = tk.Toplevel()
     preview_window.title("Encoded Audio Preview")
-    preview_window.geometry("500x300")
+    preview_window.geometry("520x460")
     preview_window.grab_set()
     
     tk.Label(preview_window, text="🎵 Encoded Audio Preview", 
@@ -804,9 +859,11 @@ def preview_encoded_audio(audio_path, audio_format):
     audio_preview = AudioPreviewWidget(preview_window)
     
     # Load audio file
-    if audio_preview.load_audio_file(audio_path):
+    if audio_preview.load_audio_file(audio_path, original_path):
         tk.Label(preview_window, text="🔊 Use the controls above to play the encoded audio", 
                  font=("Arial", 9), fg="gray").pack(pady=5)
+        tk.Label(preview_window, text="🟧 Payload region in the LSB plane   🟥 Changed LSBs vs original", 
+                 font=("Arial", 8), fg="gray").pack()
     else:
         tk.Label(preview_window, text="❌ Failed to load audio file for preview", 
                  font=("Arial", 10), fg="red").pack(pady=10)
@@ -950,10 +1007,9 @@ def encode_image_dialog(user_id, sender_email, smtp_username, smtp_password):
             
             progress.destroy()
             
-            # Send email
-            send_email(recipient, key, output_path, sender_email, 
-                      smtp_username, smtp_password, "image", 
-                      format_info['format'], 'lsb')
+            # Queue email - the outbox worker sends it in the background
+            queue_email(user_id, recipient, key, output_path, sender_email, "image",
+                        format_info['format'], 'lsb')
             
             messagebox.showinfo("Success", 
                                f"✅ Image encoded successfully!\n\n"
@@ -1095,10 +1151,9 @@ def encode_pdf_dialog(user_id, sender_email, smtp_username, smtp_password):
             
             progress.destroy()
             
-            # Send email
-            send_email(recipient, key, output_path, sender_email, 
-                      smtp_username, smtp_password, "pdf", 
-                      format_info['format'], 'lsb')
+            # Queue email - the outbox worker sends it in the background
+            queue_email(user_id, recipient, key, output_path, sender_email, "pdf",
+                        format_info['format'], 'lsb')
             
             messagebox.showinfo("Success", 
                                f"✅ PDF encoded successfully!\n\n"
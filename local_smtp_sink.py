@@ -0,0 +1,227 @@
+# local_smtp_sink.py
+import base64
+import socketserver
+import threading
+import time
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal ESMTP session: EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def _readline(self):
+        line = self.rfile.readline(65537)
+        if not line:
+            raise ConnectionResetError("client closed the connection")
+        return line.rstrip(b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        sink._connection_opened()
+        mail_from, rcpt_tos, authenticated = None, [], False
+        self._reply(f"220 {sink.hostname} ESMTP local sink ready")
+        try:
+            while True:
+                line = self._readline().decode(errors="replace")
+                verb, _, arg = line.partition(" ")
+                verb = verb.upper()
+
+                if verb == "EHLO":
+                    self._reply(f"250-{sink.hostname}")
+                    self._reply("250-8BITMIME")
+                    self._reply("250-SIZE 0")
+                    self._reply("250 AUTH PLAIN LOGIN")
+                elif verb == "HELO":
+                    self._reply(f"250 {sink.hostname}")
+                elif verb == "AUTH":
+                    authenticated = self._authenticate(arg)
+                elif verb == "MAIL":
+                    if sink.require_auth and not authenticated:
+                        self._reply("530 Authentication required")
+                        continue
+                    mail_from, rcpt_tos = arg.split(":", 1)[-1].strip().strip("<>"), []
+                    self._reply("250 OK")
+                elif verb == "RCPT":
+                    if mail_from is None:
+                        self._reply("503 Need MAIL first")
+                        continue
+                    rcpt_tos.append(arg.split(":", 1)[-1].strip().strip("<>"))
+                    self._reply("250 OK")
+                elif verb == "DATA":
+                    if not rcpt_tos:
+                        self._reply("503 Need RCPT first")
+                        continue
+                    self._reply("354 End data with <CR><LF>.<CR><LF>")
+                    size = self._receive_data(sink.keep_messages)
+                    sink._message_received(mail_from, rcpt_tos, size, self._data)
+                    mail_from, rcpt_tos = None, []
+                    self._reply("250 OK: queued")
+                elif verb == "RSET":
+                    mail_from, rcpt_tos = None, []
+                    self._reply("250 OK")
+                elif verb == "NOOP":
+                    self._reply("250 OK")
+                elif verb == "QUIT":
+                    self._reply("221 Bye")
+                    return
+                else:
+                    self._reply("502 Command not implemented")
+        except (ConnectionError, OSError):
+            pass
+
+    def _authenticate(self, arg):
+        """Accept any credentials (or only sink.credentials when set)"""
+        mechanism, _, initial = arg.partition(" ")
+        mechanism = mechanism.upper()
+        try:
+            if mechanism == "PLAIN":
+                if not initial:
+                    self._reply("334 ")
+                    initial = self._readline().decode()
+                _, username, password = base64.b64decode(initial).decode().split("\0", 2)
+            elif mechanism == "LOGIN":
+                if initial:
+                    username = base64.b64decode(initial).decode()
+                else:
+                    self._reply("334 VXNlcm5hbWU6")
+                    username = base64.b64decode(self._readline()).decode()
+                self._reply("334 UGFzc3dvcmQ6")
+                password = base64.b64decode(self._readline()).decode()
+            else:
+                self._reply("504 Unrecognized authentication type")
+                return False
+        except (ValueError, UnicodeDecodeError):
+            self._reply("501 Malformed authentication data")
+            return False
+
+        credentials = self.server.sink.credentials
+        if credentials is not None and credentials.get(username) != password:
+            self._reply("535 Authentication credentials invalid")
+            return False
+        self._reply("235 Authentication successful")
+        return True
+
+    def _receive_data(self, keep):
+        """Read the DATA section, undoing dot-stuffing; returns the message size in bytes"""
+        chunks = [] if keep else None
+        size = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                raise ConnectionResetError("client closed the connection during DATA")
+            if line in (b".\r\n", b".\n"):
+                break
+            if line.startswith(b"."):
+                line = line[1:]
+            size += len(line)
+            if keep:
+                chunks.append(line)
+        self._data = b"".join(chunks) if keep else None
+        return size
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPSink:
+    """In-process SMTP server that accepts and records mail without any network.
+
+    Point the SMTP settings at it with security 'none' for benchmarks and
+    integration tests:
+
+        with LocalSMTPSink() as sink:
+            send_email(..., smtp_settings=sink.smtp_settings)
+            assert sink.message_count == 1
+
+    port=0 picks a free port. When credentials is a {username: password} dict,
+    AUTH is checked against it; otherwise any login succeeds. keep_messages=False
+    only counts bytes, so large attachments don't pile up in memory.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, require_auth=False, credentials=None,
+                 keep_messages=True, hostname="localhost"):
+        self.host = host
+        self.port = port
+        self.require_auth = require_auth
+        self.credentials = credentials
+        self.keep_messages = keep_messages
+        self.hostname = hostname
+        self.messages = []  # dicts: mail_from, rcpt_tos, size, data, received_at
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def smtp_settings(self):
+        return {'host': self.host, 'port': self.port, 'security': "none", 'timeout': 10}
+
+    @property
+    def message_count(self):
+        with self._lock:
+            return len(self.messages)
+
+    def start(self):
+        self._server = _ThreadingSMTPServer((self.host, self.port), _SMTPSinkHandler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="LocalSMTPSink",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join(timeout=5)
+            self._server = self._thread = None
+
+    def wait_for_messages(self, count, timeout=10):
+        """Block until at least `count` messages arrived; returns True on success"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.message_count >= count:
+                return True
+            time.sleep(0.05)
+        return self.message_count >= count
+
+    def clear(self):
+        with self._lock:
+            self.messages.clear()
+            self.connection_count = 0
+
+    def _connection_opened(self):
+        with self._lock:
+            self.connection_count += 1
+
+    def _message_received(self, mail_from, rcpt_tos, size, data):
+        with self._lock:
+            self.messages.append({
+                'mail_from': mail_from,
+                'rcpt_tos': list(rcpt_tos),
+                'size': size,
+                'data': data,
+                'received_at': time.time(),
+            })
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    sink = LocalSMTPSink(port=2525, keep_messages=False).start()
+    print(f"📭 Local SMTP sink listening on {sink.host}:{sink.port} (security: none) - Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Received {sink.message_count} messages over {sink.connection_count} connections")
+        sink.stop()
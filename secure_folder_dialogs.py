@@ -2,7 +2,10 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import os
+import queue
+import threading
 from database import DatabaseManager
+from steganography_utils import estimate_folder_compression_ratio
 
 
 # Simple theme variables - sync with main app
@@ -717,12 +720,149 @@ def create_folder_dialog(parent, user_id):
 
 
 def secure_folder_now_dialog(user_id, parent=None):
-    """Dialog to select and secure existing folders with 7-Zip encryption (placeholder)"""
-    # This function will be properly implemented once we get your database functions
-    messagebox.showinfo("Secure Folder Now", 
-                       "This feature will be implemented once your database functions are ready.\n\n"
-                       "It will allow direct creation of .7z encrypted archives.",
-                       parent=parent)
+    """Dialog to secure all folders waiting for 7-Zip encryption in one go"""
+    db = DatabaseManager()
+    folders = db.get_folders_ready_for_securing(user_id)
+    
+    if not folders:
+        messagebox.showinfo("Secure Folders Now", 
+                           "No folders are waiting for 7-Zip encryption.", parent=parent)
+        return
+    
+    secure_window = tk.Toplevel(parent) if parent else tk.Toplevel()
+    secure_window.title("🛡️ Secure All Folders Now")
+    secure_window.geometry("620x480")
+    secure_window.grab_set()
+    secure_window.configure(bg=get_bg_color())
+    if parent:
+        secure_window.transient(parent)
+    
+    tk.Label(secure_window, text="🛡️ Secure All Folders Now", 
+             font=("Arial", 16, "bold"), bg=get_bg_color(), fg=get_highlight_color()).pack(pady=15)
+    tk.Label(secure_window, text="Enter each folder's password. Folders are archived in parallel.", 
+             font=("Arial", 10), bg=get_bg_color(), fg=get_fg_color()).pack(pady=(0, 10))
+    
+    rows_frame = tk.Frame(secure_window, bg=get_bg_color())
+    rows_frame.pack(padx=20, fill="both", expand=True)
+    
+    password_entries = {}
+    status_labels = {}
+    for folder in folders:
+        folder_id, folder_name = folder[0], folder[1]
+        row = tk.Frame(rows_frame, bg=get_bg_color(), relief="ridge", bd=1)
+        row.pack(fill="x", pady=3)
+        
+        tk.Label(row, text=f"📁 {folder_name}", width=22, anchor="w",
+                font=("Arial", 10, "bold"), bg=get_bg_color(), fg=get_fg_color()).pack(side=tk.LEFT, padx=5)
+        entry = tk.Entry(row, show="*", width=18, font=("Arial", 10))
+        entry.pack(side=tk.LEFT, padx=5, pady=5)
+        status = tk.Label(row, text="Waiting", width=28, anchor="w",
+                         font=("Arial", 9), bg=get_bg_color(), fg="gray")
+        status.pack(side=tk.LEFT, padx=5)
+        
+        password_entries[folder_id] = entry
+        status_labels[folder_id] = status
+    
+    summary_label = tk.Label(secure_window, text="", font=("Arial", 10), 
+                            bg=get_bg_color(), fg=get_fg_color())
+    summary_label.pack(pady=5)
+    
+    state_colors = {"queued": "blue", "progress": "blue", "done": "green", "failed": "red"}
+    cancel_event = threading.Event()
+    # Tk is not thread-safe: workers only queue events, the Tk thread polls and applies them
+    events = queue.Queue()
+    
+    # Archive size estimates, filled in by a background probe while passwords are typed
+    _, _, compression_level = db.get_user_security_preferences(user_id)
+    estimates = {}
+    securing = threading.Event()
+    
+    def estimate_sizes():
+        for folder in folders:
+            if securing.is_set():
+                return
+            total, estimated, _ = estimate_folder_compression_ratio(folder[2], compression_level)
+            events.put(("estimate", (folder[0], total, estimated)))
+    
+    def apply_estimate(folder_id, total, estimated):
+        estimates[folder_id] = (total, estimated)
+        if securing.is_set():
+            return  # progress messages own the status labels now
+        status_labels[folder_id].config(
+            text=f"{total / (1024 * 1024):.1f} MB → ~{estimated / (1024 * 1024):.1f} MB", fg="gray")
+        summary_label.config(
+            text=f"📦 Estimated archives: ~{sum(e for _, e in estimates.values()) / (1024 * 1024):.1f} MB "
+                 f"from {sum(t for t, _ in estimates.values()) / (1024 * 1024):.1f} MB",
+            fg=get_fg_color())
+    
+    def show_progress(folder_id, state, message):
+        events.put(("progress", (folder_id, state, message)))
+    
+    def apply_progress(folder_id, state, message):
+        first_line = message.splitlines()[0] if message else state
+        status_labels[folder_id].config(text=first_line[:40], fg=state_colors.get(state, "gray"))
+    
+    def finish(results):
+        secured = sum(1 for success, _ in results.values() if success)
+        summary_label.config(text=f"✅ {secured} of {len(results)} folders secured", 
+                            fg="green" if secured == len(results) else "orange")
+        secure_button.config(state="normal")
+    
+    def poll_events():
+        try:
+            if not secure_window.winfo_exists():
+                return
+            while True:
+                kind, payload = events.get_nowait()
+                if kind == "progress":
+                    apply_progress(*payload)
+                elif kind == "estimate":
+                    apply_estimate(*payload)
+                else:
+                    finish(payload)
+        except queue.Empty:
+            pass
+        except tk.TclError:
+            return
+        secure_window.after(100, poll_events)
+    
+    def run_bulk(folder_passwords):
+        # SQLite connections are per thread, so the worker opens its own
+        results = DatabaseManager().secure_folders_now(
+            folder_passwords, user_id, progress_callback=show_progress, cancel_event=cancel_event
+        )
+        events.put(("finished", results))
+    
+    def secure_all():
+        folder_passwords = {
+            folder_id: entry.get() for folder_id, entry in password_entries.items() if entry.get()
+        }
+        if not folder_passwords:
+            messagebox.showwarning("Secure Folders Now", "Enter at least one folder password.", 
+                                  parent=secure_window)
+            return
+        
+        securing.set()
+        secure_button.config(state="disabled")
+        summary_label.config(text="🔄 Securing folders, please wait...", fg="blue")
+        threading.Thread(target=run_bulk, args=(folder_passwords,), daemon=True).start()
+    
+    button_frame = tk.Frame(secure_window, bg=get_bg_color())
+    button_frame.pack(pady=15)
+    
+    secure_button = tk.Button(button_frame, text="🛡️ Secure All", command=secure_all,
+                             bg="#4CAF50", fg="white", font=("Arial", 12, "bold"))
+    secure_button.pack(side=tk.LEFT, padx=10)
+    def close_window():
+        cancel_event.set()
+        secure_window.destroy()
+    
+    secure_window.protocol("WM_DELETE_WINDOW", close_window)
+    tk.Button(button_frame, text="❌ Close", command=close_window,
+              bg="#f44336", fg="white", font=("Arial", 12)).pack(side=tk.LEFT, padx=10)
+    
+    threading.Thread(target=estimate_sizes, daemon=True).start()
+    poll_events()
 
 
 def show_forgot_password_dialog(parent, folder_name):
@@ -864,6 +1004,9 @@ def manage_folders_dialog(user_id, parent=None):
     
     tk.Button(button_frame, text="➕ Create New Folder", command=create_new,
               bg="#4CAF50", fg="white", font=("Arial", 11, "bold")).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="🛡️ Secure All Now", 
+              command=lambda: secure_folder_now_dialog(user_id, manage_window),
+              bg="#2196F3", fg="white", font=("Arial", 11, "bold")).pack(side=tk.LEFT, padx=10)
     tk.Button(button_frame, text="❌ Close", command=manage_window.destroy,
               bg="#f44336", fg="white", font=("Arial", 11)).pack(side=tk.LEFT, padx=10)
 
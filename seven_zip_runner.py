@@ -0,0 +1,175 @@
+# seven_zip_runner.py
+import re
+import subprocess
+import threading
+import queue
+import time
+
+# Abort when 7-Zip has printed nothing for this long (replaces fixed total timeouts).
+# -bsp1 only prints when the whole percentage changes, so jobs with a known size
+# also get the time one percent takes at STALL_MIN_BYTES_PER_SEC (slow -mx=9 LZMA2).
+DEFAULT_STALL_TIMEOUT = 120
+STALL_MIN_BYTES_PER_SEC = 256 * 1024
+
+_PERCENT_RE = re.compile(r"(\d{1,3})%")
+_SEGMENT_RE = re.compile(r"[\r\n\b]+")
+
+
+class SevenZipStalledError(Exception):
+    """7-Zip stopped producing output for longer than the stall timeout"""
+    
+    def __init__(self, stall_timeout):
+        super().__init__(f"7-Zip made no progress for {stall_timeout:.0f} seconds")
+        self.stall_timeout = stall_timeout
+
+
+class SevenZipCancelledError(Exception):
+    """The caller cancelled a running 7-Zip command"""
+
+
+def stall_timeout_for(total_bytes=None, base=DEFAULT_STALL_TIMEOUT):
+    """Seconds without output before a job of total_bytes counts as stalled"""
+    if not total_bytes:
+        return base
+    return base + total_bytes / 100 / STALL_MIN_BYTES_PER_SEC
+
+
+def _pump(stream, out_queue):
+    """Forward raw output from a pipe to the queue, then signal EOF with None"""
+    try:
+        while True:
+            chunk = stream.read1(4096)
+            if not chunk:
+                break
+            out_queue.put(chunk)
+    finally:
+        out_queue.put(None)
+
+
+def _feed(stream, data):
+    """Write stdin data for a -si command and close the pipe"""
+    try:
+        view = memoryview(data)
+        for offset in range(0, len(view), 1024 * 1024):
+            stream.write(view[offset:offset + 1024 * 1024])
+    except (BrokenPipeError, OSError):
+        pass  # 7-Zip exited early; its return code tells the story
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def run_7z(cmd, progress_callback=None, stall_timeout=None,
+           cancel_event=None, total_bytes=None, input_data=None):
+    """Run a 7z command and stream its -bsp1 progress output.
+
+    progress_callback receives a dict with 'percent', 'elapsed', 'bytes_per_sec'
+    (only when total_bytes is known) and 'eta'. The process is killed when
+    nothing was printed for stall_timeout seconds (SevenZipStalledError; None
+    derives it from total_bytes via stall_timeout_for) or when
+    cancel_event is set (SevenZipCancelledError). input_data (bytes) is fed
+    to stdin, for use with the -si switch.
+    Returns a subprocess.CompletedProcess with text stdout/stderr.
+    """
+    cmd = list(cmd)
+    if stall_timeout is None:
+        stall_timeout = stall_timeout_for(total_bytes)
+    # Progress and messages on stdout, errors on stderr
+    cmd[2:2] = ['-bsp1', '-bso1', '-bse2']
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    stdout_queue = queue.Queue()
+    stderr_queue = queue.Queue()
+    readers = [
+        threading.Thread(target=_pump, args=(proc.stdout, stdout_queue), daemon=True),
+        threading.Thread(target=_pump, args=(proc.stderr, stderr_queue), daemon=True),
+    ]
+    if input_data is not None:
+        readers.append(threading.Thread(target=_feed, args=(proc.stdin, input_data), daemon=True))
+    for reader in readers:
+        reader.start()
+
+    start = time.monotonic()
+    last_activity = start
+    last_percent = -1
+    pending = ""
+    lines = []
+    stdout_open = True
+
+    def handle_segment(segment):
+        nonlocal last_percent
+        segment = segment.strip()
+        if not segment:
+            return
+        match = _PERCENT_RE.match(segment)
+        if not match:
+            lines.append(segment)
+            return
+        percent = min(int(match.group(1)), 100)
+        if percent == last_percent:
+            return
+        last_percent = percent
+        if progress_callback:
+            elapsed = time.monotonic() - start
+            done_bytes = total_bytes * percent / 100 if total_bytes else None
+            rate = done_bytes / elapsed if done_bytes and elapsed > 0 else None
+            eta = (total_bytes - done_bytes) / rate if rate else None
+            try:
+                progress_callback({
+                    'percent': percent,
+                    'elapsed': elapsed,
+                    'bytes_per_sec': rate,
+                    'eta': eta,
+                })
+            except Exception as e:
+                print(f"7-Zip progress callback error: {e}")
+
+    try:
+        while stdout_open:
+            if cancel_event is not None and cancel_event.is_set():
+                raise SevenZipCancelledError("7-Zip operation cancelled")
+
+            try:
+                chunk = stdout_queue.get(timeout=0.2)
+            except queue.Empty:
+                if time.monotonic() - last_activity > stall_timeout:
+                    raise SevenZipStalledError(stall_timeout)
+                continue
+
+            if chunk is None:
+                stdout_open = False
+                chunk = b"\n"
+            last_activity = time.monotonic()
+
+            pending += chunk.decode(errors="replace")
+            segments = _SEGMENT_RE.split(pending)
+            pending = segments.pop()
+            for segment in segments:
+                handle_segment(segment)
+
+        handle_segment(pending)
+        returncode = proc.wait()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        for reader in readers:
+            reader.join(timeout=1)
+
+    stderr_chunks = []
+    while True:
+        try:
+            chunk = stderr_queue.get_nowait()
+        except queue.Empty:
+            break
+        if chunk:
+            stderr_chunks.append(chunk)
+
+    return subprocess.CompletedProcess(
+        cmd, returncode, "\n".join(lines), b"".join(stderr_chunks).decode(errors="replace")
+    )
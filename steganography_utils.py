@@ -2,15 +2,26 @@
 import os
 import numpy as np
 from cryptography.fernet import Fernet, InvalidToken
-from audio_format_handler import AudioFormatHandler
+from audio_format_handler import AudioFormatHandler, prefetch_blocks
 from database import DatabaseManager
+from seven_zip_runner import (
+    run_7z, SevenZipStalledError, SevenZipCancelledError
+)
 from PIL import Image
 import PyPDF2
 import hashlib
+import lzma
+import zlib
 from datetime import datetime
 import subprocess
-import tempfile
+import platform
 import shutil
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 # Add this at the top of steganography_utils.py
 import bcrypt
 
@@ -56,76 +67,310 @@ def estimate_audio_duration_needed(data_size_bytes, format_info=None):
     sample_rate = format_info.get('sample_rate', 44100) if format_info else 44100
     return (samples_needed / sample_rate) / 60  # minutes
 
-def _embed_lsb(pcm_data, data_bytes):
-    """Embed data in PCM using LSB - ENHANCED version with better reliability"""
-    data_length = len(data_bytes)
-    required_samples = 32 + data_length * 8
+# Unsigned views used to flip the LSB of each sample at its native width
+_LSB_VIEWS = {
+    np.dtype(np.int16): np.uint16,
+    np.dtype(np.int32): np.uint32,   # 24-bit (sign-extended) and 32-bit PCM
+    np.dtype(np.float32): np.uint32, # float WAV: LSB of the mantissa
+}
+
+def _lsb_view(pcm_data):
+    """Unsigned view of pcm_data for bit operations (other dtypes fall back to int16 as before)"""
+    if pcm_data.dtype not in _LSB_VIEWS:
+        pcm_data = pcm_data.astype(np.int16)
+    return pcm_data.view(_LSB_VIEWS[pcm_data.dtype])
+
+# Embedding layouts. The id sits in the top byte of the 32-bit length header, so files
+# written before layouts existed (top byte 0) still decode as sequential.
+EMBEDDING_LAYOUTS = {'sequential': 0, 'striped': 1, 'spread': 2, 'scattered': 3}
+_LAYOUT_SEQUENTIAL, _LAYOUT_STRIPED, _LAYOUT_SPREAD, _LAYOUT_SCATTERED = 0, 1, 2, 3
+_HEADER_BITS = 32
+_MAX_DATA_LENGTH = 10000000  # fits in the 24 bits below the layout byte
+_PARALLEL_STRIPE_BITS = 1 << 20  # stripes this long are embedded on one thread per channel
+_SPARSE_READ_FRAMES = 16 * 1024  # a FLAC seek decodes ~4096 frames, so wider gaps are cheaper to seek over
+_SCATTER_CHUNK = 1 << 16  # scattered bits handled per vectorized step (keeps temporaries cache-sized)
+
+def _layout_id(layout):
+    if layout not in EMBEDDING_LAYOUTS:
+        raise ValueError(f"Unknown embedding layout: {layout}")
+    return EMBEDDING_LAYOUTS[layout]
+
+def _scatter_seed(key):
+    """128-bit position seed derived from the Fernet key, so only the key holder can find the bits"""
+    if isinstance(key, str):
+        key = key.encode()
+    return int.from_bytes(hashlib.sha256(b"lsb-scatter:" + key).digest()[:16], 'big')
+
+def _pack_header(layout_id, data_length):
+    """32-bit header: layout id in the top byte, data length in the low 24 bits (big-endian)"""
+    if data_length > _MAX_DATA_LENGTH:
+        raise ValueError(f"Data too large to embed: {data_length} bytes")
+    return np.array([(layout_id << 24) | data_length], dtype='>u4').view(np.uint8)
+
+def _unpack_header(header_bits):
+    """(layout_id, data_length) from the first 32 LSBs"""
+    value = int.from_bytes(np.packbits(header_bits).tobytes(), 'big')
+    layout_id, data_length = value >> 24, value & 0xFFFFFF
+    if layout_id not in EMBEDDING_LAYOUTS.values():
+        raise ValueError(f"Invalid data header: unknown layout {layout_id}")
+    if data_length <= 0 or data_length > _MAX_DATA_LENGTH:  # Sanity check
+        raise ValueError(f"Invalid data length extracted: {data_length}")
+    return layout_id, data_length
+
+class _PayloadLayout:
+    """Where each data bit lives, for one layout, payload size and carrier size.
     
-    if len(pcm_data) < required_samples:
-        raise ValueError(f"Audio too small: need {required_samples} samples, have {len(pcm_data)}")
+    The header always takes the first 32 interleaved samples. After it:
+      sequential - data bits follow in interleaved order (the original layout)
+      striped    - channel c holds one contiguous slice of the data in its own samples
+      spread     - data bits are spaced evenly across the rest of the file
+      scattered  - like spread, but each bit sits at a key-seeded random offset
+                   inside its stride-wide stratum
+    The first three are a few arithmetic runs of samples, so embedding and
+    extraction stay strided numpy slices. Scattered offsets are generated once
+    per payload; positions only grow with the bit index, so the bits in any
+    sample range are one contiguous slice of the data (scatter()).
+    """
     
-    # Ensure correct data type
-    if pcm_data.dtype != np.int16:
-        pcm_data = pcm_data.astype(np.int16)
+    def __init__(self, layout_id, data_bits, total_samples, channels=1, key=None):
+        self.layout_id = layout_id
+        self.data_bits = data_bits
+        self.channels = max(1, channels)
+        self.stride = 1
+        if layout_id == _LAYOUT_SCATTERED:
+            if key is None:
+                raise ValueError("The scattered layout needs the decryption key")
+            self.seed = _scatter_seed(key)
+            self.stride = max(1, (total_samples - _HEADER_BITS) // max(1, data_bits))
+            self.end = _HEADER_BITS + data_bits * self.stride
+        elif layout_id == _LAYOUT_STRIPED:
+            self.header_frames = -(-_HEADER_BITS // self.channels)
+            self.per_channel = -(-data_bits // self.channels)
+            self.end = (self.header_frames + self.per_channel) * self.channels
+        else:
+            if layout_id == _LAYOUT_SPREAD:
+                self.stride = max(1, (total_samples - _HEADER_BITS) // max(1, data_bits))
+            self.end = _HEADER_BITS + (data_bits - 1) * self.stride + 1
+        if self.end > total_samples:
+            raise ValueError(f"Audio too small: need {self.end} samples, have {total_samples}")
+        if layout_id == _LAYOUT_SCATTERED:
+            self.offsets = self._scatter_offsets()
     
-    # Create copy to avoid modifying original
-    modified_pcm = pcm_data.copy()
+    def _scatter_offsets(self):
+        """Offset (0 <= offset < stride) of every data bit inside its stratum, in the narrowest dtype.
+        
+        Offsets are fixed-point fractions of the stride (multiply-shift) cut from
+        one key-seeded PCG64 stream: 16-bit lanes for strides up to 256, 32-bit
+        lanes up to 2**24, so the bias stays under 1/256 and each 64-bit draw
+        yields four or two offsets.
+        """
+        if self.stride == 1:
+            return np.zeros(self.data_bits, dtype=np.uint8)  # every stratum is a single sample
+        bit_generator = np.random.PCG64(np.random.SeedSequence(self.seed))
+        offsets = np.empty(self.data_bits, dtype=np.min_scalar_type(self.stride - 1))
+        if self.stride > 1 << 24:
+            # Only very sparse payloads get here, so a plain bounded draw is cheap enough
+            offsets[:] = np.random.Generator(bit_generator).integers(0, self.stride, size=self.data_bits)
+            return offsets
+        lane, wide = ('<u2', np.uint32) if self.stride <= 256 else ('<u4', np.uint64)
+        lane_bits = np.dtype(lane).itemsize * 8
+        scaled = np.empty(_SCATTER_CHUNK, dtype=wide)
+        for start in range(0, self.data_bits, _SCATTER_CHUNK):
+            count = min(_SCATTER_CHUNK, self.data_bits - start)
+            raw = bit_generator.random_raw(-(-count * lane_bits // 64)).astype('<u8', copy=False)
+            np.multiply(raw.view(lane)[:count], self.stride, out=scaled[:count], dtype=wide)
+            scaled[:count] >>= wide(lane_bits)
+            offsets[start:start + count] = scaled[:count]
+        return offsets
     
-    # Use unsigned view to prevent overflow
-    pcm_uint16 = modified_pcm.view(np.uint16)
+    def _first_scattered_bit(self, sample):
+        """Index of the first scattered bit stored at or after sample"""
+        bit = min(self.data_bits, max(0, sample - _HEADER_BITS) // self.stride)
+        if bit < self.data_bits and _HEADER_BITS + bit * self.stride + int(self.offsets[bit]) < sample:
+            bit += 1  # sample falls inside this bit's stratum, after the bit
+        return bit
     
-    # Embed length (32 bits, MSB first)
-    for i in range(32):
-        bit = (data_length >> (31 - i)) & 1
-        pcm_uint16[i] = (pcm_uint16[i] & 0xFFFE) | bit
+    def scatter(self, start, stop):
+        """Yield (first_bit, sample positions) for the scattered bits stored in samples [start, stop).
+        
+        Each chunk holds data bits first_bit, first_bit + 1, ... in order; chunks
+        of _SCATTER_CHUNK bits keep the position arrays cache-sized.
+        """
+        first, last = self._first_scattered_bit(start), self._first_scattered_bit(stop)
+        for lo in range(first, last, _SCATTER_CHUNK):
+            hi = min(last, lo + _SCATTER_CHUNK)
+            positions = np.arange(_HEADER_BITS + lo * self.stride, _HEADER_BITS + hi * self.stride,
+                                  self.stride, dtype=np.int64)
+            positions += self.offsets[lo:hi]
+            yield lo, positions
     
-    # Embed data
-    index = 32
-    for byte in data_bytes:
-        for j in range(8):
-            bit = (byte >> (7 - j)) & 1
-            pcm_uint16[index] = (pcm_uint16[index] & 0xFFFE) | bit
-            index += 1
+    def runs(self, start, stop):
+        """[(first_sample, step, first_bit, count)] for the data bits stored in samples [start, stop)"""
+        if self.layout_id == _LAYOUT_SCATTERED:
+            raise ValueError("Scattered bits are not in runs; use scatter()")
+        if self.layout_id != _LAYOUT_STRIPED:
+            first = max(0, -(-(start - _HEADER_BITS) // self.stride))
+            last = min(self.data_bits, -(-(stop - _HEADER_BITS) // self.stride))
+            if last <= first:
+                return []
+            return [(_HEADER_BITS + first * self.stride, self.stride, first, last - first)]
+        
+        runs = []
+        for channel in range(self.channels):
+            channel_bits = min(self.per_channel, max(0, self.data_bits - channel * self.per_channel))
+            first = max(0, -(-(start - channel) // self.channels) - self.header_frames)
+            last = min(channel_bits, -(-(stop - channel) // self.channels) - self.header_frames)
+            if last > first:
+                runs.append(((self.header_frames + first) * self.channels + channel, self.channels,
+                             channel * self.per_channel + first, last - first))
+        return runs
+
+def _bit_range(data, first_bit, count):
+    """Bits [first_bit, first_bit + count) of a uint8 array, MSB first, unpacking only those bytes"""
+    first_byte = first_bit // 8
+    bits = np.unpackbits(data[first_byte:-(-(first_bit + count) // 8)])
+    offset = first_bit - first_byte * 8
+    return bits[offset:offset + count]
+
+def _embed_lsb_block(pcm_block, header, data, plan, position):
+    """Embed the header/data bits that fall on samples [position, position + len(pcm_block)) in place"""
+    stop = position + len(pcm_block)
+    if position < _HEADER_BITS:
+        _embed_bits(pcm_block, _bit_range(header, position, min(_HEADER_BITS, stop) - position))
     
-    # Return as signed int16
-    return pcm_uint16.view(np.int16)
+    if plan.layout_id == _LAYOUT_SCATTERED:
+        pcm_unsigned = _lsb_view(pcm_block)
+        clear_lsb = ~pcm_unsigned.dtype.type(1)
+        for first_bit, positions in plan.scatter(position, stop):
+            positions -= position
+            pcm_unsigned[positions] = ((pcm_unsigned[positions] & clear_lsb)
+                                       | _bit_range(data, first_bit, len(positions)))
+        return pcm_block
+    
+    def embed_run(run):
+        sample, step, first_bit, count = run
+        # Strided view: writes through to pcm_block
+        _embed_bits(pcm_block[sample - position::step], _bit_range(data, first_bit, count))
+    
+    runs = plan.runs(position, stop)
+    if len(runs) > 1 and min(run[3] for run in runs) >= _PARALLEL_STRIPE_BITS:
+        # Stripes touch disjoint samples, so channels can be embedded concurrently
+        with ThreadPoolExecutor(max_workers=len(runs)) as pool:
+            list(pool.map(embed_run, runs))
+    else:
+        for run in runs:
+            embed_run(run)
+    return pcm_block
 
-def _extract_lsb(pcm_data):
+def _collect_lsb_block(pcm_block, plan, position, bits):
+    """Copy the data bits stored in pcm_block (starting at sample position) into bits"""
+    if plan.layout_id == _LAYOUT_SCATTERED:
+        pcm_unsigned = _lsb_view(pcm_block)
+        for first_bit, positions in plan.scatter(position, position + len(pcm_block)):
+            positions -= position
+            bits[first_bit:first_bit + len(positions)] = pcm_unsigned[positions] & 1
+        return
+    for sample, step, first_bit, count in plan.runs(position, position + len(pcm_block)):
+        samples = _lsb_view(pcm_block[sample - position::step][:count])
+        bits[first_bit:first_bit + count] = samples & 1
+
+def _extraction_plan(header_bits, total_samples, channels, key=None):
+    layout_id, data_length = _unpack_header(header_bits)
+    if layout_id == _LAYOUT_SCATTERED and key is None:
+        raise ValueError("This audio uses the scattered layout; the decryption key is needed to extract it")
+    try:
+        return _PayloadLayout(layout_id, data_length * 8, total_samples, channels, key)
+    except ValueError:
+        raise ValueError(f"Audio too small for declared data length: {data_length}")
+
+def _embed_lsb(pcm_data, data_bytes, layout="sequential", channels=1, key=None):
+    """Embed data in PCM using LSB - works at the native sample width (16/24/32-bit or float32)"""
+    plan = _PayloadLayout(_layout_id(layout), len(data_bytes) * 8, len(pcm_data), channels, key)
+    
+    # Create copy to avoid modifying original
+    modified_pcm = pcm_data.copy() if pcm_data.dtype in _LSB_VIEWS else pcm_data.astype(np.int16)
+    
+    # Header (layout + length, MSB first), then the data bits, MSB first, placed by the layout
+    return _embed_lsb_block(modified_pcm, _pack_header(plan.layout_id, len(data_bytes)),
+                            np.frombuffer(data_bytes, dtype=np.uint8), plan, 0)
+
+def _extract_lsb(pcm_data, channels=1, key=None):
     """Extract data from PCM using LSB - ENHANCED version with better error handling"""
-    if len(pcm_data) < 32:
+    if len(pcm_data) < _HEADER_BITS:
         raise ValueError("Audio too small to contain data")
     
-    # Ensure correct data type
-    if pcm_data.dtype != np.int16:
-        pcm_data = pcm_data.astype(np.int16)
-    
     # Use unsigned view for consistent bit operations
-    pcm_uint16 = pcm_data.view(np.uint16)
+    header_bits = (_lsb_view(pcm_data[:_HEADER_BITS]) & 1).astype(np.uint8)
+    plan = _extraction_plan(header_bits, len(pcm_data), channels, key)
     
-    # Extract length (32 bits, MSB first)
-    data_length = 0
-    for i in range(32):
-        bit = pcm_uint16[i] & 1
-        data_length = (data_length << 1) | bit
+    bits = np.empty(plan.data_bits, dtype=np.uint8)
+    _collect_lsb_block(pcm_data, plan, 0, bits)
+    return np.packbits(bits).tobytes()
+
+def _extract_lsb_stream(handler, file_path, format_info, key=None):
+    """Streaming _extract_lsb: reads only as far as the payload goes.
     
-    if data_length <= 0 or data_length > 10000000:  # Sanity check
-        raise ValueError(f"Invalid data length extracted: {data_length}")
+    Spread payloads whose bits sit further apart than _SPARSE_READ_FRAMES are
+    read by seeking to each bit's frame, so the gaps are never decoded.
+    """
+    channels = format_info['channels']
+    total_samples = format_info['frames'] * channels
+    header = handler.read_pcm_samples(file_path, format_info, range(_HEADER_BITS))
+    plan = _extraction_plan((_lsb_view(header) & 1).astype(np.uint8), total_samples, channels, key)
+    bits = np.empty(plan.data_bits, dtype=np.uint8)
     
-    if len(pcm_data) < 32 + data_length * 8:
-        raise ValueError(f"Audio too small for declared data length: {data_length}")
+    if plan.layout_id in (_LAYOUT_SPREAD, _LAYOUT_SCATTERED) and plan.stride >= _SPARSE_READ_FRAMES * channels:
+        if plan.layout_id == _LAYOUT_SCATTERED:
+            positions = np.concatenate([chunk for _, chunk in plan.scatter(0, plan.end)])
+        else:
+            positions = _HEADER_BITS + np.arange(plan.data_bits, dtype=np.int64) * plan.stride
+        bits[:] = _lsb_view(handler.read_pcm_samples(file_path, format_info, positions)) & 1
+        return np.packbits(bits).tobytes()
     
-    # Extract data
-    data_bytes = bytearray()
-    index = 32
-    for _ in range(data_length):
-        byte = 0
-        for _ in range(8):
-            bit = pcm_uint16[index] & 1
-            byte = (byte << 1) | bit
-            index += 1
-        data_bytes.append(byte)
+    blocks = prefetch_blocks(handler.iter_pcm_blocks(file_path, format_info))
+    position = 0
+    try:
+        for pcm_block in blocks:
+            _collect_lsb_block(pcm_block, plan, position, bits)
+            position += len(pcm_block)
+            if position >= plan.end:
+                return np.packbits(bits).tobytes()
+    finally:
+        blocks.close()
+    raise ValueError(f"Audio too small for declared data length: {plan.data_bits // 8}")
+
+def _encode_stream(handler, audio_path, output_path, format_info, data_bytes, layout="sequential",
+                   timings=None, key=None):
+    """Block-by-block encode: the next block decodes on a prefetch thread while this one is embedded and written"""
+    channels = format_info['channels']
+    plan = _PayloadLayout(_layout_id(layout), len(data_bytes) * 8, format_info['frames'] * channels,
+                          channels, key)
+    header = _pack_header(plan.layout_id, len(data_bytes))
+    data = np.frombuffer(data_bytes, dtype=np.uint8)
+    blocks = prefetch_blocks(handler.iter_pcm_blocks(audio_path, format_info))
+    position = 0
+    try:
+        with handler.open_pcm_writer(output_path, format_info) as writer:
+            while True:
+                with _timed(timings, 'pcm_read'):
+                    pcm_block = next(blocks, None)
+                if pcm_block is None:
+                    break
+                with _timed(timings, 'embed'):
+                    _embed_lsb_block(pcm_block, header, data, plan, position)
+                with _timed(timings, 'write'):
+                    writer.write(pcm_block)
+                position += len(pcm_block)
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)  # don't leave a half-written carrier behind
+        raise
+    finally:
+        blocks.close()
     
-    return bytes(data_bytes)
+    if position < plan.end:
+        os.remove(output_path)
+        raise ValueError(f"Audio too small: need {plan.end} samples, have {position}")
 
 def create_user_default_folder(user_id):
     """Create user-specific default folder for non-secure saves"""
@@ -144,6 +389,13 @@ def create_user_default_folder(user_id):
 
 # ===== COMPLETE 7-ZIP ARCHIVE FUNCTIONS =====
 
+def _record_archive_manifest(archive_path, members):
+    """Store the manifest of an archive we just wrote so later status checks skip 7-Zip"""
+    try:
+        DatabaseManager().save_archive_manifest(archive_path, members)
+    except Exception as e:
+        print(f"Archive manifest error: {e}")
+
 def create_encrypted_7z_directly(folder_path, archive_path, password, folder_name):
     """Create encrypted .7z archive directly from folder using py7zr or 7-Zip command line"""
     try:
@@ -153,11 +405,14 @@ def create_encrypted_7z_directly(folder_path, archive_path, password, folder_nam
             
             print(f"Creating 7z archive using py7zr: {archive_path}")
             
+            members = DatabaseManager.collect_folder_manifest(folder_path, folder_name)
+            
             # Create the .7z file directly with password
             with py7zr.SevenZipFile(archive_path, 'w', password=password) as archive:
                 # Add entire folder contents to archive
                 archive.writeall(folder_path, folder_name)
             
+            _record_archive_manifest(archive_path, members)
             return True, f"✅ Encrypted archive created: {os.path.basename(archive_path)}"
             
         except ImportError:
@@ -169,7 +424,7 @@ def create_encrypted_7z_directly(folder_path, archive_path, password, folder_nam
         print(f"7z creation error: {str(e)}")
         return False, f"❌ Failed to create archive: {str(e)}"
 
-def create_encrypted_7z_via_command(folder_path, archive_path, password):
+def create_encrypted_7z_via_command(folder_path, archive_path, password, progress_callback=None, cancel_event=None):
     """Fallback method using 7-Zip command line"""
     try:
         print(f"Creating 7z archive using command line: {archive_path}")
@@ -178,6 +433,8 @@ def create_encrypted_7z_via_command(folder_path, archive_path, password):
         if os.path.exists(archive_path):
             os.remove(archive_path)
         
+        members = DatabaseManager.collect_folder_manifest(folder_path)
+        
         # 7-Zip command for creating encrypted archive
         cmd = [
             '7z', 'a',              # Add to archive
@@ -190,125 +447,238 @@ def create_encrypted_7z_via_command(folder_path, archive_path, password):
             f'{folder_path}/*'      # Input folder contents
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        result = run_7z(cmd, progress_callback=progress_callback, cancel_event=cancel_event,
+                        total_bytes=sum(m[1] for m in members))
         
         if result.returncode == 0:
+            _record_archive_manifest(archive_path, members)
             return True, f"✅ Encrypted archive created: {os.path.basename(archive_path)}"
         else:
             print(f"7z command failed with code {result.returncode}")
             print(f"stderr: {result.stderr}")
             return False, f"❌ 7-Zip error: {result.stderr.strip() or 'Unknown error'}"
             
-    except subprocess.TimeoutExpired:
-        return False, "❌ 7-Zip operation timed out - folder may be too large"
+    except SevenZipStalledError as e:
+        DatabaseManager._remove_partial_archive(archive_path)
+        return False, f"❌ 7-Zip stopped making progress for {e.stall_timeout:.0f} seconds"
+    except SevenZipCancelledError:
+        DatabaseManager._remove_partial_archive(archive_path)
+        return False, "❌ 7-Zip operation cancelled"
     except FileNotFoundError:
         return False, "❌ 7-Zip command not found - please install 7-Zip"
     except Exception as e:
         print(f"Command line 7z error: {str(e)}")
         return False, f"❌ Failed to create archive: {str(e)}"
 
+# Subfolders we create inside every secure folder; never mistaken for the archive's root folder
+_SECURE_SUBFOLDERS = {"Images", "PDFs", "Messages"}
+
+def _archive_root_folder(member_names):
+    """Return the single top-level folder all members live in, or "" for flat archives"""
+    names = [name for name in member_names if name]
+    if not names or not all("/" in name for name in names):
+        return ""
+    tops = {name.split("/", 1)[0] for name in names}
+    if len(tops) == 1 and not tops & _SECURE_SUBFOLDERS:
+        return tops.pop()
+    return ""
+
+class ArchiveStagingArea:
+    """Holds the members of an encrypted archive in memory while it is edited.
+    
+    New members are fed to py7zr from bytes, so decoded plaintext never lands in a
+    temp directory and the password never appears on a command line. Only the
+    re-encrypted archive is written, next to the original, then swapped in.
+    """
+    
+    def __init__(self, archive_path, password):
+        self.archive_path = archive_path
+        self.password = password
+        self.members = {}
+        self.directories = set()
+    
+    def load(self):
+        """Read every existing member into memory, remembering directory entries (even empty ones)"""
+        import py7zr
+        from py7zr.io import BytesIOFactory
+        
+        with py7zr.SevenZipFile(self.archive_path, mode="r", password=self.password) as archive:
+            entries = archive.list()
+            files = [entry.filename for entry in entries if not entry.is_directory]
+            self.directories = {entry.filename.replace("\\", "/") for entry in entries if entry.is_directory}
+            limit = max((entry.uncompressed for entry in entries if not entry.is_directory), default=0)
+            factory = BytesIOFactory(limit + 1)
+            if files:
+                archive.extract(targets=files, factory=factory)
+        for name in files:
+            buffer = factory.get(name)
+            buffer.seek(0)
+            self.members[name.replace("\\", "/")] = buffer.read()
+        return self
+    
+    def member_path(self, subfolder, filename):
+        """Archive path for a new file, inside the archive's root folder if it has one"""
+        parts = [_archive_root_folder(self.members), subfolder, filename]
+        return "/".join(part for part in parts if part)
+    
+    def add(self, member_name, data):
+        self.members[member_name] = bytes(data)
+    
+    def commit(self):
+        """Write all members to a fresh archive and atomically replace the old one"""
+        import py7zr
+        
+        temp_path = self.archive_path + ".tmp"
+        # py7zr only makes directory entries from a real directory; the archive's own
+        # folder serves as the template (write() adds the entry, never its contents)
+        template_dir = os.path.dirname(os.path.abspath(self.archive_path))
+        try:
+            with py7zr.SevenZipFile(temp_path, 'w', password=self.password) as archive:
+                archive.set_encrypted_header(True)
+                for name in sorted(self.directories):
+                    archive.write(template_dir, name)
+                for name in sorted(self.members):
+                    archive.writestr(self.members[name], name)
+            os.replace(temp_path, self.archive_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        _record_archive_manifest(self.archive_path, sorted(
+            (name, len(data), zlib.crc32(data)) for name, data in self.members.items()
+        ))
+
 def add_file_to_secure_archive(archive_path, password, file_data, filename, subfolder="Images"):
-    """Add a file to an existing encrypted .7z archive"""
+    """Add a file to an existing encrypted .7z archive without staging plaintext on disk"""
     try:
         print(f"Adding file {filename} to archive {archive_path}")
         
-        # Create temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Try py7zr first
-            try:
-                import py7zr
-                
-                print("Using py7zr for archive manipulation")
-                
-                # Extract existing archive
-                with py7zr.SevenZipFile(archive_path, mode="r", password=password) as archive:
-                    archive.extractall(path=temp_dir)
-                
-                # Find the extracted folder
-                extracted_folders = [d for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d))]
-                if not extracted_folders:
-                    return False, "No folder found in archive"
-                
-                extracted_folder = os.path.join(temp_dir, extracted_folders[0])
-                
-                # Add new file
-                target_dir = os.path.join(extracted_folder, subfolder)
-                os.makedirs(target_dir, exist_ok=True)
-                
-                with open(os.path.join(target_dir, filename), "wb") as f:
-                    f.write(file_data)
-                
-                # Remove old archive
-                os.remove(archive_path)
-                
-                # Create new archive with updated contents
-                with py7zr.SevenZipFile(archive_path, 'w', password=password) as new_archive:
-                    new_archive.writeall(extracted_folder, extracted_folders[0])
-                
-                return True, f"File added to secure archive: {filename}"
-                
-            except ImportError:
-                print("py7zr not available, using command line")
-                # Fallback to 7-Zip command line
-                return add_file_to_archive_via_command(archive_path, password, file_data, filename, subfolder, temp_dir)
+        # Try py7zr first
+        try:
+            import py7zr
+        except ImportError:
+            print("py7zr not available, using command line")
+            # Fallback to 7-Zip command line
+            return add_file_to_archive_via_command(archive_path, password, file_data, filename, subfolder)
+        
+        print("Using py7zr in-memory staging for archive manipulation")
+        staging = ArchiveStagingArea(archive_path, password).load()
+        staging.add(staging.member_path(subfolder, filename), file_data)
+        staging.commit()
+        
+        return True, f"File added to secure archive: {filename}"
                 
     except Exception as e:
         print(f"Archive manipulation error: {str(e)}")
         return False, f"Failed to add file to archive: {str(e)}"
 
-def add_file_to_archive_via_command(archive_path, password, file_data, filename, subfolder, temp_dir):
-    """Fallback method using 7-Zip command line"""
+def _list_archive_members(archive_path, password):
+    """Member names of an encrypted archive, from the manifest when it is verified and still current"""
+    manifest = DatabaseManager().get_archive_manifest(archive_path)
+    if manifest and manifest['verified'] and manifest['members'] is not None:
+        return [m[0] for m in manifest['members']], manifest
+    
+    result = run_7z(['7z', 'l', '-slt', f'-p{password}', archive_path],
+                    total_bytes=os.path.getsize(archive_path))
+    if result.returncode != 0:
+        raise ValueError(f"Failed to list archive: {result.stderr.strip()}")
+    names = [line[len("Path = "):].replace("\\", "/") for line in result.stdout.splitlines()
+             if line.startswith("Path = ")]
+    # The first Path entry is the archive itself
+    return names[1:], None
+
+def _archive_file_listing(archive_path, password=None):
+    """(name, size, crc32) for every file stored in an archive, from py7zr or `7z l -slt`"""
+    try:
+        import py7zr
+    except ImportError:
+        py7zr = None
+    if py7zr is not None:
+        with py7zr.SevenZipFile(archive_path, 'r', password=password) as archive:
+            return sorted((info.filename.replace("\\", "/"), info.uncompressed, info.crc32 or 0)
+                          for info in archive.list() if not info.is_directory)
+    
+    cmd = ['7z', 'l', '-slt']
+    if password:
+        cmd.append(f'-p{password}')
+    result = run_7z(cmd + [archive_path], total_bytes=os.path.getsize(archive_path))
+    if result.returncode != 0:
+        raise ValueError(f"Failed to list archive: {result.stderr.strip()}")
+    
+    entries = []
+    for line in result.stdout.splitlines():
+        key, sep, value = line.partition(" = ")
+        if not sep:
+            continue
+        if key == "Path":
+            entries.append({})
+        if entries:
+            entries[-1][key] = value
+    
+    members = []
+    for entry in entries[1:]:  # the first Path entry is the archive itself
+        if entry.get("Folder") == "+" or entry.get("Attributes", "").startswith("D"):
+            continue
+        members.append((entry["Path"].replace("\\", "/"), int(entry.get("Size") or 0),
+                        int(entry.get("CRC") or "0", 16)))
+    return sorted(members)
+
+def _test_archive(archive_path, password):
+    """(ok, error) from decompressing every member and checking its CRC, with py7zr or `7z t`"""
+    try:
+        import py7zr
+    except ImportError:
+        result = run_7z(['7z', 't', f'-p{password}', archive_path], total_bytes=os.path.getsize(archive_path))
+        return result.returncode == 0, result.stderr.strip()
+    try:
+        with py7zr.SevenZipFile(archive_path, 'r', password=password) as archive:
+            bad_member = archive.testzip()
+    except Exception as e:
+        return False, str(e) or type(e).__name__
+    if bad_member:
+        return False, f"CRC mismatch in {bad_member}"
+    return True, ""
+
+def _manifest_matches_archive(archive_path, manifest, password=None):
+    """True when the names, sizes and CRC32s stored in the manifest are what the archive holds"""
+    if manifest is None or manifest['members'] is None:
+        return False
+    return _archive_file_listing(archive_path, password) == sorted(manifest['members'])
+
+def add_file_to_archive_via_command(archive_path, password, file_data, filename, subfolder):
+    """Fallback method using 7-Zip command line - streams the file in via stdin (-si)"""
     try:
         print("Using 7-Zip command line for archive manipulation")
         
-        # Extract archive using 7-Zip command
-        extract_cmd = [
-            '7z', 'x',
-            f'-p{password}',
-            f'-o{temp_dir}',
-            '-y',
-            archive_path
-        ]
+        member_names, manifest = _list_archive_members(archive_path, password)
+        parts = [_archive_root_folder(member_names), subfolder, filename]
+        member_name = "/".join(part for part in parts if part)
         
-        result = subprocess.run(extract_cmd, capture_output=True, text=True, timeout=60)
-        if result.returncode != 0:
-            return False, f"Failed to extract archive: {result.stderr}"
-        
-        # Find extracted folder
-        extracted_folders = [d for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d))]
-        if not extracted_folders:
-            return False, "No folder found in archive"
-        
-        extracted_folder = os.path.join(temp_dir, extracted_folders[0])
-        
-        # Add new file
-        target_dir = os.path.join(extracted_folder, subfolder)
-        os.makedirs(target_dir, exist_ok=True)
-        
-        with open(os.path.join(target_dir, filename), "wb") as f:
-            f.write(file_data)
-        
-        # Remove old archive
-        os.remove(archive_path)
-        
-        # Create new archive
-        create_cmd = [
+        # 7-Zip updates the archive in place from stdin; nothing is extracted.
+        # The CLI has no non-interactive way to take the password other than -p.
+        add_cmd = [
             '7z', 'a',
             '-t7z',
             f'-p{password}',
             '-mhe=on',
             '-mx=9',
+            f'-si{member_name}',
             '-y',
-            archive_path,
-            f'{extracted_folder}/*'
+            archive_path
         ]
         
-        result = subprocess.run(create_cmd, capture_output=True, text=True, timeout=120)
+        result = run_7z(add_cmd, total_bytes=len(file_data), input_data=file_data)
         if result.returncode == 0:
+            if manifest and manifest['members'] is not None:
+                members = [m for m in manifest['members'] if m[0] != member_name]
+                members.append((member_name, len(file_data), zlib.crc32(file_data)))
+                _record_archive_manifest(archive_path, sorted(members))
             return True, f"File added to secure archive: {filename}"
         else:
-            return False, f"Failed to recreate archive: {result.stderr}"
+            return False, f"Failed to update archive: {result.stderr}"
             
+    except SevenZipStalledError as e:
+        return False, f"7-Zip stopped making progress for {e.stall_timeout:.0f} seconds"
     except Exception as e:
         print(f"Command line archive manipulation error: {str(e)}")
         return False, f"Command line archive operation failed: {str(e)}"
@@ -318,39 +688,46 @@ def check_folder_encryption_status(folder_path, db):
     try:
         # Check if folder has 7-Zip archive (direct .7z approach)
         archive_path = folder_path + "_secure.7z"
-        if os.path.exists(archive_path):
+        
+        # A manifest with a matching stat fingerprint proves the archive exists unchanged
+        manifest = db.get_archive_manifest(archive_path) if db else None
+        if manifest or os.path.exists(archive_path):
+            members_text = f" - {manifest['member_count']} files" if manifest and manifest['member_count'] is not None else ""
             # Check if original folder still exists
             if os.path.exists(folder_path):
                 return {
                     'is_encrypted': True,
                     'method': '7zip_ready',
-                    'status_text': '7-Zip Ready (Folder + Archive)',
+                    'status_text': f'7-Zip Ready (Folder + Archive){members_text}',
                     'icon': '🔓',
-                    'color': 'orange'
+                    'color': 'orange',
+                    'manifest': manifest
                 }
             else:
                 return {
                     'is_encrypted': True,
                     'method': '7zip_archived',
-                    'status_text': '7-Zip AES-256 Archived',
+                    'status_text': f'7-Zip AES-256 Archived{members_text}',
                     'icon': '🛡️',
-                    'color': 'green'
+                    'color': 'green',
+                    'manifest': manifest
                 }
         
-        # Check if folder is hidden
-        try:
-            result = subprocess.run(['attrib', folder_path], 
-                                  capture_output=True, text=True, shell=True)
-            if result.returncode == 0 and 'H' in result.stdout:
-                return {
-                    'is_encrypted': False,
-                    'method': 'hidden',
-                    'status_text': 'Hidden Folder',
-                    'icon': '🫥',
-                    'color': 'blue'
-                }
-        except:
-            pass
+        # Check if folder is hidden (attrib only exists on Windows)
+        if platform.system() == "Windows":
+            try:
+                result = subprocess.run(['attrib', folder_path], 
+                                      capture_output=True, text=True, shell=True)
+                if result.returncode == 0 and 'H' in result.stdout:
+                    return {
+                        'is_encrypted': False,
+                        'method': 'hidden',
+                        'status_text': 'Hidden Folder',
+                        'icon': '🫥',
+                        'color': 'blue'
+                    }
+            except:
+                pass
         
         # Standard folder
         return {
@@ -369,53 +746,119 @@ def check_folder_encryption_status(folder_path, db):
             'color': 'gray'
         }
 
+def _write_stego_audio(handler, carrier_path, output_path, format_info, data_bytes, layout="sequential",
+                       key=None, timings=None, pcm_data=None):
+    """Embed data_bytes (header + layout) into the carrier and write output_path.
+    
+    Streams block by block when the format calls for it; otherwise pcm_data
+    (the carrier as returned by to_pcm, left unmodified) saves decoding it again.
+    """
+    if handler.supports_streaming(format_info):
+        # Bounded memory: decode, embed and write one block at a time
+        _encode_stream(handler, carrier_path, output_path, format_info, data_bytes, layout, timings, key)
+        return
+    if pcm_data is None:
+        with _timed(timings, 'pcm_read'):
+            pcm_data = handler.to_pcm(carrier_path, format_info)
+    with _timed(timings, 'embed'):
+        modified_pcm = _embed_lsb(pcm_data, data_bytes, layout, format_info['channels'], key)
+    with _timed(timings, 'write'):
+        handler.from_pcm(modified_pcm, output_path, format_info)
+
 # ===== COMPLETE MAIN FUNCTIONS WITH ALL ENHANCEMENTS =====
 
-def encode_data(audio_path, data, output_path, data_type, user_id, input_file_path=None, receiver_email=None):
-    """Main encoding function with recipient email embedding - COMPLETE ENHANCED VERSION"""
+def _embed_bits(pcm_data, bits, offset=0):
+    """Write a precomputed bit array into the LSBs of pcm_data[offset:] in place"""
+    end = offset + len(bits)
+    if len(pcm_data) < end:
+        raise ValueError(f"Audio too small: need {end} samples, have {len(pcm_data)}")
+    if pcm_data.dtype not in _LSB_VIEWS:
+        raise ValueError(f"Unsupported PCM sample type: {pcm_data.dtype}")
+    pcm_unsigned = _lsb_view(pcm_data)
+    clear_lsb = ~pcm_unsigned.dtype.type(1)
+    pcm_unsigned[offset:end] = (pcm_unsigned[offset:end] & clear_lsb) | bits
+    return pcm_data
+
+def _prepare_raw_data(data, data_type):
+    """Validate message/file data and return it as bytes"""
+    if data_type == "message":
+        if not isinstance(data, str):
+            raise ValueError(f"Message data must be string, got {type(data)}")
+        if len(data) > 255:
+            raise ValueError("Message too long (max 255 characters)")
+        return data.encode('utf-8')
+    if not isinstance(data, bytes):
+        raise ValueError(f"File data must be bytes, got {type(data)}")
+    return data
+
+def _recipient_prefix(receiver_email):
+    """EMAIL:<address>|<hash>| header that binds the payload to one recipient"""
+    if receiver_email:
+        email_hash = hashlib.sha256(receiver_email.encode()).hexdigest()[:8]
+        return f"EMAIL:{receiver_email}|{email_hash}|".encode()
+    # Fallback for backward compatibility or no email
+    return b"EMAIL:NONE|00000000|"
+
+def estimate_encoded_size(raw_size, receiver_email=None):
+    """Bytes encode_data will embed for raw_size bytes of data (recipient header + Fernet token)"""
+    token_size = 1 + 8 + 16 + (raw_size // 16 + 1) * 16 + 32  # version, timestamp, IV, padded AES, HMAC
+    return len(_recipient_prefix(receiver_email)) + 4 * -(-token_size // 3)  # urlsafe base64
+
+@contextmanager
+def _timed(timings, phase):
+    """Add the wall time of the block to timings[phase] (seconds) when timings is a dict"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+def encode_data(audio_path, data, output_path, data_type, user_id, input_file_path=None, receiver_email=None,
+                timings=None, layout="sequential"):
+    """Main encoding function with recipient email embedding - COMPLETE ENHANCED VERSION
+    
+    Pass a dict as timings to get per-phase seconds: format_detect, encrypt,
+    pcm_read, embed, write and db. layout is one of EMBEDDING_LAYOUTS
+    ('sequential', 'striped', 'spread' or 'scattered') and is recorded in the
+    header; scattered positions are derived from the returned key.
+    """
     handler = AudioFormatHandler()
     db = DatabaseManager()
+    started = time.perf_counter()
     
     print(f"=== Encoding {data_type} ===")
     print(f"Audio: {audio_path}")
     print(f"Output: {output_path}")
     
     # Detect format
-    format_info = handler.detect_format(audio_path)
+    with _timed(timings, 'format_detect'):
+        # Other lossless containers (AIFF, W64, ...) are transcoded to a cached WAV/FLAC carrier
+        carrier_path, format_info = handler.prepare_carrier(audio_path)
     if 'error' in format_info:
         raise ValueError(format_info['error'])
     
     print(f"Format: {format_info['format'].upper()}")
     
     # Prepare data with enhanced validation
+    raw_data = _prepare_raw_data(data, data_type)
     if data_type == "message":
-        if not isinstance(data, str):
-            raise ValueError(f"Message data must be string, got {type(data)}")
-        if len(data) > 255:
-            raise ValueError("Message too long (max 255 characters)")
-        raw_data = data.encode('utf-8')
         print(f"Message: {data} ({len(raw_data)} bytes)")
     else:
-        if not isinstance(data, bytes):
-            raise ValueError(f"File data must be bytes, got {type(data)}")
-        raw_data = data
         print(f"Data size: {len(raw_data)} bytes ({len(raw_data)/1024:.1f} KB)")
     
     # Encrypt data
-    key = Fernet.generate_key()
-    fernet = Fernet(key)
-    encrypted_data = fernet.encrypt(raw_data)
+    with _timed(timings, 'encrypt'):
+        key = Fernet.generate_key()
+        fernet = Fernet(key)
+        encrypted_data = fernet.encrypt(raw_data)
     print(f"Encrypted size: {len(encrypted_data)} bytes")
     
     # Embed recipient email and hash
+    data_to_encode = _recipient_prefix(receiver_email) + encrypted_data
     if receiver_email:
-        email_prefix = f"EMAIL:{receiver_email}|".encode()
-        email_hash = hashlib.sha256(receiver_email.encode()).hexdigest()[:8].encode()
-        data_to_encode = email_prefix + email_hash + b"|" + encrypted_data
         print(f"Using recipient email: {receiver_email}")
     else:
-        # Fallback for backward compatibility or no email
-        data_to_encode = b"EMAIL:NONE|" + b"00000000|" + encrypted_data
         print("No recipient email specified")
     
     print(f"Total data to encode: {len(data_to_encode)} bytes")
@@ -427,18 +870,16 @@ def encode_data(audio_path, data, output_path, data_type, user_id, input_file_pa
         raise ValueError(error_msg)
     
     print(f"Capacity: {capacity_info['capacity_percentage']:.1f}% used")
+    _layout_id(layout)  # reject an unknown layout before touching the output
+    print(f"Layout: {layout}")
     
-    # Convert to PCM and embed
-    pcm_data = handler.to_pcm(audio_path, format_info)
-    modified_pcm = _embed_lsb(pcm_data, data_to_encode)
-    
-    # Save result - CRITICAL FIX: Create directory first
+    # CRITICAL FIX: Create output directory first
     output_dir = os.path.dirname(output_path)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
         print(f"Created output directory: {output_dir}")
     
-    handler.from_pcm(modified_pcm, output_path, format_info)
+    _write_stego_audio(handler, carrier_path, output_path, format_info, data_to_encode, layout, key, timings)
     
     # Verify output file exists and has reasonable size
     if os.path.exists(output_path):
@@ -448,22 +889,121 @@ def encode_data(audio_path, data, output_path, data_type, user_id, input_file_pa
         raise ValueError("Failed to create output file")
     
     # Save to database (no secure folder for encoding)
-    try:
-        success, message, history_id = db.save_history(
-            user_id, "encode", data_type, input_file_path, audio_path, 
-            output_path, receiver_email, key.decode(),
-            format_info['format'], format_info.get('codec'), 'lsb',
-            get_file_size_mb(output_path), None, True, None, None  # No secure folder for encode
-        )
-        if success:
-            db.save_log(user_id, history_id, "encode", data_type, 
-                       f"Successfully encoded {data_type} in {format_info['format'].upper()}")
-    except Exception as e:
-        print(f"Database error: {e}")
+    with _timed(timings, 'db'):
+        try:
+            success, message, history_id = db.save_history(
+                user_id, "encode", data_type, input_file_path, audio_path, 
+                output_path, receiver_email, key.decode(),
+                format_info['format'], format_info.get('codec'), 'lsb',
+                get_file_size_mb(output_path), time.perf_counter() - started,
+                True, None, None  # No secure folder for encode
+            )
+            if success:
+                db.save_log(user_id, history_id, "encode", data_type, 
+                           f"Successfully encoded {data_type} in {format_info['format'].upper()}")
+        except Exception as e:
+            print(f"Database error: {e}")
     
     print(f"✅ Encoding complete: {output_path}")
     return key
 
+def _recipient_output_path(output_dir, audio_path, receiver_email, ext):
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    safe_email = re.sub(r'[^A-Za-z0-9._-]+', '_', receiver_email)
+    return os.path.join(output_dir, f"{stem}_{safe_email}.{ext}")
+
+def encode_data_multi(audio_path, data, output_dir, data_type, user_id, receiver_emails,
+                      input_file_path=None, deliver=None, max_workers=None, layout="sequential"):
+    """Encode the same data for many recipients, encrypting the payload once.
+    
+    All recipients share the key; only the EMAIL:...|hash| header differs per
+    recipient. Each output is written exactly as encode_data writes it (same
+    header, layout and streaming path); carriers that are not streamed are
+    decoded to PCM once and shared. Each recipient's embed + write runs on a
+    thread pool, followed by deliver(receiver_email, output_path, key) when
+    given, so file writes and SMTP sends overlap.
+    Returns (key, {receiver_email: result dict}).
+    """
+    handler = AudioFormatHandler()
+    db = DatabaseManager()
+    receiver_emails = list(dict.fromkeys(receiver_emails))  # drop duplicates, keep order
+    if not receiver_emails:
+        raise ValueError("At least one recipient email is required")
+    
+    print(f"=== Encoding {data_type} for {len(receiver_emails)} recipients ===")
+    started = time.perf_counter()
+    _layout_id(layout)  # reject an unknown layout before touching any output
+    carrier_path, format_info = handler.prepare_carrier(audio_path)
+    if 'error' in format_info:
+        raise ValueError(format_info['error'])
+    
+    raw_data = _prepare_raw_data(data, data_type)
+    key = Fernet.generate_key()
+    encrypted_data = Fernet(key).encrypt(raw_data)
+    
+    longest = max(len(_recipient_prefix(email)) for email in receiver_emails) + len(encrypted_data)
+    if longest > _MAX_DATA_LENGTH:
+        raise ValueError(f"Data too large to embed: {longest} bytes")
+    capacity_info = handler.estimate_capacity(format_info, longest)
+    if not capacity_info['can_hold']:
+        raise ValueError(f"Audio file too small. Need ~{estimate_audio_duration_needed(longest, format_info):.1f} minutes")
+    
+    # Streamed carriers are decoded per recipient; the rest once, shared read-only by every worker
+    shared_pcm = None
+    if not handler.supports_streaming(format_info):
+        shared_pcm = handler.to_pcm(carrier_path, format_info)
+        shared_pcm.setflags(write=False)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    def encode_one(receiver_email):
+        output_path = _recipient_output_path(output_dir, audio_path, receiver_email, format_info['format'])
+        _write_stego_audio(handler, carrier_path, output_path, format_info,
+                           _recipient_prefix(receiver_email) + encrypted_data, layout, key,
+                           pcm_data=shared_pcm)
+        result = {'success': True, 'output_path': output_path, 'delivered': False, 'error': None,
+                  'processing_time': time.perf_counter() - started}
+        if deliver:
+            try:
+                deliver(receiver_email, output_path, key)
+                result['delivered'] = True
+            except Exception as e:
+                result['error'] = f"Delivery failed: {str(e)}"
+        return result
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers or min(4, len(receiver_emails))) as pool:
+        futures = {pool.submit(encode_one, email): email for email in receiver_emails}
+        for future in as_completed(futures):
+            receiver_email = futures[future]
+            try:
+                results[receiver_email] = future.result()
+                print(f"✅ Encoded for {receiver_email}: {results[receiver_email]['output_path']}")
+            except Exception as e:
+                results[receiver_email] = {'success': False, 'output_path': None,
+                                           'delivered': False, 'error': str(e), 'processing_time': None}
+                print(f"❌ Encoding for {receiver_email} failed: {e}")
+    
+    # History is written from this thread - the SQLite connection isn't shared with workers
+    for receiver_email, result in results.items():
+        if not result['success']:
+            continue
+        try:
+            success, message, history_id = db.save_history(
+                user_id, "encode", data_type, input_file_path, audio_path,
+                result['output_path'], receiver_email, key.decode(),
+                format_info['format'], format_info.get('codec'), 'lsb',
+                get_file_size_mb(result['output_path']), result['processing_time'], True, None, None
+            )
+            if success:
+                db.save_log(user_id, history_id, "encode", data_type,
+                           f"Successfully encoded {data_type} in {format_info['format'].upper()} for {receiver_email}")
+        except Exception as e:
+            print(f"Database error: {e}")
+    
+    print(f"✅ Multi-recipient encoding complete: "
+          f"{sum(r['success'] for r in results.values())}/{len(receiver_emails)} outputs")
+    return key, results
+
 def decode_data(file_path, key, expected_type, user_id, folder_id=None):
     """Main decoding function with direct .7z archive support and all enhancements"""
     handler = AudioFormatHandler()
@@ -472,16 +1012,20 @@ def decode_data(file_path, key, expected_type, user_id, folder_id=None):
     print(f"=== Decoding {expected_type} ===")
     print(f"Audio: {file_path}")
     
-    # Detect format
-    format_info = handler.detect_format(file_path)
+    # Detect format; history keeps file_path, the file the user picked, even when it is transcoded
+    carrier_path, format_info = handler.prepare_carrier(file_path)
     if 'error' in format_info:
         raise ValueError(format_info['error'])
     
     print(f"Format: {format_info['format'].upper()}")
     
     # Convert to PCM and extract
-    pcm_data = handler.to_pcm(file_path, format_info)
-    extracted_data = _extract_lsb(pcm_data)
+    if handler.supports_streaming(format_info):
+        # Only decodes the blocks that hold the payload
+        extracted_data = _extract_lsb_stream(handler, carrier_path, format_info, key)
+    else:
+        pcm_data = handler.to_pcm(carrier_path, format_info)
+        extracted_data = _extract_lsb(pcm_data, format_info['channels'], key)
     
     # Extract email, hash, and encrypted data
     if not extracted_data.startswith(b"EMAIL:"):
@@ -842,41 +1386,192 @@ def get_folder_security_summary(folder_id, user_id):
             'description': 'App-level password protection without additional encryption'
         }
 
-def estimate_folder_compression_ratio(folder_path):
-    """Estimate compression ratio for 7-Zip encryption"""
+_PROBE_BLOCK_SIZE = 64 * 1024
+_PROBE_BLOCKS_PER_FILE = 4
+_PROBE_SAMPLE_BUDGET = 2 * 1024 * 1024  # bytes compressed per folder estimate, split by file size
+
+class CompressionProbeCache:
+    """Bounded LRU of solid compression probes keyed on (file type, level, budget, member stats)"""
+    
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (sampled, compressed)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            probe = self._entries.get(key)
+            if probe is not None:
+                self._entries.move_to_end(key)
+            return probe
+    
+    def put(self, key, probe):
+        with self._lock:
+            self._entries[key] = probe
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def __len__(self):
+        return len(self._entries)
+
+_compression_probe_cache = CompressionProbeCache()
+
+def _user_compression_level(user_id):
+    """The user's configured 7-Zip -mx level (9 without a user)"""
+    if user_id is None:
+        return 9
+    _, _, compression_level = DatabaseManager().get_user_security_preferences(user_id)
+    return compression_level
+
+def _lzma_dict_size(compression_level):
+    """LZMA2 dictionary size 7-Zip uses at a -mx level (64 KB at -mx1 up to 64 MB at -mx9)"""
+    level = min(compression_level, 9)
+    if level <= 5:
+        return 1 << (level * 2 + 14)
+    return 1 << 25 if level <= 7 else 1 << 26
+
+def _probe_spans(size, share, blocks_per_file=_PROBE_BLOCKS_PER_FILE):
+    """Evenly spaced (offset, length) spans covering share bytes of a size-byte file"""
+    if share >= size:
+        return [(0, size)]
+    blocks = max(1, min(blocks_per_file, share // _PROBE_BLOCK_SIZE))
+    length = -(-share // blocks)
+    step = (size - length) / max(blocks - 1, 1)
+    return [(int(i * step), length) for i in range(blocks)]
+
+def _probe_solid_compression(files, compression_level, budget):
+    """LZMA2-compress a size-proportional sample of files as one solid stream.
+    
+    files is a list of (path, size) in archive order. Like a solid 7-Zip block,
+    the samples share one compressor, so redundancy across files counts; the
+    dictionary is the -mx level's, scaled down with the sample so matches
+    never reach further back than they would in the real archive.
+    Returns (sampled_bytes, compressed_bytes).
+    """
+    total = sum(size for _, size in files)
+    if compression_level <= 0 or total == 0:
+        return total, total  # -mx=0 stores files as-is
+    
+    floor = budget // (4 * len(files))  # small files still get sampled
+    plans = [(path, _probe_spans(size, min(size, max(budget * size // total, floor, 1))))
+             for path, size in files]
+    planned = sum(length for _, spans in plans for _, length in spans)
+    
+    dict_size = _lzma_dict_size(compression_level)
+    scaled = dict_size * planned // total
+    filters = [{"id": lzma.FILTER_LZMA2, "preset": min(compression_level, 9),
+                "dict_size": max(min(dict_size, max(scaled, _PROBE_BLOCK_SIZE)), 4096)}]
+    compressor = lzma.LZMACompressor(format=lzma.FORMAT_RAW, filters=filters)
+    
+    sampled = 0
+    compressed = 0
+    for path, spans in plans:
+        try:
+            with open(path, "rb") as f:
+                for offset, length in spans:
+                    f.seek(offset)
+                    block = f.read(length)
+                    sampled += len(block)
+                    compressed += len(compressor.compress(block))
+        except OSError:
+            continue  # unreadable file - the type's ratio still covers its bytes
+    compressed += len(compressor.flush())
+    # LZMA2 falls back to stored chunks, so data never grows meaningfully
+    return sampled, min(compressed, sampled)
+
+def estimate_folder_compression_details(folder_path, compression_level=None, user_id=None):
+    """Estimate the 7-Zip archive size of a folder from sampled compression probes.
+    
+    A fixed sample budget is spread over the files in proportion to their size.
+    7-Zip's solid blocks group files by extension, so each file type is probed
+    as one solid stream and its ratio extrapolated to all bytes of that type.
+    Probes are cached per type on its members' (size, mtime), so repeat calls
+    only probe types with new or changed files.
+    compression_level defaults to user_id's configured level.
+    """
+    if compression_level is None:
+        compression_level = _user_compression_level(user_id)
+    budget = _PROBE_SAMPLE_BUDGET
+    by_type = {}
+    members = {}
+    total_size = 0
+    file_count = 0
+    probed = 0
+    
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            
+            ext = os.path.splitext(file)[1].lower() or "(none)"
+            stats = by_type.setdefault(ext, {"files": 0, "size": 0, "sampled": 0, "compressed": 0})
+            stats["files"] += 1
+            stats["size"] += st.st_size
+            total_size += st.st_size
+            file_count += 1
+            members.setdefault(ext, []).append((file, os.path.abspath(file_path), st.st_size, st.st_mtime_ns))
+    
+    estimated_compressed = 0
+    for ext, stats in by_type.items():
+        entries = sorted(members[ext])  # 7-Zip orders a solid block by name within a type
+        type_budget = max(budget * stats["size"] // total_size if total_size else 0,
+                          budget // (4 * len(by_type)), 1)
+        type_budget = 1 << (type_budget.bit_length() - 1)  # small edits elsewhere keep this probe cached
+        key = (ext, compression_level, type_budget, tuple(entry[1:] for entry in entries))
+        cached = _compression_probe_cache.get(key)
+        if cached:
+            sampled, compressed = cached
+        else:
+            sampled, compressed = _probe_solid_compression(
+                [(path, size) for _, path, size, _ in entries], compression_level, type_budget
+            )
+            _compression_probe_cache.put(key, (sampled, compressed))
+            probed += stats["files"]
+        
+        stats["sampled"] = sampled
+        stats["compressed"] = compressed
+        ratio = compressed / sampled if sampled else 1.0
+        stats["ratio"] = ratio
+        stats["estimated_compressed"] = stats["size"] * ratio
+        estimated_compressed += stats["estimated_compressed"]
+    
+    return {
+        "total_size": total_size,
+        "estimated_compressed": estimated_compressed,
+        "file_count": file_count,
+        "files_probed": probed,
+        "by_type": by_type,
+    }
+
+def estimate_folder_compression_ratio(folder_path, compression_level=None, user_id=None):
+    """Estimate compression ratio for 7-Zip encryption at the given (or user's configured) level"""
     try:
-        total_size = 0
-        file_count = 0
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    total_size += os.path.getsize(file_path)
-                    file_count += 1
-                except:
-                    continue
-        
-        # Estimate compression (typical 7-Zip ratios)
+        details = estimate_folder_compression_details(folder_path, compression_level, user_id)
+        total_size = details["total_size"]
+        estimated_compressed = details["estimated_compressed"]
+        
         if total_size == 0:
             return 0, 0, "No files to compress"
         
-        # Better estimates based on file types and sizes
-        if total_size < 1024 * 1024:  # Less than 1MB
-            estimated_compressed = total_size * 0.8  # 20% compression for small files
-        else:
-            estimated_compressed = total_size * 0.6  # 40% compression for larger files
-            
         savings_mb = (total_size - estimated_compressed) / (1024 * 1024)
         compression_percent = ((total_size - estimated_compressed) / total_size) * 100
         
         return (total_size, estimated_compressed, 
-                f"Estimated savings: {savings_mb:.1f} MB ({compression_percent:.1f}%) for {file_count} files")
+                f"Estimated savings: {savings_mb:.1f} MB ({compression_percent:.1f}%) for {details['file_count']} files")
         
     except Exception as e:
         return 0, 0, f"Could not estimate compression: {str(e)}"
 
-def verify_folder_integrity(folder_id, user_id):
-    """Verify the integrity of a secure folder and its encryption with complete 7-Zip support"""
+def verify_folder_integrity(folder_id, user_id, password=None):
+    """Verify the integrity of a secure folder and its encryption with complete 7-Zip support
+    
+    Archives are encrypted with their headers, so checking one needs the folder
+    password; without it only a manifest verified earlier can vouch for it.
+    """
     db = DatabaseManager()
     folder_info = db.get_folder_info(folder_id, user_id)
     
@@ -895,16 +1590,26 @@ def verify_folder_integrity(folder_id, user_id):
     archive_exists = archive_path and os.path.exists(archive_path)
     
     if archive_exists and not folder_exists:
-        # Direct .7z archive mode - check archive integrity
-        try:
-            result = subprocess.run(['7z', 't', archive_path], 
-                                  capture_output=True, text=True, timeout=30)
-            if result.returncode != 0:
-                integrity_issues.append("7-Zip archive integrity check failed")
-            else:
-                print(f"✅ Archive integrity verified: {archive_path}")
-        except Exception as e:
-            integrity_issues.append(f"Could not verify archive integrity: {str(e)}")
+        # Direct .7z archive mode - trust the manifest while the archive is unchanged
+        manifest = db.get_archive_manifest(archive_path)
+        if manifest and manifest['verified']:
+            print(f"✅ Archive unchanged since last verify: {archive_path}")
+        elif not password:
+            return False, "Cannot verify the encrypted archive without its password"
+        else:
+            try:
+                ok, error = _test_archive(archive_path, password)
+                if not ok:
+                    integrity_issues.append(f"7-Zip archive integrity check failed: {error}" if error
+                                            else "7-Zip archive integrity check failed")
+                elif (manifest and manifest['members'] is not None
+                      and not _manifest_matches_archive(archive_path, manifest, password)):
+                    integrity_issues.append("Archive contents differ from the recorded manifest")
+                else:
+                    db.mark_archive_verified(archive_path)
+                    print(f"✅ Archive integrity verified: {archive_path}")
+            except Exception as e:
+                integrity_issues.append(f"Could not verify archive integrity: {str(e)}")
     elif folder_exists:
         # Regular folder mode - check folder structure
         expected_subdirs = ["Images", "PDFs"]
@@ -0,0 +1,23 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# The app is a flat set of top-level modules, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A DatabaseManager on a fresh steganography.db (DB_FILE is relative to the cwd)"""
+    monkeypatch.chdir(tmp_path)
+    from database import DatabaseManager
+    db = DatabaseManager()
+    db.conn.execute(
+        "INSERT INTO users (id, first_name, last_name, username, email, password) "
+        "VALUES (1, 'Test', 'User', 'tester', 'tester@example.com', 'x')"
+    )
+    db.conn.commit()
+    yield db
+    db.conn.close()
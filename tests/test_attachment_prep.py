@@ -0,0 +1,67 @@
+# tests/test_attachment_prep.py
+import numpy as np
+import pytest
+import soundfile as sf
+
+from attachment_prep import convert_wav_to_flac, join_file_parts, split_file
+from audio_format_handler import STREAM_BLOCK_FRAMES, AudioFormatHandler
+
+
+def test_split_and_join_round_trip_past_999_parts(tmp_path):
+    source = tmp_path / "stego.flac"
+    data = bytes(range(256)) * 5
+    source.write_bytes(data)  # 1280 one-byte parts -> names run .part001 ... .part1280
+    parts_dir = tmp_path / "parts"
+    parts_dir.mkdir()
+
+    parts = split_file(str(source), 1, str(parts_dir))
+    assert len(parts) == len(data)
+
+    joined = join_file_parts(list(reversed(parts)), str(tmp_path / "joined.flac"))
+    with open(joined, "rb") as f:
+        assert f.read() == data
+
+
+def test_join_rejects_files_that_are_not_parts(tmp_path):
+    stray = tmp_path / "notes.txt"
+    stray.write_bytes(b"x")
+    with pytest.raises(ValueError):
+        join_file_parts([str(stray)], str(tmp_path / "out"))
+
+
+@pytest.mark.parametrize("subtype", ["PCM_16", "PCM_24"])
+def test_wav_to_flac_streams_and_verifies_every_block(tmp_path, monkeypatch, subtype):
+    frames = int(STREAM_BLOCK_FRAMES * 2.5)
+    samples = np.random.default_rng(3).uniform(-0.5, 0.5, size=(frames, 2))
+    wav = tmp_path / "stego.wav"
+    sf.write(str(wav), samples, 44100, subtype=subtype)
+
+    handler = AudioFormatHandler()
+    # Whole-file decodes would defeat the point for multi-GB attachments
+    monkeypatch.setattr(handler, "to_pcm", lambda *args: pytest.fail("whole file loaded"))
+    flac = tmp_path / "stego.flac"
+    success, message = convert_wav_to_flac(str(wav), str(flac), handler)
+    assert success, message
+
+    info = sf.info(str(flac))
+    assert (info.format, info.subtype, info.frames) == ("FLAC", subtype, frames)
+    assert np.array_equal(sf.read(str(wav), dtype='int32')[0], sf.read(str(flac), dtype='int32')[0])
+
+
+def test_wav_to_flac_reports_a_changed_block(tmp_path, monkeypatch):
+    wav = tmp_path / "stego.wav"
+    sf.write(str(wav), np.zeros((STREAM_BLOCK_FRAMES * 2, 2), dtype=np.int16), 44100, subtype="PCM_16")
+    handler = AudioFormatHandler()
+    original = handler.iter_pcm_blocks
+
+    def flip_lsb_in_flac(file_path, format_info, *args):
+        for index, block in enumerate(original(file_path, format_info, *args)):
+            if file_path.endswith(".flac") and index == 1:
+                block[7] ^= 1
+            yield block
+
+    monkeypatch.setattr(handler, "iter_pcm_blocks", flip_lsb_in_flac)
+    flac = tmp_path / "stego.flac"
+    success, message = convert_wav_to_flac(str(wav), str(flac), handler)
+    assert not success and "Hidden data changed" in message
+    assert not flac.exists()
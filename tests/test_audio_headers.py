@@ -0,0 +1,112 @@
+# tests/test_audio_headers.py
+import wave
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import audio_format_handler
+from audio_format_handler import PCMBlockWriter, write_wav_file
+from audio_headers import (
+    AudioHeaderError, WAVE_FORMAT_EXTENSIBLE, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM,
+    build_wav_header, read_audio_header, wav_padding
+)
+
+FRAMES = 1000
+
+
+@pytest.mark.parametrize("container, sf_format, subtype, bit_depth, sample_format", [
+    ('wav', 'WAV', 'PCM_16', 16, 'int'),
+    ('wav', 'WAV', 'PCM_24', 24, 'int'),
+    ('wav', 'WAV', 'PCM_32', 32, 'int'),
+    ('wav', 'WAV', 'FLOAT', 32, 'float'),
+    ('rf64', 'RF64', 'PCM_16', 16, 'int'),
+    ('w64', 'W64', 'PCM_24', 24, 'int'),
+    ('flac', 'FLAC', 'PCM_16', 16, 'int'),
+    ('flac', 'FLAC', 'PCM_24', 24, 'int'),
+])
+def test_header_matches_soundfile(tmp_path, container, sf_format, subtype, bit_depth, sample_format):
+    path = str(tmp_path / f"audio.{container}")
+    sf.write(path, np.zeros((FRAMES, 2), dtype=np.float32), 48000, format=sf_format, subtype=subtype)
+
+    header = read_audio_header(path)
+    assert header['container'] == container
+    assert (header['sample_rate'], header['channels'], header['frames']) == (48000, 2, FRAMES)
+    assert (header['bit_depth'], header['sample_format']) == (bit_depth, sample_format)
+    assert header['duration'] == pytest.approx(FRAMES / 48000)
+
+
+def test_extensible_wav_reports_its_subformat(tmp_path):
+    path = str(tmp_path / "multichannel.wav")
+    sf.write(path, np.zeros((FRAMES, 4), dtype=np.int16), 44100, format='WAVEX', subtype='PCM_16')
+    header = read_audio_header(path)
+    assert header['format_tag'] == WAVE_FORMAT_EXTENSIBLE
+    assert (header['sample_format'], header['channels']) == ('int', 4)
+
+
+def test_flac_behind_id3_tag(tmp_path):
+    flac_path = tmp_path / "tagged.flac"
+    sf.write(str(flac_path), np.zeros((FRAMES, 1), dtype=np.int16), 44100, format='FLAC')
+    tag_body = b"\0" * 200
+    synchsafe = bytes((len(tag_body) >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    flac_path.write_bytes(b"ID3\x04\x00\x00" + synchsafe + tag_body + flac_path.read_bytes())
+    assert read_audio_header(str(flac_path))['frames'] == FRAMES
+
+
+@pytest.mark.parametrize("payload", [b"", b"RIFF\x00\x00", b"not audio at all", b"fLaC\x00\x00"])
+def test_garbage_raises_header_error(tmp_path, payload):
+    path = tmp_path / "bad.wav"
+    path.write_bytes(payload)
+    with pytest.raises(AudioHeaderError):
+        read_audio_header(str(path))
+
+
+@pytest.mark.parametrize("channels, bit_depth, frames, sample_format", [
+    (2, 16, 1000, 'int'),
+    (1, 24, 101, 'int'),  # odd data chunk -> pad byte
+    (2, 32, 50, 'int'),
+    (2, 32, 64, 'float'),
+])
+def test_build_wav_header_round_trip(tmp_path, channels, bit_depth, frames, sample_format):
+    path = tmp_path / "built.wav"
+    data = bytes(range(256)) * (frames * channels * bit_depth // 8 // 256 + 1)
+    data = data[:frames * channels * bit_depth // 8]
+    path.write_bytes(build_wav_header(channels, 44100, bit_depth, frames, sample_format)
+                     + data + wav_padding(channels, bit_depth, frames))
+
+    header = read_audio_header(str(path))
+    assert (header['channels'], header['bit_depth'], header['frames']) == (channels, bit_depth, frames)
+    assert header['format_tag'] == (WAVE_FORMAT_IEEE_FLOAT if sample_format == 'float' else WAVE_FORMAT_PCM)
+    assert path.stat().st_size % 2 == 0
+    if sample_format == 'int':
+        with wave.open(str(path)) as wav_file:
+            assert wav_file.readframes(frames) == data
+
+
+def test_build_wav_header_refuses_riff_overflow():
+    with pytest.raises(AudioHeaderError):
+        build_wav_header(2, 44100, 16, 2 ** 30, 'int')
+
+
+@pytest.mark.parametrize("channels, bit_depth, sample_format, dtype", [
+    (2, 16, 'int', np.int16),
+    (1, 24, 'int', np.int32),  # odd data chunk -> pad byte
+    (2, 32, 'float', np.float32),
+])
+def test_block_writer_matches_write_wav_file(tmp_path, monkeypatch, channels, bit_depth, sample_format, dtype):
+    frames = 2 * 4096 + 501
+    pcm = np.random.default_rng(3).integers(-2 ** 15, 2 ** 15, size=frames * channels).astype(dtype)
+    format_info = {'format': 'wav', 'channels': channels, 'sample_rate': 44100, 'bit_depth': bit_depth,
+                   'sample_format': sample_format, 'frames': frames}
+    whole, streamed = tmp_path / "whole.wav", tmp_path / "streamed.wav"
+    write_wav_file(str(whole), pcm, format_info)
+
+    # Plain WAV never goes through libsndfile, however big the output
+    monkeypatch.setattr(audio_format_handler.sf, "SoundFile", None)
+    step = 4096 * channels
+    with PCMBlockWriter(str(streamed), format_info) as writer:
+        for start in range(0, len(pcm), step):
+            writer.write(pcm[start:start + step])
+    assert streamed.read_bytes() == whole.read_bytes()
+    assert read_audio_header(str(streamed))['frames'] == frames
+
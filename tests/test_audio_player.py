@@ -0,0 +1,34 @@
+# tests/test_audio_player.py
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+from audio_player import AudioPlayer
+
+
+def write_noise(path, seconds=2, samplerate=44100):
+    samples = np.random.default_rng(3).integers(-3000, 3000, size=(samplerate * seconds, 2), dtype=np.int16)
+    sf.write(str(path), samples, samplerate)
+    return str(path)
+
+
+def test_second_player_does_not_stop_the_first(tmp_path):
+    first, second = AudioPlayer(), AudioPlayer()
+    try:
+        assert first.load_audio(write_noise(tmp_path / "a.wav"))[0]
+        assert first.play()
+        assert second.load_audio(write_noise(tmp_path / "b.wav"))[0]
+        assert second.play()
+
+        # Each channel is still playing its own player's blocks
+        assert id(first._channel.get_sound()) in first._block_starts
+        assert id(second._channel.get_sound()) in second._block_starts
+    finally:
+        first.close()
+        second.close()
+        pygame.mixer.quit()
@@ -0,0 +1,62 @@
+# tests/test_carrier_index.py
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+from cryptography.fernet import Fernet
+
+from carrier_index import CarrierIndex, required_samples
+from steganography_utils import _recipient_prefix, estimate_encoded_size
+
+
+def _write_carrier(path, frames):
+    sf.write(str(path), np.zeros((frames, 2), dtype=np.int16), 44100, subtype='PCM_16')
+    return os.path.abspath(str(path))
+
+
+def test_pick_is_scoped_to_directories(db, tmp_path):
+    small = _write_carrier((tmp_path / "a").mkdir() or tmp_path / "a" / "small.wav", 2000)
+    large = _write_carrier((tmp_path / "b").mkdir() or tmp_path / "b" / "large.wav", 8000)
+    index = CarrierIndex(db=db)
+    index.scan([str(tmp_path / "a"), str(tmp_path / "b")])
+
+    assert index.pick_carrier(100)['file_path'] == small
+    assert index.pick_carrier(100, directories=[str(tmp_path / "b")])['file_path'] == large
+    assert index.pick_carrier(4000, directories=[str(tmp_path / "a")]) is None
+    assert [row['file_path'] for row in index.carriers([str(tmp_path), str(tmp_path / "a")])] == [small, large]
+
+
+def test_loaded_scope_is_reused_until_the_index_changes(db, tmp_path, monkeypatch):
+    _write_carrier(tmp_path / "one.wav", 2000)
+    index = CarrierIndex(db=db)
+    index.scan(str(tmp_path))
+
+    calls = []
+    get_carriers = db.get_carriers
+    monkeypatch.setattr(db, "get_carriers", lambda directory=None: calls.append(directory) or get_carriers(directory))
+    for _ in range(3):
+        assert index.pick_carrier(100, directories=[str(tmp_path)]) is not None
+    assert len(calls) == 1
+
+    index.scan(str(tmp_path))  # nothing changed, so the loaded rows stay valid
+    index.pick_carrier(100, directories=[str(tmp_path)])
+    assert len(calls) == 2  # the scan's own lookup only
+
+    bigger = _write_carrier(tmp_path / "two.wav", 8000)
+    index.scan(str(tmp_path))
+    assert index.pick_carrier(1500, directories=[str(tmp_path)])['file_path'] == bigger
+
+
+@pytest.mark.parametrize("payload_bytes, lsb_depth, expected", [
+    (0, 1, 32), (1, 1, 40), (100, 1, 832), (100, 2, 416), (100, 3, 278),
+])
+def test_required_samples(payload_bytes, lsb_depth, expected):
+    assert required_samples(payload_bytes, lsb_depth) == expected
+
+
+@pytest.mark.parametrize("raw_size", [0, 1, 15, 16, 255, 10_000])
+@pytest.mark.parametrize("receiver_email", [None, "bob@example.com"])
+def test_estimate_encoded_size_is_exact(raw_size, receiver_email):
+    token = Fernet(Fernet.generate_key()).encrypt(os.urandom(raw_size))
+    assert estimate_encoded_size(raw_size, receiver_email) == len(_recipient_prefix(receiver_email) + token)
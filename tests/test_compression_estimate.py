@@ -0,0 +1,77 @@
+# tests/test_compression_estimate.py
+import lzma
+import os
+import random
+
+import py7zr
+import pytest
+
+import steganography_utils
+from steganography_utils import (_lzma_dict_size, estimate_folder_compression_details,
+                                 estimate_folder_compression_ratio)
+
+
+@pytest.fixture
+def mixed_folder(tmp_path):
+    """Word-salad text notes, random blobs and a log that repeats one of the notes"""
+    rng = random.Random(7)
+    words = ["".join(rng.choice("abcdefghijklmnop") for _ in range(rng.randint(3, 9))) for _ in range(1500)]
+    folder = tmp_path / "mixed"
+    (folder / "blobs").mkdir(parents=True)
+    for i in range(12):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(2_000, 30_000)))
+        (folder / f"note{i}.txt").write_text(text)
+    for i in range(4):
+        (folder / "blobs" / f"blob{i}.bin").write_bytes(rng.randbytes(rng.randint(100_000, 600_000)))
+    (folder / "blobs" / "copy.log").write_bytes((folder / "note3.txt").read_bytes() * 3)
+    return folder
+
+
+def _real_archive_size(folder, archive, level):
+    filters = [{"id": lzma.FILTER_LZMA2, "preset": level, "dict_size": _lzma_dict_size(level)}]
+    with py7zr.SevenZipFile(archive, "w", filters=filters) as a:
+        a.writeall(str(folder), folder.name)
+    return os.path.getsize(archive)
+
+
+@pytest.mark.parametrize("level", [1, 5])
+def test_estimate_tracks_real_solid_archive(mixed_folder, tmp_path, monkeypatch, level):
+    monkeypatch.setattr(steganography_utils, "_PROBE_SAMPLE_BUDGET", 256 * 1024)  # well below the folder size
+    real = _real_archive_size(mixed_folder, tmp_path / "real.7z", level)
+
+    details = estimate_folder_compression_details(str(mixed_folder), compression_level=level)
+    assert details["file_count"] == 17
+    assert details["total_size"] > 4 * 256 * 1024
+    assert details["estimated_compressed"] == pytest.approx(real, rel=0.1)
+    # Random blobs barely compress, text does
+    assert details["by_type"][".bin"]["ratio"] > 0.95
+    assert details["by_type"][".txt"]["ratio"] < 0.8
+
+
+def test_solid_probe_credits_duplicate_files(tmp_path):
+    blob = os.urandom(200_000)
+    (tmp_path / "a.bin").write_bytes(blob)
+    (tmp_path / "b.bin").write_bytes(blob)
+
+    total, estimated, _ = estimate_folder_compression_ratio(str(tmp_path), compression_level=9)
+    assert total == 400_000
+    assert estimated == pytest.approx(200_000, rel=0.05)
+
+
+def test_store_level_and_cached_repeat(mixed_folder):
+    stored = estimate_folder_compression_details(str(mixed_folder), compression_level=0)
+    assert stored["estimated_compressed"] == stored["total_size"]
+
+    first = estimate_folder_compression_details(str(mixed_folder), compression_level=3)
+    again = estimate_folder_compression_details(str(mixed_folder), compression_level=3)
+    assert first["files_probed"] == 17 and again["files_probed"] == 0
+    assert again["estimated_compressed"] == first["estimated_compressed"]
+
+    log = mixed_folder / "blobs" / "copy.log"
+    os.utime(log, ns=(log.stat().st_atime_ns, log.stat().st_mtime_ns + 1_000_000_000))
+    changed = estimate_folder_compression_details(str(mixed_folder), compression_level=3)
+    assert changed["files_probed"] == 1  # only the .log type is probed again
+
+
+def test_empty_folder(tmp_path):
+    assert estimate_folder_compression_ratio(str(tmp_path), compression_level=9) == (0, 0, "No files to compress")
@@ -0,0 +1,52 @@
+# tests/test_email_outbox.py
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+import email_outbox
+from email_outbox import EmailOutboxWorker
+from email_utils import EmailSendError
+from local_smtp_sink import LocalSMTPSink
+
+
+def test_retry_delay_doubles_and_caps():
+    worker = EmailOutboxWorker(base_delay=5, max_delay=60)
+    for attempts, expected in [(1, 5), (2, 10), (3, 20), (4, 40), (5, 60), (9, 60)]:
+        assert expected * 0.8 <= worker.retry_delay(attempts) <= expected * 1.2
+
+
+def test_failed_part_is_retried_without_resending_earlier_parts(db, tmp_path, monkeypatch):
+    audio_path = tmp_path / "stego.flac"
+    audio_path.write_bytes(bytes(range(256)) * 10)  # 2560 bytes -> 3 parts of 1000
+
+    real_deliver = email_outbox.deliver_stego_email
+    failures = {"left": 1}
+
+    def flaky_deliver(*args, part=None, **kwargs):
+        if part and part[0] == 2 and failures["left"]:
+            failures["left"] -= 1
+            raise EmailSendError("connection dropped")
+        return real_deliver(*args, part=part, **kwargs)
+
+    monkeypatch.setattr(email_outbox, "deliver_stego_email", flaky_deliver)
+
+    with LocalSMTPSink() as sink:
+        db.save_credentials(1, "sender@example.com", "user", "secret")
+        db.save_smtp_settings(1, sink.host, sink.port, "none", 10)
+        outbox_id = db.enqueue_email(1, "bob@example.com", None, str(audio_path), b"key", "message", "flac")
+        worker = EmailOutboxWorker(max_attachment_bytes=1000)
+
+        worker._deliver(db, db.get_due_outbox_emails()[0])
+        status = db.get_outbox_status(outbox_id)
+        assert status["status"] == "pending"
+        assert (status["parts_sent"], status["parts_total"]) == (1, 3)
+
+        db.conn.execute("UPDATE email_outbox SET next_attempt_at = created_at")
+        worker._deliver(db, db.get_due_outbox_emails()[0])
+        assert db.get_outbox_status(outbox_id)["status"] == "sent"
+        assert sink.wait_for_messages(3)
+
+    subjects = [str(make_header(decode_header(message_from_bytes(m["data"])["Subject"])))
+                for m in sink.messages]
+    assert len(subjects) == 3
+    for index, subject in enumerate(subjects, 1):
+        assert subject.endswith(f"part {index} of 3")
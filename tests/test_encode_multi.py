@@ -0,0 +1,55 @@
+# tests/test_encode_multi.py
+import numpy as np
+import pytest
+import soundfile as sf
+from cryptography.fernet import Fernet
+
+import steganography_utils
+from audio_format_handler import AudioFormatHandler
+from steganography_utils import (
+    EMBEDDING_LAYOUTS, _extract_lsb, _extract_lsb_stream, _recipient_prefix, encode_data_multi
+)
+
+RECIPIENTS = ["alice@example.com", "bob@example.com"]
+
+
+def make_carrier(path, audio_format, frames=44100):
+    samples = np.random.default_rng(7).integers(-8000, 8000, size=(frames, 2), dtype=np.int16)
+    sf.write(str(path), samples, 44100, format=audio_format.upper(), subtype='PCM_16')
+    return str(path)
+
+
+def extract(path, key):
+    handler = AudioFormatHandler()
+    format_info = handler.detect_format(path)
+    if handler.supports_streaming(format_info):
+        return _extract_lsb_stream(handler, path, format_info, key)
+    return _extract_lsb(handler.to_pcm(path, format_info), format_info['channels'], key)
+
+
+@pytest.mark.parametrize("audio_format", ["wav", "flac"])
+@pytest.mark.parametrize("layout", list(EMBEDDING_LAYOUTS))
+def test_each_recipient_output_decodes(db, tmp_path, audio_format, layout):
+    carrier = make_carrier(tmp_path / f"carrier.{audio_format}", audio_format)
+    key, results = encode_data_multi(carrier, "hello team", str(tmp_path / "out"), "message", 1,
+                                     RECIPIENTS, layout=layout)
+
+    for receiver_email in RECIPIENTS:
+        result = results[receiver_email]
+        assert result['success'], result['error']
+        payload = extract(result['output_path'], key)
+        prefix = _recipient_prefix(receiver_email)
+        assert payload.startswith(prefix)
+        assert Fernet(key).decrypt(payload[len(prefix):]) == b"hello team"
+
+    times = db.conn.execute("SELECT processing_time_seconds FROM history").fetchall()
+    assert len(times) == len(RECIPIENTS)
+    assert all(row[0] is not None for row in times)
+
+
+def test_payload_over_header_limit_is_rejected(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(steganography_utils, "_MAX_DATA_LENGTH", 64)
+    carrier = make_carrier(tmp_path / "carrier.wav", "wav")
+    with pytest.raises(ValueError, match="too large"):
+        encode_data_multi(carrier, "x" * 100, str(tmp_path / "out"), "message", 1, RECIPIENTS)
+    assert not (tmp_path / "out").exists()
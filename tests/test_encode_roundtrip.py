@@ -0,0 +1,93 @@
+# tests/test_encode_roundtrip.py
+import numpy as np
+import pytest
+import soundfile as sf
+from cryptography.fernet import Fernet
+
+import audio_format_handler
+from audio_format_handler import AudioFormatHandler
+from steganography_utils import (
+    EMBEDDING_LAYOUTS, _extract_lsb, _extract_lsb_stream, _recipient_prefix, decode_data, encode_data
+)
+
+# Spans more than one STREAM_BLOCK_FRAMES block, so block boundaries are crossed
+FRAMES = 100_000
+RECEIVER = "tester@example.com"
+
+CARRIERS = [
+    ('wav', 'WAV', 'PCM_16'),
+    ('wav', 'WAV', 'PCM_24'),
+    ('wav', 'WAV', 'PCM_32'),
+    ('wav', 'WAV', 'FLOAT'),
+    ('flac', 'FLAC', 'PCM_16'),
+    ('flac', 'FLAC', 'PCM_24'),
+    ('rf64', 'RF64', 'PCM_16'),
+    ('w64', 'W64', 'PCM_24'),
+]
+
+
+def make_carrier(path, sf_format, subtype):
+    rng = np.random.default_rng(5)
+    samples = rng.uniform(-0.4, 0.4, size=(FRAMES, 2)).astype(np.float32)
+    sf.write(str(path), samples, 44100, format=sf_format, subtype=subtype)
+    return str(path)
+
+
+def extract(path, key):
+    handler = AudioFormatHandler()
+    format_info = handler.detect_format(path)
+    if handler.supports_streaming(format_info):
+        return _extract_lsb_stream(handler, path, format_info, key)
+    return _extract_lsb(handler.to_pcm(path, format_info), format_info['channels'], key)
+
+
+def assert_round_trip(carrier, output, key, payload):
+    data = extract(output, key)
+    prefix = _recipient_prefix(RECEIVER)
+    assert data.startswith(prefix)
+    assert Fernet(key).decrypt(data[len(prefix):]) == payload
+
+    # Same container, depth and length; only least significant bits differ
+    before, after = sf.info(carrier), sf.info(output)
+    assert (after.format, after.subtype, after.frames) == (before.format, before.subtype, before.frames)
+    dtype = 'float32' if before.subtype == 'FLOAT' else 'int32'
+    original, stego = sf.read(carrier, dtype=dtype)[0], sf.read(output, dtype=dtype)[0]
+    if dtype == 'int32':
+        shift = 32 - {'PCM_16': 16, 'PCM_24': 24, 'PCM_32': 32}[before.subtype]
+        assert np.array_equal((original >> shift) >> 1, (stego >> shift) >> 1)
+    else:
+        assert np.array_equal(original.view(np.uint32) >> 1, stego.view(np.uint32) >> 1)
+
+
+@pytest.mark.parametrize("extension, sf_format, subtype", CARRIERS)
+@pytest.mark.parametrize("layout", list(EMBEDDING_LAYOUTS))
+def test_encode_round_trip(db, tmp_path, extension, sf_format, subtype, layout):
+    carrier = make_carrier(tmp_path / f"carrier.{extension}", sf_format, subtype)
+    output = str(tmp_path / f"stego.{extension}")
+    key = encode_data(carrier, "meet at noon", output, "message", 1, receiver_email=RECEIVER, layout=layout)
+    assert_round_trip(carrier, output, key, b"meet at noon")
+
+
+@pytest.mark.parametrize("layout", list(EMBEDDING_LAYOUTS))
+def test_streamed_wav_round_trip(db, tmp_path, monkeypatch, layout):
+    monkeypatch.setattr(audio_format_handler, "STREAM_WAV_MIN_MB", 0)
+    carrier = make_carrier(tmp_path / "carrier.wav", 'WAV', 'PCM_16')
+    output = str(tmp_path / "stego.wav")
+    payload = bytes(range(256)) * 20
+    key = encode_data(carrier, payload, output, "pdf", 1, receiver_email=RECEIVER, layout=layout)
+    assert_round_trip(carrier, output, key, payload)
+
+
+def test_transcoded_carrier_history_records_the_source(db, tmp_path):
+    carrier = make_carrier(tmp_path / "carrier.aiff", 'AIFF', 'PCM_16')
+    output = str(tmp_path / "stego.flac")
+    key = encode_data(carrier, "meet at noon", output, "message", 1, receiver_email=RECEIVER)
+    assert Fernet(key).decrypt(extract(output, key)[len(_recipient_prefix(RECEIVER)):]) == b"meet at noon"
+
+    # The stego file sent back as AIFF decodes the same; history names the AIFF, not the cached copy
+    stego_aiff = str(tmp_path / "stego.aiff")
+    sf.write(stego_aiff, sf.read(output, dtype='int16')[0], 44100, format='AIFF', subtype='PCM_16')
+    assert decode_data(stego_aiff, key, "message", 1) == "meet at noon"
+
+    rows = db.conn.execute("SELECT operation, audio_file_path FROM history ORDER BY id").fetchall()
+    assert rows == [("encode", carrier), ("decode", stego_aiff)]
@@ -0,0 +1,62 @@
+# tests/test_folder_integrity.py
+import os
+import shutil
+
+import pytest
+
+import steganography_utils
+from steganography_utils import create_encrypted_7z_directly, verify_folder_integrity
+
+PASSWORD = "Folder#Pass1"
+
+
+@pytest.fixture
+def archived_folder(db, tmp_path):
+    """A secure folder that now only exists as its encrypted .7z archive"""
+    folder = tmp_path / "Vault"
+    (folder / "Images").mkdir(parents=True)
+    (folder / "PDFs").mkdir()
+    (folder / "Images" / "note.txt").write_text("hello " * 200)
+    (folder / "PDFs" / "doc.bin").write_bytes(os.urandom(50_000))
+    archive = str(tmp_path / "Vault.7z")
+    success, message = create_encrypted_7z_directly(str(folder), archive, PASSWORD, "Vault")
+    assert success, message
+    shutil.rmtree(folder)
+
+    cur = db.conn.execute(
+        "INSERT INTO secure_folders (user_id, folder_name, folder_path, password_hash, is_encrypted, "
+        "encryption_method, archive_path) VALUES (1, 'Vault', ?, 'x', 1, '7zip_aes256', ?)",
+        (str(folder), archive),
+    )
+    db.conn.commit()
+    return cur.lastrowid, archive
+
+
+def test_verify_then_fast_path(db, archived_folder, monkeypatch):
+    folder_id, archive = archived_folder
+    assert not db.get_archive_manifest(archive)['verified']
+
+    ok, message = verify_folder_integrity(folder_id, 1)
+    assert not ok and "without its password" in message
+
+    ok, message = verify_folder_integrity(folder_id, 1, PASSWORD)
+    assert ok, message
+    assert db.get_archive_manifest(archive)['verified']
+
+    # Unchanged archive: no password and no decompression needed any more
+    monkeypatch.setattr(steganography_utils, "_test_archive", lambda *args: pytest.fail("archive re-tested"))
+    ok, message = verify_folder_integrity(folder_id, 1)
+    assert ok, message
+
+
+def test_wrong_password_and_tampering_are_reported(db, archived_folder):
+    folder_id, archive = archived_folder
+    ok, message = verify_folder_integrity(folder_id, 1, "Wrong#Pass1")
+    assert not ok and "integrity check failed" in message
+
+    manifest = db.get_archive_manifest(archive)
+    members = [list(m) for m in manifest['members']]
+    members[0][2] ^= 1
+    db.save_archive_manifest(archive, members)
+    ok, message = verify_folder_integrity(folder_id, 1, PASSWORD)
+    assert not ok and "differ from the recorded manifest" in message
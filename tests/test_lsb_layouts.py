@@ -0,0 +1,83 @@
+# tests/test_lsb_layouts.py
+import os
+
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet
+
+from steganography_utils import (
+    EMBEDDING_LAYOUTS, _HEADER_BITS, _MAX_DATA_LENGTH, _PayloadLayout, _embed_lsb, _extract_lsb, _lsb_view,
+    _pack_header, _unpack_header
+)
+
+KEY = Fernet.generate_key()
+
+
+def carrier(dtype, samples=40_000):
+    rng = np.random.default_rng(11)
+    if dtype == np.float32:
+        return rng.uniform(-0.5, 0.5, samples).astype(np.float32)
+    if dtype == np.int32:  # 24-bit values held in int32
+        return rng.integers(-(1 << 23), 1 << 23, samples).astype(np.int32)
+    return rng.integers(-8000, 8000, samples).astype(np.int16)
+
+
+@pytest.mark.parametrize("layout, layout_id", sorted(EMBEDDING_LAYOUTS.items()))
+@pytest.mark.parametrize("data_length", [1, 4096, _MAX_DATA_LENGTH])
+def test_header_round_trip(layout, layout_id, data_length):
+    header_bits = np.unpackbits(_pack_header(layout_id, data_length))
+    assert len(header_bits) == _HEADER_BITS
+    assert _unpack_header(header_bits) == (layout_id, data_length)
+
+
+def test_header_rejects_oversized_and_unknown_values():
+    with pytest.raises(ValueError):
+        _pack_header(0, _MAX_DATA_LENGTH + 1)
+    with pytest.raises(ValueError):
+        _unpack_header(np.unpackbits(np.array([9 << 24 | 10], dtype='>u4').view(np.uint8)))
+    with pytest.raises(ValueError):
+        _unpack_header(np.zeros(_HEADER_BITS, dtype=np.uint8))
+
+
+@pytest.mark.parametrize("layout", list(EMBEDDING_LAYOUTS))
+@pytest.mark.parametrize("dtype", [np.int16, np.int32, np.float32])
+@pytest.mark.parametrize("channels", [1, 2])
+def test_embed_extract_round_trip(layout, dtype, channels):
+    pcm = carrier(dtype)
+    payload = os.urandom(1500)
+    stego = _embed_lsb(pcm, payload, layout, channels, KEY)
+
+    assert stego.dtype == pcm.dtype
+    assert _extract_lsb(stego, channels, KEY) == payload
+    # Only least significant bits may change, and the input array is untouched
+    assert np.array_equal(_lsb_view(stego) >> 1, _lsb_view(pcm) >> 1)
+    assert not np.shares_memory(stego, pcm)
+
+
+def test_scattered_layout_needs_the_key():
+    stego = _embed_lsb(carrier(np.int16), b"secret payload", "scattered", 2, KEY)
+    with pytest.raises(ValueError, match="key"):
+        _extract_lsb(stego, 2)
+    assert _extract_lsb(stego, 2, Fernet.generate_key()) != b"secret payload"
+
+
+@pytest.mark.parametrize("stride", [1, 3, 256, 257, 70_000, (1 << 24) + 5])
+def test_scatter_offsets_stay_inside_their_strata(stride):
+    data_bits = 5000 if stride < 1 << 20 else 40
+    plan = _PayloadLayout(EMBEDDING_LAYOUTS['scattered'], data_bits, _HEADER_BITS + data_bits * stride, 2, KEY)
+    assert plan.stride == stride
+    assert int(plan.offsets.max()) < stride
+    if 1 < stride <= 256:
+        assert len(np.unique(plan.offsets)) == stride
+
+    # Any sample range maps to one contiguous, ordered run of data bits
+    positions = np.concatenate([chunk for _, chunk in plan.scatter(0, plan.end)])
+    assert len(positions) == data_bits and np.all(np.diff(positions) > 0)
+    middle = int(positions[data_bits // 2])
+    first_bit, chunk = next(plan.scatter(middle, plan.end))
+    assert first_bit == data_bits // 2 and chunk[0] == middle
+
+
+def test_embed_rejects_carrier_that_is_too_small():
+    with pytest.raises(ValueError, match="too small"):
+        _embed_lsb(carrier(np.int16, samples=100), b"x" * 100)
@@ -0,0 +1,44 @@
+# tests/test_smtp_pool.py
+import smtplib
+
+import pytest
+
+from email_utils import SMTPConnectionPool
+from local_smtp_sink import LocalSMTPSink
+
+MESSAGE = "Subject: pool test\r\n\r\nbody\r\n"
+
+
+@pytest.fixture
+def sink():
+    with LocalSMTPSink(require_auth=True, credentials={"alice": "right"}) as sink:
+        yield sink
+
+
+@pytest.fixture
+def pool():
+    pool = SMTPConnectionPool()
+    yield pool
+    pool.close_all()
+
+
+def send(pool, sink, password):
+    return pool.sendmail(sink.host, sink.port, "alice", password, "alice@example.com",
+                         ["bob@example.com"], MESSAGE, security="none")
+
+
+def test_pool_reuses_logged_in_connection(sink, pool):
+    send(pool, sink, "right")
+    send(pool, sink, "right")
+    assert sink.wait_for_messages(2)
+    assert sink.connection_count == 1
+
+
+def test_wrong_password_rejected_despite_pooled_connection(sink, pool):
+    send(pool, sink, "right")
+    assert sink.wait_for_messages(1)
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        send(pool, sink, "wrong")
+    assert sink.message_count == 1
+    assert sink.connection_count == 2  # a fresh login was attempted, not the pooled session
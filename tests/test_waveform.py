@@ -0,0 +1,127 @@
+# tests/test_waveform.py
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+from cryptography.fernet import Fernet
+
+from steganography_utils import EMBEDDING_LAYOUTS, _embed_lsb
+from waveform import BASE_BLOCK, LEVEL_FACTOR, PeakPyramid, _payload_frames
+
+FRAMES = BASE_BLOCK * LEVEL_FACTOR ** 3 + 1000  # several levels, last bucket partial
+KEY = Fernet.generate_key()
+
+
+def write_carrier(path, frames=FRAMES, channels=2, seed=1):
+    samples = np.random.default_rng(seed).integers(-20000, 20000, (frames, channels)).astype(np.int16)
+    sf.write(str(path), samples, 8000, subtype='PCM_16')
+    return samples
+
+
+def test_levels_hold_bucket_min_and_max(tmp_path):
+    samples = write_carrier(tmp_path / "a.wav")
+    pyramid = PeakPyramid.build(str(tmp_path / "a.wav"))
+    frame_min, frame_max = samples.min(axis=1), samples.max(axis=1)
+
+    assert (pyramid.frames, pyramid.channels, pyramid.samplerate) == (FRAMES, 2, 8000)
+    for level in range(len(pyramid.mins)):
+        size = BASE_BLOCK * LEVEL_FACTOR ** level
+        full = FRAMES // size  # whole buckets are exact at every level
+        assert np.array_equal(pyramid.mins[level][:full], frame_min[:full * size].reshape(full, size).min(axis=1))
+        assert np.array_equal(pyramid.maxs[level][:full], frame_max[:full * size].reshape(full, size).max(axis=1))
+    assert len(pyramid.mins[-1]) == 1
+    assert (pyramid.mins[-1][0], pyramid.maxs[-1][0]) == (samples.min(), samples.max())
+
+
+def test_columns_at_several_zooms(tmp_path):
+    samples = write_carrier(tmp_path / "a.wav")
+    pyramid = PeakPyramid.build(str(tmp_path / "a.wav"))
+    buckets = len(pyramid.mins[0])
+
+    # One column per level-0 bucket, then one per level-2 bucket over whole buckets
+    mins, maxs, diff = pyramid.columns(0, FRAMES, buckets)
+    assert np.array_equal(mins, pyramid.mins[0]) and np.array_equal(maxs, pyramid.maxs[0]) and diff is None
+    whole = BASE_BLOCK * LEVEL_FACTOR ** 3
+    columns = whole // (BASE_BLOCK * LEVEL_FACTOR ** 2)
+    mins, maxs, _ = pyramid.columns(0, whole, columns)
+    assert np.array_equal(mins, pyramid.mins[2][:columns]) and np.array_equal(maxs, pyramid.maxs[2][:columns])
+    assert not np.array_equal(pyramid.mins[2][:columns], np.repeat(pyramid.mins[3][:1], columns))
+
+    # A zoomed window never reports peaks from outside it, and still fills every column
+    for start, end, width in [(5000, 90000, 300), (BASE_BLOCK * 10, BASE_BLOCK * 12, 400), (0, FRAMES, 7)]:
+        mins, maxs, _ = pyramid.columns(start, end, width)
+        assert len(mins) == len(maxs) == width
+        window = samples[start // BASE_BLOCK * BASE_BLOCK:-(-end // BASE_BLOCK) * BASE_BLOCK]
+        # Columns cover the window's buckets exactly at level 0, and may round out to coarser buckets above it
+        assert mins.min() <= window.min() and maxs.max() >= window.max()
+        if (end - start) / width < BASE_BLOCK * LEVEL_FACTOR:
+            assert (mins.min(), maxs.max()) == (window.min(), window.max())
+
+
+def test_peak_cache_is_reused_until_the_source_changes(tmp_path, monkeypatch):
+    audio = tmp_path / "a.wav"
+    write_carrier(audio, seed=1)
+    first = PeakPyramid.load(str(audio))
+    cache = str(audio) + ".peaks.npz"
+    assert os.path.exists(cache)
+
+    build = PeakPyramid.build
+    monkeypatch.setattr(PeakPyramid, "build", classmethod(lambda cls, *args: pytest.fail("rebuilt")))
+    cached = PeakPyramid.load(str(audio))
+    assert np.array_equal(cached.mins[0], first.mins[0]) and cached.frames == first.frames
+
+    samples = write_carrier(audio, frames=FRAMES // 2, seed=2)
+    os.utime(audio, ns=(os.stat(audio).st_atime_ns, os.stat(cache).st_mtime_ns + 10 ** 9))
+    monkeypatch.setattr(PeakPyramid, "build", build)
+    rebuilt = PeakPyramid.load(str(audio))
+    assert rebuilt.frames == FRAMES // 2
+    assert rebuilt.mins[-1][0] == samples.min()
+
+    # Diffing against a carrier is a different pyramid, so it is not served from the cache
+    write_carrier(tmp_path / "carrier.wav", frames=FRAMES // 2, seed=2)
+    assert PeakPyramid.load(str(audio), str(tmp_path / "carrier.wav")).lsb_diff is not None
+
+
+def lsb_plane(pcm, channels):
+    return (pcm.reshape(-1, channels) & 1).astype(np.int32)
+
+
+@pytest.mark.parametrize("layout", list(EMBEDDING_LAYOUTS))
+@pytest.mark.parametrize("channels", [1, 2])
+def test_payload_frames_covers_the_embedded_bits(layout, channels):
+    frames = 20_000
+    pcm = np.zeros(frames * channels, dtype=np.int16)
+    payload = os.urandom(700)
+    stego = _embed_lsb(pcm, payload, layout, channels, KEY)
+    plane = lsb_plane(stego, channels)
+
+    covered = _payload_frames(plane, frames)
+    changed = np.flatnonzero(plane.any(axis=1))
+    assert changed[-1] < covered <= frames
+    if layout == 'sequential':
+        assert covered == -(-(32 + len(payload) * 8) // channels)
+    elif layout == 'striped':
+        assert covered == -(-32 // channels) + -(-len(payload) * 8 // channels)
+
+
+def test_payload_frames_rejects_missing_or_impossible_headers():
+    assert _payload_frames(np.zeros((10, 2), dtype=np.int32), 10) == 0  # shorter than a header
+    assert _payload_frames(np.zeros((1000, 2), dtype=np.int32), 1000) == 0  # zero length
+    assert _payload_frames(np.ones((1000, 2), dtype=np.int32), 1000) == 0  # unknown layout byte
+    header = np.unpackbits(np.array([5000], dtype='>u4').view(np.uint8)).astype(np.int32)
+    too_long = np.zeros((1000, 1), dtype=np.int32)
+    too_long[:32, 0] = header
+    assert _payload_frames(too_long, 1000) == 0  # 5000 bytes cannot fit in 1000 samples
+
+
+def test_build_marks_payload_and_changed_lsbs(tmp_path):
+    carrier = tmp_path / "carrier.wav"
+    samples = write_carrier(carrier)
+    stego = _embed_lsb(samples.reshape(-1), os.urandom(2000), 'sequential', 2)
+    sf.write(str(tmp_path / "stego.wav"), stego.reshape(-1, 2), 8000, subtype='PCM_16')
+
+    pyramid = PeakPyramid.build(str(tmp_path / "stego.wav"), str(carrier))
+    assert pyramid.payload_frames == -(-(32 + 2000 * 8) // 2)
+    changed_buckets = np.flatnonzero(pyramid.lsb_diff[0])
+    assert changed_buckets.max() < -(-pyramid.payload_frames // BASE_BLOCK)
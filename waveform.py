@@ -0,0 +1,324 @@
+# waveform.py
+import math
+import os
+import numpy as np
+import soundfile as sf
+import tkinter as tk
+from steganography_utils import _HEADER_BITS, _LAYOUT_SCATTERED, _PayloadLayout, _unpack_header
+
+BASE_BLOCK = 256                     # frames per bucket at level 0
+LEVEL_FACTOR = 4                     # each level merges this many buckets of the one below
+READ_BLOCK_FRAMES = BASE_BLOCK * 4096
+_CACHE_VERSION = 1
+
+
+def _cache_path(audio_path):
+    return audio_path + ".peaks.npz"
+
+
+def _fingerprint(path):
+    if not path:
+        return 0, 0
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _bucket(values, base_block, reducer, pad_value):
+    """Reduce per-frame values to per-bucket values (last bucket padded)"""
+    remainder = len(values) % base_block
+    if remainder:
+        values = np.concatenate([values, np.full(base_block - remainder, pad_value, dtype=values.dtype)])
+    return reducer(values.reshape(-1, base_block), axis=1)
+
+
+def _lsb_reader(subtype):
+    """(read dtype, fn(block) -> LSB plane, fn(block) -> int16-scale peaks) at the native depth"""
+    if subtype == 'FLOAT':
+        return ('float32', lambda block: block.view(np.uint32) & 1,
+                lambda block: np.clip(block * 32767, -32768, 32767).astype(np.int16))
+    # soundfile left-justifies integer PCM in int32, so the native LSB sits above the padding
+    shift = {'PCM_24': 8, 'PCM_32': 0}.get(subtype, 16)
+    return ('int32', lambda block: (block >> shift) & 1,
+            lambda block: (block >> 16).astype(np.int16))
+
+
+def _payload_frames(lsb_plane, total_frames):
+    """Frames covered by the _embed_lsb payload (32-bit layout/length header + data), or 0 if none is found"""
+    channels = lsb_plane.shape[1]
+    bits = lsb_plane.reshape(-1)
+    if len(bits) < _HEADER_BITS:
+        return 0
+    try:
+        layout_id, data_length = _unpack_header(bits[:_HEADER_BITS].astype(np.uint8))
+        # Scattered positions depend on the key, but the span they cover does not
+        key = b"" if layout_id == _LAYOUT_SCATTERED else None
+        layout = _PayloadLayout(layout_id, data_length * 8, total_frames * channels, channels, key)
+    except ValueError:
+        return 0  # no valid header, or a length the file cannot hold
+    return -(-layout.end // channels)
+
+
+class PeakPyramid:
+    """Min/max peaks at several zoom levels, plus optional LSB-change density.
+
+    Level 0 holds one (min, max) pair per BASE_BLOCK frames; each further level
+    merges LEVEL_FACTOR buckets, so any zoom level is drawn from at most a few
+    thousand values. lsb_diff levels hold the fraction of samples whose LSB
+    differs from the original carrier.
+    """
+
+    def __init__(self, mins, maxs, samplerate, frames, channels, base_block=BASE_BLOCK,
+                 payload_frames=0, lsb_diff=None):
+        self.samplerate = samplerate
+        self.frames = frames
+        self.channels = channels
+        self.base_block = base_block
+        self.payload_frames = payload_frames
+        self.mins = [mins]
+        self.maxs = [maxs]
+        self.lsb_diff = [lsb_diff] if lsb_diff is not None else None
+        while len(self.mins[-1]) > 1:
+            self.mins.append(_bucket(self.mins[-1], LEVEL_FACTOR, np.min, self.mins[-1][-1]))
+            self.maxs.append(_bucket(self.maxs[-1], LEVEL_FACTOR, np.max, self.maxs[-1][-1]))
+            if self.lsb_diff is not None:
+                self.lsb_diff.append(_bucket(self.lsb_diff[-1], LEVEL_FACTOR, np.mean, 0))
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate if self.samplerate else 0
+
+    @classmethod
+    def build(cls, audio_path, original_path=None, base_block=BASE_BLOCK):
+        """One streaming pass over the file (and the original, for the LSB diff)"""
+        mins, maxs, diffs = [], [], []
+        payload_frames = 0
+        with sf.SoundFile(audio_path) as stego:
+            dtype, lsb_plane, peaks = _lsb_reader(stego.subtype)
+            original = sf.SoundFile(original_path) if original_path else None
+            try:
+                if original is not None and (original.frames != stego.frames or
+                                             original.channels != stego.channels):
+                    original.close()
+                    original = None  # different carrier - no diff
+
+                for index, block in enumerate(stego.blocks(blocksize=READ_BLOCK_FRAMES, dtype=dtype,
+                                                           always_2d=True)):
+                    bits = lsb_plane(block)
+                    if index == 0:
+                        payload_frames = _payload_frames(bits, stego.frames)
+                    scaled = peaks(block)
+                    mins.append(_bucket(scaled.min(axis=1), base_block, np.min, 0))
+                    maxs.append(_bucket(scaled.max(axis=1), base_block, np.max, 0))
+                    if original is not None:
+                        reference = original.read(len(block), dtype=dtype, always_2d=True)
+                        changed = (bits != lsb_plane(reference)).mean(axis=1).astype(np.float32)
+                        diffs.append(_bucket(changed, base_block, np.mean, 0))
+                samplerate, frames, channels = stego.samplerate, stego.frames, stego.channels
+            finally:
+                if original is not None:
+                    original.close()
+
+        empty = np.zeros(1, dtype=np.int16)
+        return cls(np.concatenate(mins) if mins else empty, np.concatenate(maxs) if maxs else empty,
+                   samplerate, frames, channels, base_block, payload_frames,
+                   np.concatenate(diffs) if diffs else None)
+
+    @classmethod
+    def load(cls, audio_path, original_path=None, use_cache=True):
+        """Load from <file>.peaks.npz when it is still current, otherwise build and cache"""
+        cache = _cache_path(audio_path)
+        expected = [_CACHE_VERSION, *_fingerprint(audio_path), *_fingerprint(original_path), BASE_BLOCK]
+        if use_cache and os.path.exists(cache):
+            try:
+                with np.load(cache) as data:
+                    if data['meta'][:6].tolist() == expected:
+                        return cls._from_arrays(data)
+            except Exception as e:
+                print(f"Ignoring unreadable peak cache {cache}: {e}")
+
+        pyramid = cls.build(audio_path, original_path)
+        if use_cache:
+            pyramid.save(cache, expected)
+        return pyramid
+
+    @classmethod
+    def _from_arrays(cls, data):
+        meta = data['meta'].tolist()
+        samplerate, frames, channels, payload_frames = meta[6:10]
+        lsb_diff = data['lsb_diff'] if 'lsb_diff' in data.files else None
+        return cls(data['mins'], data['maxs'], samplerate, frames, channels, meta[5],
+                   payload_frames, lsb_diff)
+
+    def save(self, cache, meta_prefix):
+        """Write level 0 to the cache (higher levels are cheap to rebuild); failures are ignored"""
+        meta = np.array(meta_prefix + [self.samplerate, self.frames, self.channels, self.payload_frames],
+                        dtype=np.int64)
+        arrays = {'meta': meta, 'mins': self.mins[0], 'maxs': self.maxs[0]}
+        if self.lsb_diff is not None:
+            arrays['lsb_diff'] = self.lsb_diff[0]
+        try:
+            with open(cache + ".tmp", "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(cache + ".tmp", cache)
+        except OSError as e:
+            print(f"Could not write peak cache {cache}: {e}")
+
+    def columns(self, start_frame, end_frame, width):
+        """(mins, maxs, lsb_diff or None) with one value per pixel column for the frame range"""
+        frames_per_pixel = max(1.0, (end_frame - start_frame) / max(1, width))
+        level = int(math.log(max(1.0, frames_per_pixel / self.base_block), LEVEL_FACTOR))
+        level = min(level, len(self.mins) - 1)
+        bucket_frames = self.base_block * LEVEL_FACTOR ** level
+
+        first = int(start_frame // bucket_frames)
+        last = max(first + 1, min(len(self.mins[level]), int(math.ceil(end_frame / bucket_frames))))
+        # Column i starts at this bucket; repeated indices just reuse a bucket when zoomed in deep
+        starts = np.linspace(first, last, width, endpoint=False).astype(np.int64) - first
+
+        mins = np.minimum.reduceat(self.mins[level][first:last], starts)
+        maxs = np.maximum.reduceat(self.maxs[level][first:last], starts)
+        diff = None
+        if self.lsb_diff is not None:
+            diff = np.maximum.reduceat(self.lsb_diff[level][first:last], starts)
+        return mins, maxs, diff
+
+
+class WaveformWidget:
+    """Canvas waveform drawn from a PeakPyramid, with the payload region highlighted.
+
+    Mouse wheel zooms around the pointer, dragging pans, double-click resets and
+    a plain click calls on_click(seconds) (used for seeking).
+    """
+
+    def __init__(self, parent, width=460, height=90, bg="#102027", wave_color="#4FC3F7"):
+        self.canvas = tk.Canvas(parent, width=width, height=height, bg=bg, highlightthickness=0)
+        self.canvas.pack(fill="x", padx=5, pady=3)
+        self.wave_color = wave_color
+        self.pyramid = None
+        self.view_start = 0
+        self.view_end = 0
+        self.cursor_seconds = None
+        self.on_click = None
+        self._drag_x = None
+        self._dragged = False
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.zoom(0.5, e.x))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom(2.0, e.x))
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.reset_view())
+
+    def load(self, audio_path, original_path=None):
+        """Build or load the peak pyramid and draw the whole file"""
+        try:
+            self.pyramid = PeakPyramid.load(audio_path, original_path)
+        except Exception as e:
+            self.pyramid = None
+            self.canvas.delete("all")
+            return False, f"Waveform unavailable: {str(e)}"
+        self.reset_view()
+        return True, "Waveform loaded"
+
+    def reset_view(self):
+        if self.pyramid:
+            self.view_start, self.view_end = 0, self.pyramid.frames
+            self.redraw()
+
+    def _width(self):
+        return max(1, self.canvas.winfo_width() if self.canvas.winfo_width() > 1 else int(self.canvas['width']))
+
+    def _height(self):
+        return max(1, self.canvas.winfo_height() if self.canvas.winfo_height() > 1 else int(self.canvas['height']))
+
+    def _frame_at(self, x):
+        return self.view_start + (self.view_end - self.view_start) * x / self._width()
+
+    def _x_at(self, frame):
+        return (frame - self.view_start) * self._width() / max(1, self.view_end - self.view_start)
+
+    def zoom(self, factor, x):
+        """Scale the visible span by factor, keeping the frame under x in place"""
+        if not self.pyramid:
+            return
+        center = self._frame_at(x)
+        span = min(self.pyramid.frames, max(self._width(), (self.view_end - self.view_start) * factor))
+        start = center - span * x / self._width()
+        self.view_start = int(min(max(0, start), self.pyramid.frames - span))
+        self.view_end = int(self.view_start + span)
+        self.redraw()
+
+    def _on_wheel(self, event):
+        self.zoom(0.8 if event.delta > 0 else 1.25, event.x)
+
+    def _on_press(self, event):
+        self._drag_x = event.x
+        self._dragged = False
+
+    def _on_drag(self, event):
+        if not self.pyramid or self._drag_x is None:
+            return
+        shift = (self._drag_x - event.x) * (self.view_end - self.view_start) / self._width()
+        span = self.view_end - self.view_start
+        self.view_start = int(min(max(0, self.view_start + shift), self.pyramid.frames - span))
+        self.view_end = self.view_start + span
+        self._drag_x = event.x
+        self._dragged = True
+        self.redraw()
+
+    def _on_release(self, event):
+        if self.pyramid and not self._dragged and self.on_click:
+            self.on_click(self._frame_at(event.x) / self.pyramid.samplerate)
+        self._drag_x = None
+
+    def set_cursor(self, seconds):
+        """Move the playback cursor without redrawing the waveform"""
+        self.cursor_seconds = seconds
+        if not self.pyramid:
+            return
+        x = self._x_at(seconds * self.pyramid.samplerate)
+        if self.canvas.find_withtag("cursor"):
+            self.canvas.coords("cursor", x, 0, x, self._height())
+        else:
+            self.canvas.create_line(x, 0, x, self._height(), fill="#FFEB3B", tags="cursor")
+
+    def redraw(self):
+        self.canvas.delete("all")
+        if not self.pyramid or self.view_end <= self.view_start:
+            return
+        width, height = self._width(), self._height()
+        mid = height / 2
+        scale = (mid - 2) / 32768.0
+
+        # Payload region in the LSB plane
+        if self.pyramid.payload_frames:
+            x_end = self._x_at(self.pyramid.payload_frames)
+            if x_end > 0:
+                self.canvas.create_rectangle(0, 0, min(width, x_end), height, fill="#FF9800",
+                                             stipple="gray25", outline="")
+
+        mins, maxs, diff = self.pyramid.columns(self.view_start, self.view_end, width)
+        xs = np.repeat(np.arange(len(mins)), 2)
+        ys = np.empty(len(xs))
+        ys[0::2] = mid - maxs.astype(np.float64) * scale
+        ys[1::2] = mid - mins.astype(np.float64) * scale
+        if len(xs) >= 2:
+            self.canvas.create_line(*np.column_stack([xs, ys]).ravel().tolist(), fill=self.wave_color)
+
+        # Changed-LSB density strip along the bottom
+        if diff is not None and diff.any():
+            strip = min(12, height / 6)
+            ds = height - diff.astype(np.float64) * strip * 2  # ~50% of payload LSBs change
+            coords = np.column_stack([np.arange(len(ds)), np.maximum(height - strip, ds)]).ravel()
+            if len(coords) >= 4:
+                self.canvas.create_line(*coords.tolist(), fill="#F44336")
+
+        sr = self.pyramid.samplerate
+        self.canvas.create_text(4, 2, anchor="nw", fill="#B0BEC5", font=("Arial", 7),
+                                text=f"{self.view_start / sr:.2f}s")
+        self.canvas.create_text(width - 4, 2, anchor="ne", fill="#B0BEC5", font=("Arial", 7),
+                                text=f"{self.view_end / sr:.2f}s")
+        if self.cursor_seconds is not None:
+            self.set_cursor(self.cursor_seconds)